@@ -1,7 +1,13 @@
 # data_extraction.py
 import os
 import sys
+import json
 import uuid
+from functools import partial
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 while not os.path.exists(os.path.join(current_dir, 'utils')):
@@ -12,75 +18,249 @@ while not os.path.exists(os.path.join(current_dir, 'utils')):
 sys.path.insert(0, current_dir)
 
 from utils.el_global import (
-    get_package_metadata,
-    get_resource_metadata,
-    fetch_json,
+    discover_gbfs_resources,
+    fetch_raw,
+    fetch_many_json,
+    fetch_raw_cached,
+    stream_raw_cached,
+    http_get,
+    CACHE_MISS,
+    FETCH_MAX_WORKERS,
     extract_feeds,
-    save_feed_to_csv,
 )
-from utils.bronze_loader import load_feed_to_bronze  # NEW
+from utils.fetch_cache import FetchCache, DiscoveryCache
+from utils.gbfs_stream import stream_feed, peek_header, save_records_to_csv, StreamedFeed
+from utils.bronze_loader import BronzeBatchWriter
+from utils.db import get_pg_connection, get_pool_stats
+from utils.spool import BronzeSpool, SPOOL_ENABLED, drain_spool
+from utils.raw_archive import RawArchive, RAW_ARCHIVE_ENABLED
+from utils.stage_pipeline import StagePipeline, Stage, PIPELINE_CSV_WORKERS, format_stage_stats
 
 # load_env() if you have it
 BASE_URL = os.getenv("BASE_URL")
 DATASET_ID = os.getenv("DATASET_ID")
 OUTPUT_FOLDER = os.getenv("OUTPUT_FOLDER", "data/feeds_data")
+FETCH_CACHE_ENABLED = os.getenv("FETCH_CACHE_ENABLED", "true").lower() == "true"
+# Parse feeds incrementally from the response body instead of response.json()
+STREAM_FEEDS = os.getenv("STREAM_FEEDS", "false").lower() == "true"
+# The CSV copy is for exploration only; without it feed bodies are never decoded
+SAVE_CSV = os.getenv("SAVE_CSV", "true").lower() == "true"
+
+GBFS_RESOURCE_NAMES = [
+    "bike-share-json",
+    "bike-share-gbfs-general-bikeshare-feed-specification",
+]
+
+
+def process_feed_streaming(source_name, feed, batch_id, add_to_bronze, archive=None, cache=None):
+    """
+    Streaming mode for one feed: records are parsed from the response body
+    one at a time and written to CSV as they arrive, and the untouched body
+    is handed to `add_to_bronze` (and the archive) straight from the
+    StreamedFeed's spool file, so the payload is never held as a Python
+    object graph nor read back into memory whole. With a FetchCache, feeds the
+    cache says are unchanged are skipped like in fetch_stage.
+    """
+    feed_name = feed["name"]
+    feed_url = feed["url"]
+    if cache is not None:
+        streamed, cache_status, done = stream_raw_cached(feed_url, cache)
+        if streamed is None:
+            print(f"{source_name}/{feed_name}: cache hit ({cache_status}), feed unchanged - skipped")
+            return
+    else:
+        streamed, done = stream_feed(http_get(feed_url, stream=True)), None
+    try:
+        file_path = save_records_to_csv(
+            feed_name.replace(" ", "_"),
+            streamed.records(),
+            OUTPUT_FOLDER,
+        )
+        if done is not None and done() != CACHE_MISS:
+            print(f"{source_name}/{feed_name}: last_updated unchanged - skipped")
+            return
+        add_to_bronze(
+            feed_name=feed_name,
+            source_name=source_name,
+            api_url=feed_url,
+            raw_body=streamed.raw_file(),
+            version=streamed.header.get("version"),
+        )
+        if archive is not None:
+            archive.append(
+                source_name=source_name,
+                feed_name=feed_name,
+                batch_id=batch_id,
+                api_url=feed_url,
+                raw_body=streamed.raw_file(),
+                version=streamed.header.get("version"),
+            )
+    finally:
+        streamed.close()
+
+    print(f"\nFeed: {source_name}/{feed_name} ({streamed.record_count} records)")
+    print(f"Saved CSV to: {file_path}")
+
+
+def fetch_stage(item, fetch):
+    """Network stage: fetch one feed body. Feeds the cache says are unchanged stop here."""
+    raw_body, cache_status = fetch(item["feed"]["url"])
+    if cache_status != CACHE_MISS:
+        print(f"{item['source_name']}/{item['feed']['name']}: cache hit ({cache_status}), feed unchanged - skipped")
+        return None
+    item["raw_body"] = raw_body
+    return item
+
+
+def transform_stage(item, batch_id, archive=None):
+    """CPU stage: peek at the header, archive the raw body and write the CSV copy."""
+    source_name, feed, raw_body = item["source_name"], item["feed"], item["raw_body"]
+    # Header peek only, the body is not decoded
+    item["header"] = peek_header(raw_body)
+    if archive is not None:
+        archive.append(
+            source_name=source_name,
+            feed_name=feed["name"],
+            batch_id=batch_id,
+            api_url=feed["url"],
+            raw_body=raw_body,
+            version=item["header"].get("version"),
+        )
+    # CSV for exploration, can be removed later
+    if SAVE_CSV:
+        item["csv_path"] = save_records_to_csv(
+            feed["name"].replace(" ", "_"),
+            StreamedFeed.from_bytes(raw_body).records(),
+            OUTPUT_FOLDER,
+        )
+    return item
+
+
+def bronze_stage(item, add_to_bronze, bronze_batch, conn=None):
+    """
+    Database stage: hand the RAW JSON to bronze as-is. With a connection the
+    batch is inserted (not committed) as it grows; if that fails the payload
+    stays in the batch for the final write.
+    """
+    source_name, feed, raw_body, header = item["source_name"], item["feed"], item["raw_body"], item["header"]
+    add_to_bronze(
+        feed_name=feed["name"],
+        source_name=source_name,   # which resource this came from
+        api_url=feed["url"],
+        raw_body=raw_body,
+        version=header.get("version"),
+    )
+    if conn is not None:
+        try:
+            bronze_batch.flush(conn)
+        except psycopg2.Error as e:
+            print(f"{source_name}/{feed['name']}: bronze insert deferred to the end of the run ({e})")
+    print(
+        f"{source_name}/{feed['name']}: last_updated={header.get('last_updated')} ttl={header.get('ttl')} "
+        f"bytes={len(raw_body)}" + (f" csv={item['csv_path']}" if "csv_path" in item else "")
+    )
+    return item
+
+
+def write_bronze_batch(bronze_batch, conn=None):
+    """Write the whole batch to bronze in one transaction and report each feed."""
+    result = bronze_batch.write(conn)
+    print(f"\nBronze batch {bronze_batch.batch_id}")
+    print("=" * 60)
+    for (source_name, feed_name), bronze_id in result["ids"].items():
+        if bronze_id is None:
+            print(f"{source_name}/{feed_name}: payload unchanged since last load - skipped")
+        else:
+            print(f"{source_name}/{feed_name}: loaded to bronze.gbfs_feed_raw (id={bronze_id})")
+    print(f"{result['inserted']} of {len(result['ids'])} payloads inserted, {result['bytes']} bytes")
+    return result
+
+
+def drain_spooled_payloads(spool):
+    """Drain the spool (this run's payloads and any left by earlier runs) into bronze."""
+    try:
+        with get_pg_connection() as conn:
+            drained, inserted = drain_spool(spool, conn)
+    except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+        print(f"\nPostgres unavailable ({e}), {spool.pending_bytes()} bytes stay spooled for the next run")
+        return None
+    finally:
+        spool.close()
+    print(f"\nDrained {drained} spooled payloads into bronze.gbfs_feed_raw ({inserted} new rows)")
+    return {"drained": drained, "inserted": inserted}
+
 
 def run_pipeline():
     batch_id = str(uuid.uuid4())
+    # Every payload of this run goes to bronze in a single transaction at the end,
+    # or with SPOOL_ENABLED first to the durable local spool, then drained
+    bronze_batch = BronzeBatchWriter(batch_id)
+    spool = BronzeSpool() if SPOOL_ENABLED else None
+    add_to_bronze = partial(spool.append, batch_id=batch_id) if spool else bronze_batch.add
+    # Optional append-only copy of every raw response (see replay_archive.py)
+    archive = RawArchive() if RAW_ARCHIVE_ENABLED else None
+
+    # 1) Discover the GBFS entry point (feeds.json) of each resource
+    discovery_cache = DiscoveryCache()
+    resource_urls = discover_gbfs_resources(BASE_URL, DATASET_ID, GBFS_RESOURCE_NAMES, cache=discovery_cache)
+
+    # 2) Fetch every feeds.json in parallel. Bodies are kept as raw bytes. With the
+    #    fetch cache on, feeds still inside their ttl are not requested and unchanged
+    #    feeds are answered from the local store.
+    fetch_cache = FetchCache() if FETCH_CACHE_ENABLED else None
+    if fetch_cache is not None:
+        fetch = partial(fetch_raw_cached, cache=fetch_cache)
+    else:
+        fetch = lambda url: (fetch_raw(url), CACHE_MISS)
+
+    roots = fetch_many_json(resource_urls.values(), fetch=fetch)
+    if any(isinstance(result, Exception) for result in roots.values()):
+        # A cached entry URL may have moved: rediscover once and retry
+        discovery_cache.invalidate(DATASET_ID)
+        resource_urls = discover_gbfs_resources(BASE_URL, DATASET_ID, GBFS_RESOURCE_NAMES, cache=discovery_cache)
+        roots = fetch_many_json(resource_urls.values(), fetch=fetch)
+
+    resource_feeds = {}
+    for name, file_url in resource_urls.items():
+        result = roots[file_url]
+        if isinstance(result, Exception):
+            print(f"Failed to fetch feed index for {name}: {result}")
+            continue
+        resource_feeds[name] = extract_feeds(json.loads(result[0]))
+
+    if STREAM_FEEDS:
+        jobs = [(name, feed) for name, feeds in resource_feeds.items() for feed in feeds]
+        with ThreadPoolExecutor(max_workers=max(1, min(FETCH_MAX_WORKERS, len(jobs)))) as pool:
+            futures = [
+                pool.submit(process_feed_streaming, name, feed, batch_id, add_to_bronze, archive, fetch_cache)
+                for name, feed in jobs
+            ]
+        for (name, feed), future in zip(jobs, futures):
+            if future.exception() is not None:
+                print(f"Failed to process feed {name}/{feed['name']}: {future.exception()}")
+        return drain_spooled_payloads(spool) if spool else write_bronze_batch(bronze_batch)
+
+    # 3) Fetch, transform and load every feed in overlapping stages
+    jobs = [{"source_name": name, "feed": feed} for name, feeds in resource_feeds.items() for feed in feeds]
+    with ExitStack() as stack:
+        # Without the spool, the bronze stage inserts into one open transaction as
+        # payloads arrive and the batch is committed once everything is through
+        conn = None if spool else stack.enter_context(get_pg_connection())
+        pipeline = StagePipeline([
+            Stage("fetch", partial(fetch_stage, fetch=fetch), workers=FETCH_MAX_WORKERS),
+            Stage("transform", partial(transform_stage, batch_id=batch_id, archive=archive), workers=PIPELINE_CSV_WORKERS),
+            Stage("bronze", partial(bronze_stage, add_to_bronze=add_to_bronze, bronze_batch=bronze_batch, conn=conn)),
+        ])
+        failures = pipeline.run(jobs)
+        for stage_name, item, error in failures:
+            print(f"Failed to {stage_name} feed {item['source_name']}/{item['feed']['name']}: {error}")
+        print(f"\nStages ({len(jobs)} feeds)")
+        print(format_stage_stats(pipeline.stats()))
+
+        # 4) Commit the whole batch to Bronze in one transaction (or drain the spool)
+        return drain_spooled_payloads(spool) if spool else write_bronze_batch(bronze_batch, conn)
 
-    package = get_package_metadata(BASE_URL, DATASET_ID)
-    for resource in package["result"]["resources"]:
-        if not resource["datastore_active"]:
-            metadata = get_resource_metadata(BASE_URL, resource["id"])
-            name = metadata["result"]["name"]
-            file_url = metadata["result"]["url"]
-
-            if name in [
-                "bike-share-json",
-                "bike-share-gbfs-general-bikeshare-feed-specification",
-            ]:
-                print(f"\nProcessing Resource: {name}")
-                print("=" * 60)
-
-                root_json = fetch_json(file_url)
-                feeds = extract_feeds(root_json)
-
-                for feed in feeds:
-                    feed_name = feed["name"]              # e.g. 'station_information'[file:37]
-                    feed_url = feed["url"]
-
-                    print(f"\nFeed: {feed_name}")
-                    print(f"URL: {feed_url}")
-
-                    feed_data = fetch_json(feed_url)
-
-                    # OPTIONAL: sample print
-                    print("Sample JSON:")
-                    print({
-                        "last_updated": feed_data.get("last_updated"),
-                        "ttl": feed_data.get("ttl"),
-                        "data_keys": list(feed_data.get("data", {}).keys())
-                    })
-
-                    # 1) Save to CSV (for exploration, can be removed later)
-                    file_path = save_feed_to_csv(
-                        feed_name.replace(" ", "_"),
-                        feed_data,
-                        OUTPUT_FOLDER,
-                    )
-                    print(f"Saved CSV to: {file_path}")
-
-                    # 2) Load RAW JSON to Bronze
-                    load_feed_to_bronze(
-                        feed_name=feed_name,
-                        source_name=name,      # which resource this came from
-                        batch_id=batch_id,
-                        api_url=feed_url,
-                        payload=feed_data,
-                    )
-
-                    print("Loaded to bronze.gbfs_feed_raw")
-                    print("-" * 50)
 
 if __name__ == "__main__":
     run_pipeline()
+    print(f"Postgres pool: {get_pool_stats()}")
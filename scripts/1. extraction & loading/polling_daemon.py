@@ -0,0 +1,260 @@
+"""Long-running GBFS poller.
+
+Discovers the GBFS feeds, then polls every feed on its own cadence (the
+`ttl` it advertises) and loads new payloads into `bronze.gbfs_feed_raw`.
+The HTTP session and the Postgres connection stay open between polls. When a
+feed URL fails REDISCOVER_AFTER_FAILURES times in a row, the cached discovery
+is dropped and the feeds are discovered again, in case the URLs moved. When
+CKAN or the network is down the current feeds are kept and discovery is tried
+again after the next run of failures.
+
+Fetched payloads are first appended to the fsync'd local spool
+(utils/spool.py); a drainer thread moves them to bronze in bulk. Polling
+never waits for Postgres, and payloads fetched while it is slow or down are
+loaded once it is back, even across restarts. When more than SPOOL_MAX_BYTES
+are waiting in the spool, polling pauses until the drainer catches up.
+
+Usage:
+    python "scripts/1. extraction & loading/polling_daemon.py"
+"""
+
+
+import os
+import sys
+import time
+import uuid
+import heapq
+import signal
+import logging
+import threading
+from functools import partial
+
+import psycopg2
+import requests
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+while not os.path.exists(os.path.join(current_dir, 'utils')):
+    parent = os.path.dirname(current_dir)
+    if parent == current_dir:
+        raise RuntimeError("Could not find project root (utils folder not found)")
+    current_dir = parent
+sys.path.insert(0, current_dir)
+
+from utils.el_global import (
+    discover_gbfs_resources,
+    fetch_many_json,
+    fetch_raw_cached,
+    CACHE_MISS,
+    extract_feeds,
+)
+from utils.fetch_cache import FetchCache, DiscoveryCache
+from utils.gbfs_stream import peek_header
+from utils.spool import BronzeSpool, drain_spool, SPOOL_MAX_BYTES
+from utils.raw_archive import RawArchive, RAW_ARCHIVE_ENABLED
+from utils.db import get_pg_connection, get_pool_stats
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+BASE_URL = os.getenv("BASE_URL")
+DATASET_ID = os.getenv("DATASET_ID")
+
+# Polling cadence bounds, in seconds. A feed is polled every `ttl` seconds,
+# clamped to [POLL_MIN_INTERVAL, POLL_MAX_INTERVAL]; feeds with ttl 0 or no
+# ttl use POLL_DEFAULT_INTERVAL.
+POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", "5"))
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", "3600"))
+POLL_DEFAULT_INTERVAL = float(os.getenv("POLL_DEFAULT_INTERVAL", "60"))
+# Seconds between drains of the spool into bronze
+SPOOL_DRAIN_INTERVAL = float(os.getenv("SPOOL_DRAIN_INTERVAL", "1"))
+# Consecutive fetch failures of one feed URL before rediscovering the feeds
+REDISCOVER_AFTER_FAILURES = int(os.getenv("REDISCOVER_AFTER_FAILURES", "3"))
+
+GBFS_RESOURCE_NAMES = [
+    "bike-share-json",
+    "bike-share-gbfs-general-bikeshare-feed-specification",
+]
+
+
+def poll_interval(header):
+    ttl = header.get("ttl")
+    if not isinstance(ttl, (int, float)) or ttl <= 0:
+        return POLL_DEFAULT_INTERVAL
+    return min(max(float(ttl), POLL_MIN_INTERVAL), POLL_MAX_INTERVAL)
+
+
+def discover_feeds(discovery_cache=None, refresh=False):
+    """
+    Return [(source_name, feed_name, feed_url)] for every GBFS feed. With
+    refresh, the cached CKAN discovery is dropped first.
+    """
+    discovery_cache = discovery_cache or DiscoveryCache()
+    if refresh:
+        discovery_cache.invalidate(DATASET_ID)
+    resource_urls = discover_gbfs_resources(BASE_URL, DATASET_ID, GBFS_RESOURCE_NAMES, cache=discovery_cache)
+    roots = fetch_many_json(resource_urls.values())
+    if any(isinstance(root_json, Exception) for root_json in roots.values()):
+        # A cached entry URL may have moved: rediscover once and retry
+        discovery_cache.invalidate(DATASET_ID)
+        resource_urls = discover_gbfs_resources(BASE_URL, DATASET_ID, GBFS_RESOURCE_NAMES, cache=discovery_cache)
+        roots = fetch_many_json(resource_urls.values())
+
+    feeds = []
+    for name, file_url in resource_urls.items():
+        root_json = roots[file_url]
+        if isinstance(root_json, Exception):
+            logger.warning("Failed to fetch feed index for %s: %s", name, root_json)
+            continue
+        for feed in extract_feeds(root_json):
+            feeds.append((name, feed["name"], feed["url"]))
+    return feeds
+
+
+def try_discover_feeds(discovery_cache, refresh=False):
+    """
+    discover_feeds, or None when CKAN or the network is down: the caller
+    keeps what it has and tries again later.
+    """
+    try:
+        return discover_feeds(discovery_cache, refresh=refresh)
+    except requests.RequestException as e:
+        logger.error("Feed discovery failed: %s", e)
+        return None
+
+
+def reschedule(schedule, feeds, now):
+    """Schedule for a rediscovered feed list: known feeds keep their next poll, new ones are due now."""
+    next_poll = {(source_name, feed_name, url): due for due, source_name, feed_name, url in schedule}
+    schedule = [
+        (next_poll.get((source_name, feed_name, url), now), source_name, feed_name, url)
+        for source_name, feed_name, url in feeds
+    ]
+    heapq.heapify(schedule)
+    return schedule
+
+
+def spool_drainer(spool, done_event):
+    """
+    Drain the spool into bronze over one long-lived connection, until
+    done_event is set and a last drain has run.
+    """
+    while True:
+        try:
+            with get_pg_connection() as conn:
+                while True:
+                    done = done_event.is_set()
+                    drained, inserted = drain_spool(spool, conn)
+                    if drained:
+                        logger.info("Drained %d spooled payloads into bronze (%d new rows)", drained, inserted)
+                    if done:
+                        return
+                    done_event.wait(SPOOL_DRAIN_INTERVAL)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            if done_event.is_set():
+                logger.error("Postgres unavailable at shutdown, %d bytes stay spooled for the next run", spool.pending_bytes())
+                return
+            logger.exception("Lost Postgres connection, retrying in %ss (payloads keep spooling)", POLL_MIN_INTERVAL)
+            done_event.wait(POLL_MIN_INTERVAL)
+
+
+def run_daemon():
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+
+    discovery_cache = DiscoveryCache()
+    feeds = try_discover_feeds(discovery_cache) or []
+    logger.info("Discovered %d feeds", len(feeds))
+    while not feeds and not stop_event.is_set():
+        logger.error("No GBFS feeds discovered, retrying in %ss", POLL_DEFAULT_INTERVAL)
+        stop_event.wait(POLL_DEFAULT_INTERVAL)
+        feeds = try_discover_feeds(discovery_cache, refresh=True) or []
+
+    spool = BronzeSpool()
+    done_event = threading.Event()
+    drainer = threading.Thread(target=spool_drainer, args=(spool, done_event), daemon=True)
+    drainer.start()
+
+    fetch = partial(fetch_raw_cached, cache=FetchCache())
+    archive = RawArchive() if RAW_ARCHIVE_ENABLED else None
+    schedule = [(time.monotonic(), source_name, feed_name, url) for source_name, feed_name, url in feeds]
+    heapq.heapify(schedule)
+
+    failures = {}  # feed URL -> consecutive failed fetches
+    paused = False
+    while schedule and not stop_event.is_set():
+        now = time.monotonic()
+        if schedule[0][0] > now:
+            stop_event.wait(schedule[0][0] - now)
+            continue
+
+        # Backpressure: with Postgres down the spool would otherwise grow without bound
+        if spool.pending_bytes() > SPOOL_MAX_BYTES:
+            if not paused:
+                logger.warning("Spool above %d bytes, pausing polls until it drains", SPOOL_MAX_BYTES)
+                paused = True
+            stop_event.wait(POLL_MIN_INTERVAL)
+            continue
+        if paused:
+            logger.info("Spool drained below %d bytes, resuming polls", SPOOL_MAX_BYTES)
+            paused = False
+
+        due = []
+        while schedule and schedule[0][0] <= now:
+            due.append(heapq.heappop(schedule))
+
+        batch_id = str(uuid.uuid4())
+        results = fetch_many_json([url for _, _, _, url in due], fetch=fetch)
+        for _, source_name, feed_name, url in due:
+            result = results[url]
+            if isinstance(result, Exception):
+                logger.warning("Fetch failed for %s/%s: %s", source_name, feed_name, result)
+                heapq.heappush(schedule, (now + POLL_DEFAULT_INTERVAL, source_name, feed_name, url))
+                failures[url] = failures.get(url, 0) + 1
+                continue
+            failures.pop(url, None)
+            raw_body, cache_status = result
+            header = peek_header(raw_body)
+            heapq.heappush(schedule, (now + poll_interval(header), source_name, feed_name, url))
+            if cache_status != CACHE_MISS:
+                continue
+            if archive is not None:
+                archive.append(
+                    source_name=source_name,
+                    feed_name=feed_name,
+                    batch_id=batch_id,
+                    api_url=url,
+                    raw_body=raw_body,
+                    version=header.get("version"),
+                )
+            spool.append(
+                feed_name=feed_name,
+                source_name=source_name,
+                batch_id=batch_id,
+                api_url=url,
+                raw_body=raw_body,
+                version=header.get("version"),
+            )
+
+        if any(count >= REDISCOVER_AFTER_FAILURES for count in failures.values()):
+            logger.warning("Feed URLs failing %d times in a row, rediscovering the feeds", REDISCOVER_AFTER_FAILURES)
+            # On failure the current schedule is kept; the counts start over, so
+            # rediscovery is tried again once the URLs have failed as often again
+            feeds = try_discover_feeds(discovery_cache, refresh=True)
+            if feeds:
+                schedule = reschedule(schedule, feeds, now)
+                logger.info("Rediscovered %d feeds", len(feeds))
+            failures.clear()
+
+    logger.info("Stopping, draining %d spooled bytes", spool.pending_bytes())
+    done_event.set()
+    drainer.join()
+    spool.close()
+    logger.info("Stopped (Postgres pool: %s)", get_pool_stats())
+
+
+if __name__ == "__main__":
+    run_daemon()
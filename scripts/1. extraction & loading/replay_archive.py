@@ -0,0 +1,67 @@
+"""Rebuild bronze from the raw response archive.
+
+Reads the gzip JSON-lines files written by utils/raw_archive.py for a time
+range and streams them into `bronze.gbfs_feed_raw` with COPY, keeping the
+original `load_batch_id` and `time_ingested`. Rows are inserted as they are:
+replay into an empty (or truncated) range to avoid duplicates. Each batch is
+committed on its own, so an interrupted replay leaves the batches before it.
+
+Usage:
+    python "scripts/1. extraction & loading/replay_archive.py" --start 2026-02-01 --end 2026-03-01
+"""
+
+
+import os
+import sys
+import argparse
+import logging
+from datetime import datetime, timezone
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+while not os.path.exists(os.path.join(current_dir, 'utils')):
+    parent = os.path.dirname(current_dir)
+    if parent == current_dir:
+        raise RuntimeError("Could not find project root (utils folder not found)")
+    current_dir = parent
+sys.path.insert(0, current_dir)
+
+from utils.raw_archive import RawArchive
+from utils.bronze_loader import bulk_copy_to_bronze, BRONZE_COPY_BATCH_SIZE
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+def _parse_time(value):
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def replay(start, end, archive_dir=None, batch_size=None):
+    archive = RawArchive(archive_dir)
+    stats = bulk_copy_to_bronze(archive.iter_records(start, end), batch_size=batch_size)
+    logger.info(
+        "Replayed %d payloads (%.1f MB) into bronze.gbfs_feed_raw in %.1fs (%.0f rows/s)",
+        stats["rows"], stats["bytes"] / 1e6, stats["seconds"], stats["rows_per_second"],
+    )
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--start", required=True, help="inclusive, ISO date or datetime (UTC if no offset)")
+    parser.add_argument("--end", required=True, help="exclusive, ISO date or datetime (UTC if no offset)")
+    parser.add_argument("--archive-dir", default=None, help="defaults to RAW_ARCHIVE_DIR")
+    parser.add_argument("--batch-size", type=int, default=BRONZE_COPY_BATCH_SIZE, help="rows per COPY and commit")
+    args = parser.parse_args()
+
+    replay(_parse_time(args.start), _parse_time(args.end), args.archive_dir, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
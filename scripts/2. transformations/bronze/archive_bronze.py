@@ -0,0 +1,132 @@
+"""Move old bronze partitions to the cold archive.
+
+Every range partition of `bronze.gbfs_feed_raw` that ended more than
+BRONZE_HOT_DAYS days ago is streamed, oldest first, into one compressed
+Parquet file under COLD_ARCHIVE_DIR (see utils/cold_archive.py), then detached
+and dropped (maintain_partitions.retire_partition). The partition is locked
+against writes while it is copied, and the file is fsync'd and recorded in the
+manifest before the DROP is committed, so a crash can at worst leave the
+partition in both places, never in neither; the next run archives it again
+over the same file. Rows in the default partition are never archived.
+
+Old ranges stay readable: load_silver.py --since <date> pulls archived rows
+back in transparently.
+
+Usage:
+    python "scripts/2. transformations/bronze/archive_bronze.py"
+    python "scripts/2. transformations/bronze/archive_bronze.py" --hot-days 14 --dry-run
+"""
+
+
+import os
+import sys
+import argparse
+import logging
+from datetime import datetime, timedelta, timezone
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)  # maintain_partitions.py
+while not os.path.exists(os.path.join(current_dir, 'utils')):
+    parent = os.path.dirname(current_dir)
+    if parent == current_dir:
+        raise RuntimeError("Could not find project root (utils folder not found)")
+    current_dir = parent
+sys.path.insert(0, current_dir)
+
+from utils.db import get_pg_connection
+from utils.cold_archive import ColdArchive, BRONZE_HOT_DAYS, COLUMNS
+from maintain_partitions import list_partitions, retire_partition, DEFAULT_PARTITION
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+SELECT_PARTITION_SQL = """
+SELECT id, time_ingested, load_batch_id, source_name, feed_type, file_name,
+       api_url, version, raw_payload::text, content_hash, payload_bytes
+FROM bronze.{partition}
+"""
+
+
+def archive_partition(conn, archive, name, range_to, chunk_size, dry_run=False):
+    def chunks(cur):
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield [dict(zip(COLUMNS, row)) for row in rows]
+
+    if dry_run:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT count(*) FROM bronze.{name}")
+            rows = cur.fetchone()[0]
+        logger.info("%s: would archive %d rows and drop the partition", name, rows)
+        conn.rollback()
+        return rows
+
+    # Writers would add rows the file misses; readers (silver) carry on
+    with conn.cursor() as cur:
+        cur.execute(f"LOCK TABLE bronze.{name} IN SHARE MODE")
+    # Server-side cursor: the partition is streamed, never fetched at once
+    with conn.cursor(name="cold_archive_partition") as cur:
+        cur.itersize = chunk_size
+        cur.execute(SELECT_PARTITION_SQL.format(partition=name))
+        entry = archive.write_file(chunks(cur))
+
+    archive.commit_file(entry, range_to)
+    with conn.cursor() as cur:
+        retire_partition(cur, name, "drop")
+    conn.commit()
+    if entry is None:
+        logger.info("%s: empty, dropped", name)
+        return 0
+    logger.info("%s: archived %d rows to %s (%.1f MB), dropped", name, entry["rows"], entry["path"], entry["bytes"] / 1e6)
+    return entry["rows"]
+
+
+def archive_bronze(hot_days=None, archive_dir=None, chunk_size=200, dry_run=False):
+    hot_days = BRONZE_HOT_DAYS if hot_days is None else hot_days
+    archive = ColdArchive(archive_dir)
+    cutoff = datetime.now(timezone.utc) - timedelta(days=hot_days)
+
+    total = 0
+    with get_pg_connection() as conn:
+        with conn.cursor() as cur:
+            partitions = [
+                (name, range_to) for name, _, range_to in list_partitions(cur)
+                if range_to is not None and range_to <= cutoff
+            ]
+            cur.execute(f"SELECT count(*) FROM bronze.{DEFAULT_PARTITION} WHERE time_ingested < %s", (cutoff,))
+            default_rows = cur.fetchone()[0]
+        conn.commit()
+        if default_rows:
+            logger.warning("%d rows older than %s sit in the default partition and are not archived", default_rows, cutoff.date())
+        if not partitions:
+            logger.info("No bronze partition ends before %s", cutoff.date())
+            return 0
+
+        for name, range_to in sorted(partitions, key=lambda p: p[1]):
+            total += archive_partition(conn, archive, name, range_to, chunk_size, dry_run)
+
+    logger.info(
+        "%s %d bronze rows from %d partitions ending before %s",
+        "Would archive" if dry_run else "Archived", total, len(partitions), cutoff.date(),
+    )
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hot-days", type=int, default=None, help="defaults to BRONZE_HOT_DAYS")
+    parser.add_argument("--archive-dir", default=None, help="defaults to COLD_ARCHIVE_DIR")
+    parser.add_argument("--chunk-size", type=int, default=200, help="rows per fetch and Parquet row group")
+    parser.add_argument("--dry-run", action="store_true", help="only count the rows per partition")
+    args = parser.parse_args()
+
+    archive_bronze(args.hot_days, args.archive_dir, args.chunk_size, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
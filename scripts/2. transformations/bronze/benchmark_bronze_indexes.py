@@ -0,0 +1,164 @@
+"""Compare bronze insert throughput and index size: whole-document GIN vs targeted indexes.
+
+Loads the same synthetic station_status payloads (the fixture in
+.vscode/gbfs_feeds with randomized availability) into two scratch copies of
+`bronze.gbfs_feed_raw`, in schema `bronze_bench`:
+
+    gin       the previous layout: (feed_type, time_ingested) + GIN on raw_payload
+    targeted  the current layout: (source_name, feed_type, time_ingested DESC)
+              + the content_hash lookup index
+    path_ops  targeted + a jsonb_path_ops GIN on station_status only, the
+              option kept for containment queries should they ever be needed
+
+and prints rows/s, table size and index size for each. The scratch tables
+draw ids from their own identity column, never from bronze's sequence. The
+scratch schema is dropped at the end unless --keep is given. Run
+bronze.gbfs_feed_raw.sql first. Results are in docs/01_el_bronze.md.
+
+Usage:
+    python "scripts/2. transformations/bronze/benchmark_bronze_indexes.py" --rows 300
+"""
+
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import logging
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+while not os.path.exists(os.path.join(current_dir, 'utils')):
+    parent = os.path.dirname(current_dir)
+    if parent == current_dir:
+        raise RuntimeError("Could not find project root (utils folder not found)")
+    current_dir = parent
+sys.path.insert(0, current_dir)
+
+from psycopg2.extras import execute_values
+
+from utils.db import get_pg_connection
+from utils.el_global import load_json_from_file
+
+FIXTURE = os.path.join(current_dir, ".vscode", "gbfs_feeds", "feeds_data", "bike-share-json", "station_status.json")
+
+VARIANTS = {
+    "gin": [
+        "CREATE INDEX ON bronze_bench.gin (feed_type, time_ingested)",
+        "CREATE INDEX ON bronze_bench.gin USING gin (raw_payload)",
+    ],
+    "targeted": [
+        "CREATE INDEX ON bronze_bench.targeted (source_name, feed_type, time_ingested DESC)",
+        "CREATE INDEX ON bronze_bench.targeted (source_name, feed_type, id DESC) INCLUDE (content_hash)",
+    ],
+    "path_ops": [
+        "CREATE INDEX ON bronze_bench.path_ops (source_name, feed_type, time_ingested DESC)",
+        "CREATE INDEX ON bronze_bench.path_ops (source_name, feed_type, id DESC) INCLUDE (content_hash)",
+        "CREATE INDEX ON bronze_bench.path_ops USING gin (raw_payload jsonb_path_ops) WHERE feed_type = 'station_status'",
+    ],
+}
+
+INSERT_SQL = """
+INSERT INTO bronze_bench.{table} (
+    feed_type, source_name, load_batch_id, file_name, api_url, version, raw_payload, payload_bytes
+)
+VALUES %s
+"""
+INSERT_TEMPLATE = (
+    "('station_status', 'bike-share-json', 'benchmark', 'station_status.json', 'benchmark', NULL, %s::jsonb, %s)"
+)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+def make_payloads(count, seed=42):
+    """Serialized station_status payloads, each with fresh random availability."""
+    rng = random.Random(seed)
+    payload = load_json_from_file(FIXTURE)["data"]
+    bodies = []
+    for i in range(count):
+        payload["last_updated"] += 60
+        for station in payload["data"]["stations"]:
+            station["num_bikes_available"] = rng.randint(0, 30)
+            station["num_docks_available"] = rng.randint(0, 30)
+            station["last_reported"] = payload["last_updated"] - rng.randint(0, 300)
+        body = json.dumps(payload)
+        bodies.append((body, len(body.encode("utf-8"))))
+    return bodies
+
+
+def run_variant(conn, name, bodies, page_size):
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS bronze_bench.{name}")
+        # No INCLUDING DEFAULTS: the id default would draw from bronze's own sequence
+        cur.execute(f"CREATE TABLE bronze_bench.{name} (LIKE bronze.gbfs_feed_raw INCLUDING GENERATED)")
+        cur.execute(
+            f"ALTER TABLE bronze_bench.{name} "
+            f"ALTER COLUMN id ADD GENERATED ALWAYS AS IDENTITY, "
+            f"ALTER COLUMN time_ingested SET DEFAULT now()"
+        )
+        for statement in VARIANTS[name]:
+            cur.execute(statement)
+        conn.commit()
+
+        started = time.monotonic()
+        for i in range(0, len(bodies), page_size):
+            execute_values(cur, INSERT_SQL.format(table=name), bodies[i:i + page_size], template=INSERT_TEMPLATE)
+            conn.commit()
+        elapsed = time.monotonic() - started
+
+        cur.execute(
+            "SELECT pg_table_size(%s::regclass), pg_indexes_size(%s::regclass)",
+            (f"bronze_bench.{name}", f"bronze_bench.{name}"),
+        )
+        table_size, index_size = cur.fetchone()
+    return {
+        "variant": name,
+        "rows_per_second": len(bodies) / elapsed if elapsed else 0.0,
+        "seconds": elapsed,
+        "table_mb": table_size / 1e6,
+        "index_mb": index_size / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=300, help="payloads to insert per variant")
+    parser.add_argument("--page-size", type=int, default=10, help="rows per INSERT and commit")
+    parser.add_argument("--keep", action="store_true", help="keep the bronze_bench schema")
+    args = parser.parse_args()
+
+    logger.info("Generating %d station_status payloads", args.rows)
+    bodies = make_payloads(args.rows)
+
+    results = []
+    with get_pg_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("CREATE SCHEMA IF NOT EXISTS bronze_bench")
+        conn.commit()
+        try:
+            for name in VARIANTS:
+                logger.info("Loading variant %s", name)
+                results.append(run_variant(conn, name, bodies, args.page_size))
+        finally:
+            if not args.keep:
+                conn.rollback()
+                with conn.cursor() as cur:
+                    cur.execute("DROP SCHEMA bronze_bench CASCADE")
+                conn.commit()
+
+    print(f"{'variant':<10} {'rows/s':>10} {'seconds':>10} {'table MB':>10} {'index MB':>10}")
+    for r in results:
+        print(
+            f"{r['variant']:<10} {r['rows_per_second']:>10.1f} {r['seconds']:>10.1f} "
+            f"{r['table_mb']:>10.1f} {r['index_mb']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
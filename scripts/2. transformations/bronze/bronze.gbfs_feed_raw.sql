@@ -3,8 +3,34 @@
 -- It serves as a landing zone for all GBFS feed data, allowing us to maintain a complete historical 
 -- record of the raw data as it was received from the source.
 
+-- Canonical content hash used to skip duplicate payloads: jsonb text output is
+-- already normalized (key order, whitespace), and the volatile last_updated is removed.
+CREATE OR REPLACE FUNCTION bronze.gbfs_content_hash(payload jsonb)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE PARALLEL SAFE
+AS $$ SELECT md5((payload - 'last_updated')::text) $$;
+
+-- Integer value of a top-level GBFS field (last_updated, ttl), NULL when it is
+-- missing, not an integer (GBFS 3.0 sends last_updated as an ISO timestamp) or
+-- too large, so a malformed payload can never make the insert fail.
+CREATE OR REPLACE FUNCTION bronze.gbfs_int(value jsonb)
+RETURNS bigint
+LANGUAGE sql
+IMMUTABLE PARALLEL SAFE
+AS $$
+    SELECT CASE
+        WHEN jsonb_typeof(value) = 'number' AND value::text ~ '^-?[0-9]{1,18}$' THEN value::text::bigint
+        WHEN jsonb_typeof(value) = 'string' AND value #>> '{}' ~ '^[0-9]{1,18}$' THEN (value #>> '{}')::bigint
+    END
+$$;
+
+-- Range-partitioned on time_ingested (daily or monthly partitions, created ahead
+-- of time and retired by maintain_partitions.py). The primary key has to include
+-- the partition key. Databases created before partitioning: run
+-- bronze.gbfs_feed_raw_partition_migration.sql first.
 CREATE TABLE IF NOT EXISTS bronze.gbfs_feed_raw (
-    id              bigserial PRIMARY KEY,
+    id              bigserial,
     feed_type       text        NOT NULL,   -- e.g. 'station_information'
     source_name     text        NOT NULL,   -- 'bike-share-json' or 'bike-share-gbfs-general-bikeshare-feed-specification'
     load_batch_id   text        NOT NULL,   -- e.g. run timestamp or UUID
@@ -12,11 +38,152 @@ CREATE TABLE IF NOT EXISTS bronze.gbfs_feed_raw (
     api_url         text        NOT NULL,   -- feed URL
     version         text,                  -- GBFS version if present
     time_ingested   timestamptz NOT NULL DEFAULT now(),
-    raw_payload     jsonb       NOT NULL
+    raw_payload     jsonb       NOT NULL,
+    content_hash    text GENERATED ALWAYS AS (bronze.gbfs_content_hash(raw_payload)) STORED,
+    -- Lookup columns, so common questions don't need to open raw_payload
+    last_updated    bigint GENERATED ALWAYS AS (bronze.gbfs_int(raw_payload->'last_updated')) STORED,
+    ttl             bigint GENERATED ALWAYS AS (bronze.gbfs_int(raw_payload->'ttl')) STORED,
+    station_count   integer GENERATED ALWAYS AS (
+                        CASE WHEN jsonb_typeof(raw_payload->'data'->'stations') = 'array'
+                             THEN jsonb_array_length(raw_payload->'data'->'stations') END
+                    ) STORED,
+    payload_bytes   integer,               -- size of the response body, set by the writers
+    PRIMARY KEY (id, time_ingested)
+) PARTITION BY RANGE (time_ingested);
+
+-- Catches rows outside every range partition (e.g. if maintenance stopped running);
+-- maintain_partitions.py moves them into the right partition when it creates it.
+CREATE TABLE IF NOT EXISTS bronze.gbfs_feed_raw_default
+    PARTITION OF bronze.gbfs_feed_raw DEFAULT;
+
+-- Existing databases: replace a plain content_hash column by the generated one
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM information_schema.columns
+        WHERE table_schema = 'bronze'
+          AND table_name = 'gbfs_feed_raw'
+          AND column_name = 'content_hash'
+          AND is_generated = 'NEVER'
+    ) THEN
+        ALTER TABLE bronze.gbfs_feed_raw DROP COLUMN content_hash;
+    END IF;
+END $$;
+
+ALTER TABLE bronze.gbfs_feed_raw ADD COLUMN IF NOT EXISTS content_hash text
+    GENERATED ALWAYS AS (bronze.gbfs_content_hash(raw_payload)) STORED;
+
+-- Existing databases: add the lookup columns (rewrites the table once)
+ALTER TABLE bronze.gbfs_feed_raw
+    ADD COLUMN IF NOT EXISTS last_updated bigint
+        GENERATED ALWAYS AS (bronze.gbfs_int(raw_payload->'last_updated')) STORED,
+    ADD COLUMN IF NOT EXISTS ttl bigint
+        GENERATED ALWAYS AS (bronze.gbfs_int(raw_payload->'ttl')) STORED,
+    ADD COLUMN IF NOT EXISTS station_count integer
+        GENERATED ALWAYS AS (
+            CASE WHEN jsonb_typeof(raw_payload->'data'->'stations') = 'array'
+                 THEN jsonb_array_length(raw_payload->'data'->'stations') END
+        ) STORED,
+    ADD COLUMN IF NOT EXISTS payload_bytes integer;
+
+-- Existing databases: payload_bytes used to be generated from
+-- octet_length(raw_payload::text), which serialized every payload again on
+-- insert; the writers now send the body length. Stored values are kept.
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM information_schema.columns
+        WHERE table_schema = 'bronze'
+          AND table_name = 'gbfs_feed_raw'
+          AND column_name = 'payload_bytes'
+          AND is_generated = 'ALWAYS'
+    ) THEN
+        ALTER TABLE bronze.gbfs_feed_raw ALTER COLUMN payload_bytes DROP EXPRESSION;
+    END IF;
+END $$;
+
+-- Indexes below are partitioned indexes: every partition gets its own copy.
+
+-- Silver access pattern: one source and feed, newest rows first, within a time window
+CREATE INDEX IF NOT EXISTS idx_gbfs_feed_raw_source_feed_time
+    ON bronze.gbfs_feed_raw (source_name, feed_type, time_ingested DESC);
+
+-- Id ranges per (source_name, feed_type), read by the silver loaders above their watermark
+CREATE INDEX IF NOT EXISTS idx_gbfs_feed_raw_content_hash
+    ON bronze.gbfs_feed_raw (source_name, feed_type, id DESC)
+    INCLUDE (content_hash);
+
+-- Exactly-once drain of the local spool (utils/spool.py): a payload written twice
+-- after a crash hits this key and is skipped (ON CONFLICT DO NOTHING). It has to
+-- include time_ingested, the partition key.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_gbfs_feed_raw_spool_key
+    ON bronze.gbfs_feed_raw (load_batch_id, source_name, feed_type, time_ingested);
+
+-- Newest row per (source_name, feed_type), kept current by the trigger below in
+-- the same transaction as the insert. Answers "what is the latest payload" and
+-- "did anything arrive since bronze id N" without searching the partitions.
+-- Deleting rows (cold archive, retention) does not move the pointer back.
+CREATE TABLE IF NOT EXISTS bronze.gbfs_feed_latest (
+    source_name     text        NOT NULL,
+    feed_type       text        NOT NULL,
+    bronze_id       bigint      NOT NULL,   -- bronze.gbfs_feed_raw.id of the newest row
+    time_ingested   timestamptz NOT NULL,   -- with bronze_id, the row's primary key
+    last_updated    bigint,
+    content_hash    text,
+    updated_at      timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (source_name, feed_type)
 );
 
-CREATE INDEX IF NOT EXISTS idx_gbfs_feed_raw_type_time
-    ON bronze.gbfs_feed_raw (feed_type, time_ingested);
+-- Statement-level, so a batch insert or COPY updates each pointer once.
+-- Writers of the same feed queue on its pointer row until they commit (the
+-- deduplicating inserts in utils/bronze_loader.py lock it FOR UPDATE before
+-- comparing hashes, so concurrent writers never both store the same payload).
+CREATE OR REPLACE FUNCTION bronze.gbfs_feed_latest_refresh()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO bronze.gbfs_feed_latest AS l (
+        source_name, feed_type, bronze_id, time_ingested, last_updated, content_hash
+    )
+    SELECT DISTINCT ON (source_name, feed_type)
+           source_name, feed_type, id, time_ingested, last_updated, content_hash
+    FROM new_rows
+    ORDER BY source_name, feed_type, id DESC
+    ON CONFLICT (source_name, feed_type) DO UPDATE SET
+        bronze_id = EXCLUDED.bronze_id,
+        time_ingested = EXCLUDED.time_ingested,
+        last_updated = EXCLUDED.last_updated,
+        content_hash = EXCLUDED.content_hash,
+        updated_at = now()
+    -- a concurrent writer may hold a lower id and commit after a higher one
+    WHERE EXCLUDED.bronze_id > l.bronze_id;
+    RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS trg_gbfs_feed_latest ON bronze.gbfs_feed_raw;
+CREATE TRIGGER trg_gbfs_feed_latest
+    AFTER INSERT ON bronze.gbfs_feed_raw
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bronze.gbfs_feed_latest_refresh();
+
+-- Existing databases: point at the rows already in bronze (no-op once filled)
+INSERT INTO bronze.gbfs_feed_latest (source_name, feed_type, bronze_id, time_ingested, last_updated, content_hash)
+SELECT DISTINCT ON (source_name, feed_type)
+       source_name, feed_type, id, time_ingested, last_updated, content_hash
+FROM bronze.gbfs_feed_raw
+ORDER BY source_name, feed_type, id DESC
+ON CONFLICT (source_name, feed_type) DO NOTHING;
+
+-- Superseded: the composite index above covers the feed_type/time lookups, and no
+-- query uses jsonb containment, so the whole-document GIN only cost insert time.
+DROP INDEX IF EXISTS bronze.idx_gbfs_feed_raw_type_time;
+DROP INDEX IF EXISTS bronze.idx_gbfs_feed_raw_gin;
 
-CREATE INDEX IF NOT EXISTS idx_gbfs_feed_raw_gin
-    ON bronze.gbfs_feed_raw USING gin (raw_payload);
+-- If containment queries are ever needed, index only the feed that needs them, e.g.
+-- CREATE INDEX idx_gbfs_feed_raw_status_path
+--     ON bronze.gbfs_feed_raw USING gin (raw_payload jsonb_path_ops)
+--     WHERE feed_type = 'station_status';
@@ -0,0 +1,45 @@
+-- One-off migration of an existing, unpartitioned bronze.gbfs_feed_raw to the
+-- range-partitioned layout of bronze.gbfs_feed_raw.sql.
+--
+-- Nothing is copied: the old table is attached as-is as the first partition,
+-- covering everything up to the start of next month (UTC). Ids keep coming from the
+-- same sequence. Steps:
+--   1. run this file
+--   2. run bronze.gbfs_feed_raw.sql (partitioned indexes; the legacy partition's
+--      existing indexes are attached instead of rebuilt)
+--   3. run maintain_partitions.py to create the upcoming partitions
+-- Once the legacy partition is older than the retention period it is detached or
+-- dropped like any other partition.
+
+BEGIN;
+
+ALTER TABLE bronze.gbfs_feed_raw RENAME TO gbfs_feed_raw_legacy;
+ALTER TABLE bronze.gbfs_feed_raw_legacy RENAME CONSTRAINT gbfs_feed_raw_pkey TO gbfs_feed_raw_legacy_pkey;
+DROP INDEX IF EXISTS bronze.idx_gbfs_feed_raw_type_time;
+DROP INDEX IF EXISTS bronze.idx_gbfs_feed_raw_gin;
+ALTER INDEX IF EXISTS bronze.idx_gbfs_feed_raw_source_feed_time RENAME TO idx_gbfs_feed_raw_legacy_source_feed_time;
+ALTER INDEX IF EXISTS bronze.idx_gbfs_feed_raw_content_hash RENAME TO idx_gbfs_feed_raw_legacy_content_hash;
+-- Partitions can't carry triggers with transition tables; the new parent gets it in step 2
+DROP TRIGGER IF EXISTS trg_gbfs_feed_latest ON bronze.gbfs_feed_raw_legacy;
+
+CREATE TABLE bronze.gbfs_feed_raw (
+    LIKE bronze.gbfs_feed_raw_legacy INCLUDING DEFAULTS INCLUDING GENERATED,
+    PRIMARY KEY (id, time_ingested)
+) PARTITION BY RANGE (time_ingested);
+
+-- The sequence must not be dropped together with the legacy partition
+ALTER SEQUENCE bronze.gbfs_feed_raw_id_seq OWNED BY bronze.gbfs_feed_raw.id;
+
+DO $$
+BEGIN
+    EXECUTE format(
+        'ALTER TABLE bronze.gbfs_feed_raw ATTACH PARTITION bronze.gbfs_feed_raw_legacy FOR VALUES FROM (MINVALUE) TO (%L)',
+        -- partition bounds are in UTC, like maintain_partitions.py
+        (date_trunc('month', now() AT TIME ZONE 'UTC') + interval '1 month') AT TIME ZONE 'UTC'
+    );
+END $$;
+
+CREATE TABLE bronze.gbfs_feed_raw_default
+    PARTITION OF bronze.gbfs_feed_raw DEFAULT;
+
+COMMIT;
@@ -0,0 +1,208 @@
+"""Maintain the time partitions of `bronze.gbfs_feed_raw`.
+
+Creates the partitions for the current and the next BRONZE_PARTITIONS_AHEAD
+periods (BRONZE_PARTITION_INTERVAL: 'month' or 'day'), moving any rows that
+already landed in the default partition for those ranges. Partitions that end
+before the retention cutoff (BRONZE_RETENTION_DAYS, 0 keeps everything) are
+detached, leaving a standalone table to archive, or dropped
+(BRONZE_RETENTION_ACTION). Either way it is a metadata operation, not a DELETE.
+When archive_bronze.py moves old partitions to the cold archive, leave
+BRONZE_RETENTION_DAYS at 0: it retires each partition once it is archived.
+
+Run it daily, e.g. from cron, before the ahead window runs out.
+
+Usage:
+    python "scripts/2. transformations/bronze/maintain_partitions.py"
+    python "scripts/2. transformations/bronze/maintain_partitions.py" --dry-run
+"""
+
+
+import os
+import sys
+import argparse
+import logging
+from datetime import datetime, timedelta, timezone
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+while not os.path.exists(os.path.join(current_dir, 'utils')):
+    parent = os.path.dirname(current_dir)
+    if parent == current_dir:
+        raise RuntimeError("Could not find project root (utils folder not found)")
+    current_dir = parent
+sys.path.insert(0, current_dir)
+
+from utils.db import get_pg_connection
+
+BRONZE_PARTITION_INTERVAL = os.getenv("BRONZE_PARTITION_INTERVAL", "month")
+BRONZE_PARTITIONS_AHEAD = int(os.getenv("BRONZE_PARTITIONS_AHEAD", "3"))
+BRONZE_RETENTION_DAYS = int(os.getenv("BRONZE_RETENTION_DAYS", "0"))
+BRONZE_RETENTION_ACTION = os.getenv("BRONZE_RETENTION_ACTION", "detach")
+
+PARENT_TABLE = "bronze.gbfs_feed_raw"
+DEFAULT_PARTITION = "gbfs_feed_raw_default"
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Range bounds of every partition; the default partition has none
+LIST_PARTITIONS_SQL = r"""
+SELECT c.relname,
+       (regexp_match(pg_get_expr(c.relpartbound, c.oid), 'FROM \((.+)\) TO \((.+)\)'))[1],
+       (regexp_match(pg_get_expr(c.relpartbound, c.oid), 'FROM \((.+)\) TO \((.+)\)'))[2]
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = 'bronze.gbfs_feed_raw'::regclass
+"""
+
+
+def period_start(moment, interval):
+    if interval == "day":
+        return datetime(moment.year, moment.month, moment.day, tzinfo=timezone.utc)
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+
+def next_period(start, interval):
+    if interval == "day":
+        return start + timedelta(days=1)
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(start, interval):
+    suffix = start.strftime("%Y_%m_%d" if interval == "day" else "%Y_%m")
+    return f"gbfs_feed_raw_p{suffix}"
+
+
+def _parse_bound(cur, bound):
+    """Bound expression from pg_get_expr ('2026-10-01 00:00:00+00' or MINVALUE/MAXVALUE)."""
+    if bound in ("MINVALUE", "MAXVALUE"):
+        return None
+    cur.execute(f"SELECT {bound}::timestamptz")
+    return cur.fetchone()[0]
+
+
+def list_partitions(cur):
+    """Return [(name, range_from, range_to)] of the range partitions (None = unbounded)."""
+    cur.execute(LIST_PARTITIONS_SQL)
+    partitions = []
+    for name, bound_from, bound_to in cur.fetchall():
+        if bound_from is None:
+            continue  # default partition
+        partitions.append((name, _parse_bound(cur, bound_from), _parse_bound(cur, bound_to)))
+    return partitions
+
+
+def _overlaps(start, end, partitions):
+    return any(
+        (p_from is None or p_from < end) and (p_to is None or start < p_to)
+        for _, p_from, p_to in partitions
+    )
+
+
+def create_partition(cur, name, start, end):
+    """
+    Create one range partition. Rows for this range already sitting in the
+    default partition would make CREATE fail, so the default partition is
+    detached, emptied into the new partition and attached again.
+    """
+    cur.execute(
+        f"SELECT count(*) FROM bronze.{DEFAULT_PARTITION} WHERE time_ingested >= %s AND time_ingested < %s",
+        (start, end),
+    )
+    stray_rows = cur.fetchone()[0]
+    if stray_rows:
+        cur.execute(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION bronze.{DEFAULT_PARTITION}")
+    cur.execute(f"CREATE TABLE bronze.{name} PARTITION OF {PARENT_TABLE} FOR VALUES FROM (%s) TO (%s)", (start, end))
+    if stray_rows:
+        cur.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM bronze.{DEFAULT_PARTITION}
+                WHERE time_ingested >= %s AND time_ingested < %s
+                RETURNING *
+            )
+            INSERT INTO bronze.{name} (
+                id, feed_type, source_name, load_batch_id, file_name, api_url, version, time_ingested,
+                raw_payload, payload_bytes
+            )
+            SELECT id, feed_type, source_name, load_batch_id, file_name, api_url, version, time_ingested,
+                   raw_payload, payload_bytes
+            FROM moved
+            """,
+            (start, end),
+        )
+        cur.execute(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION bronze.{DEFAULT_PARTITION} DEFAULT")
+        logger.info("Moved %d rows from the default partition into %s", stray_rows, name)
+
+
+def retire_partition(cur, name, action):
+    """Detach one partition from bronze and, with action 'drop', drop it."""
+    cur.execute(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION bronze.{name}")
+    if action == "drop":
+        cur.execute(f"DROP TABLE bronze.{name}")
+
+
+def maintain(interval=None, ahead=None, retention_days=None, retention_action=None, dry_run=False, now=None):
+    interval = interval or BRONZE_PARTITION_INTERVAL
+    ahead = BRONZE_PARTITIONS_AHEAD if ahead is None else ahead
+    retention_days = BRONZE_RETENTION_DAYS if retention_days is None else retention_days
+    retention_action = retention_action or BRONZE_RETENTION_ACTION
+    if interval not in ("day", "month"):
+        raise ValueError(f"BRONZE_PARTITION_INTERVAL must be 'day' or 'month', got {interval!r}")
+    if retention_action not in ("detach", "drop"):
+        raise ValueError(f"BRONZE_RETENTION_ACTION must be 'detach' or 'drop', got {retention_action!r}")
+    now = now or datetime.now(timezone.utc)
+
+    with get_pg_connection() as conn, conn.cursor() as cur:
+        partitions = list_partitions(cur)
+
+        # 1) Current period and the ones ahead. Ranges already covered (e.g. by the
+        #    legacy partition or partitions of another interval) are left alone.
+        start = period_start(now, interval)
+        for _ in range(ahead + 1):
+            end = next_period(start, interval)
+            name = partition_name(start, interval)
+            if not _overlaps(start, end, partitions):
+                logger.info("Creating partition %s [%s, %s)", name, start.date(), end.date())
+                if not dry_run:
+                    create_partition(cur, name, start, end)
+                partitions.append((name, start, end))
+            start = end
+
+        # 2) Retention: partitions whose whole range is older than the cutoff
+        if retention_days > 0:
+            cutoff = now - timedelta(days=retention_days)
+            for name, _, range_to in partitions:
+                if range_to is not None and range_to <= cutoff:
+                    logger.info("Retention: %s partition %s (ends %s)", retention_action, name, range_to.date())
+                    if dry_run:
+                        continue
+                    retire_partition(cur, name, retention_action)
+
+        cur.execute(f"SELECT count(*) FROM bronze.{DEFAULT_PARTITION}")
+        default_rows = cur.fetchone()[0]
+        if default_rows:
+            logger.warning("%d rows sit in the default partition; extend BRONZE_PARTITIONS_AHEAD", default_rows)
+
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interval", choices=("day", "month"), default=None, help="defaults to BRONZE_PARTITION_INTERVAL")
+    parser.add_argument("--ahead", type=int, default=None, help="defaults to BRONZE_PARTITIONS_AHEAD")
+    parser.add_argument("--retention-days", type=int, default=None, help="defaults to BRONZE_RETENTION_DAYS")
+    parser.add_argument("--retention-action", choices=("detach", "drop"), default=None)
+    parser.add_argument("--dry-run", action="store_true", help="only log what would change")
+    args = parser.parse_args()
+
+    maintain(args.interval, args.ahead, args.retention_days, args.retention_action, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 
 
 -- 1. gold.dim_station — SCD Type 2
-CREATE TABLE gold.dim_station (
+CREATE TABLE IF NOT EXISTS gold.dim_station (
     station_key          SERIAL PRIMARY KEY,        -- surrogate key
     station_id           VARCHAR(10)  NOT NULL,     -- business key
     station_name         VARCHAR(255),
@@ -22,7 +22,7 @@ CREATE TABLE gold.dim_station (
 
 
 -- 2. gold.dim_geography — Type 1
-CREATE TABLE gold.dim_geography (
+CREATE TABLE IF NOT EXISTS gold.dim_geography (
     geography_key        SERIAL PRIMARY KEY,
     station_id           VARCHAR(10),               -- link back to station
     region               VARCHAR(100),              -- "South", "East", "North"
@@ -32,7 +32,7 @@ CREATE TABLE gold.dim_geography (
 
 
 -- 3. gold.dim_time — Type 1
-CREATE TABLE gold.dim_time (
+CREATE TABLE IF NOT EXISTS gold.dim_time (
     time_key             SERIAL PRIMARY KEY,
     snapshot_timestamp   TIMESTAMP    NOT NULL,     -- converted from Unix epoch
     snapshot_date        DATE,
@@ -47,7 +47,7 @@ CREATE TABLE gold.dim_time (
 );
 
 -- 4. gold.dim_pricing_plan — Type 1
-CREATE TABLE gold.dim_pricing_plan (
+CREATE TABLE IF NOT EXISTS gold.dim_pricing_plan (
     plan_key             SERIAL PRIMARY KEY,
     plan_id              INT,
     plan_name            VARCHAR(100),              -- Annual 30, Corporate 45
@@ -59,7 +59,7 @@ CREATE TABLE gold.dim_pricing_plan (
 );
 
 -- 5. gold.fact_station_availability — Fact Table (Grain: 1 row per station per 12hr snapshot)
-CREATE TABLE gold.fact_station_availability (
+CREATE TABLE IF NOT EXISTS gold.fact_station_availability (
     fact_key BIGSERIAL PRIMARY KEY,
 
     -- FK dimensions (enforced)
@@ -97,12 +97,23 @@ CREATE TABLE gold.fact_station_availability (
 );
 
 -- Fast joins
-CREATE INDEX idx_fact_station_key ON gold.fact_station_availability(station_key);
-CREATE INDEX idx_fact_time_key ON gold.fact_station_availability(time_key);
+CREATE INDEX IF NOT EXISTS idx_fact_station_key ON gold.fact_station_availability(station_key);
+CREATE INDEX IF NOT EXISTS idx_fact_time_key ON gold.fact_station_availability(time_key);
 
 -- Time-based filtering (most common query)
-CREATE INDEX idx_fact_snapshot_time ON gold.fact_station_availability(snapshot_timestamp);
+CREATE INDEX IF NOT EXISTS idx_fact_snapshot_time ON gold.fact_station_availability(snapshot_timestamp);
 
 -- Composite (very powerful for analytics)
-CREATE INDEX idx_fact_station_time 
-ON gold.fact_station_availability(station_key, snapshot_timestamp);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_fact_station_time 
+ON gold.fact_station_availability(station_key, snapshot_timestamp);
+
+-- 6. gold.load_watermark — last silver history row (load_seq) consumed per source table
+CREATE TABLE IF NOT EXISTS gold.load_watermark (
+    source_table         VARCHAR(100) PRIMARY KEY,
+    last_load_seq        BIGINT       NOT NULL DEFAULT 0,
+    updated_at           TIMESTAMP    DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO gold.load_watermark (source_table)
+VALUES ('silver.bst_station_status_history')
+ON CONFLICT (source_table) DO NOTHING;
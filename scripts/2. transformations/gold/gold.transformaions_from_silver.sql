@@ -7,8 +7,8 @@
         * dim_pricing_plan: Transforms pricing plan data from silver.bst_plans to gold.dim_pricing_plan.
         * dim_geography: Extracts region and neighborhood information from silver.bst_station_information and populates gold.dim_geography.
         * dim_station: Implements Type 2 Slowly Changing Dimension logic to track changes in station attributes over time in gold.dim_station.
-        * dim_time: Converts Unix epoch timestamps from silver.bst_station_status into rich time attributes in gold.dim_time.
-        * fact_station_availability: Combines data from dimensions and silver.bst_station_status to populate the fact table gold.fact_station_availability with measures and status flags.
+        * dim_time: Converts Unix epoch timestamps from silver.bst_station_status_history into rich time attributes in gold.dim_time.
+        * fact_station_availability: Combines data from dimensions and silver.bst_station_status_history to populate the fact table gold.fact_station_availability with measures and status flags.
     - The script uses incremental loading techniques and conflict handling to ensure data integrity and efficient processing.
 
     Usage:
@@ -106,6 +106,21 @@ WHERE NOT EXISTS (
 );
 
 
+-- 4-5. Snapshots appended to the silver history since the last run. The range
+-- (after_seq, upto_seq] of load_seq is pinned once, so dim_time, the facts and
+-- the watermark see the same rows even while silver keeps loading. load_seq
+-- follows silver's commit order, so a snapshot committed after this run read
+-- upto_seq is numbered above it and picked up next time.
+BEGIN;
+
+CREATE TEMP TABLE gold_batch ON COMMIT DROP AS
+SELECT
+    last_load_seq AS after_seq,
+    (SELECT COALESCE(MAX(load_seq), 0) FROM silver.bst_station_status_history) AS upto_seq
+FROM gold.load_watermark
+WHERE source_table = 'silver.bst_station_status_history'
+FOR UPDATE;
+
 -- 4. dim_time
 INSERT INTO gold.dim_time
     (snapshot_timestamp, snapshot_date, hour_of_day, day_of_week,
@@ -121,9 +136,12 @@ SELECT DISTINCT
     EXTRACT(HOUR FROM ts) IN (7,8,9) AS is_morning_peak,
     EXTRACT(HOUR FROM ts) IN (16,17,18,19) AS is_evening_peak
 FROM (
+    -- only the snapshots appended since the last fact load
     SELECT 
         TO_TIMESTAMP(ss.last_reported) AS ts
-    FROM silver.bst_station_status ss
+    FROM silver.bst_station_status_history ss, gold_batch b
+    WHERE ss.load_seq > b.after_seq
+      AND ss.load_seq <= b.upto_seq
 ) t
 WHERE NOT EXISTS (
     SELECT 1 
@@ -190,7 +208,7 @@ FROM (
     SELECT 
         ss.*,
         TO_TIMESTAMP(ss.last_reported) AS ts
-    FROM silver.bst_station_status ss
+    FROM silver.bst_station_status_history ss
 ) s
 
 -- Dimensions
@@ -204,11 +222,20 @@ JOIN gold.dim_time dt
 LEFT JOIN gold.dim_geography dg 
   ON dg.station_id = s.station_id
 
--- Incremental load (optional but efficient)
-WHERE s.ts > (
-    SELECT COALESCE(MAX(snapshot_timestamp), '1900-01-01')
-    FROM gold.fact_station_availability
-)
+-- Incremental load: every snapshot appended to the history since the last run,
+-- including late ones older than the newest fact
+CROSS JOIN gold_batch b
+WHERE s.load_seq > b.after_seq
+  AND s.load_seq <= b.upto_seq
 
 -- 🚀 Prevent duplicates (critical)
-ON CONFLICT (station_key, snapshot_timestamp) DO NOTHING;
\ No newline at end of file
+ON CONFLICT (station_key, snapshot_timestamp) DO NOTHING;
+
+UPDATE gold.load_watermark w
+SET last_load_seq = b.upto_seq,
+    updated_at = now()
+FROM gold_batch b
+WHERE w.source_table = 'silver.bst_station_status_history'
+  AND b.upto_seq > w.last_load_seq;
+
+COMMIT;
\ No newline at end of file
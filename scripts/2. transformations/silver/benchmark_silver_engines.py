@@ -0,0 +1,133 @@
+"""Compare the SQL and pandas silver engines on the same bronze rows.
+
+Runs the station_information, station_status and pricing plan loaders of each
+engine (see load_silver.py --engine) over the bronze rows since --since (all of
+bronze by default), inside a transaction that is rolled back afterwards, so
+silver is left untouched and both engines start from the same state. For each
+feed it prints the time taken, the merge counts and a checksum of the
+resulting silver table; matching checksums mean both engines produce the same
+rows.
+
+With --from-empty the target tables are truncated (inside the transaction)
+before each engine runs, which measures a full backfill. TRUNCATE locks the
+tables until the rollback, so don't use it while silver is being read.
+
+Usage:
+    python "scripts/2. transformations/silver/benchmark_silver_engines.py"
+    python "scripts/2. transformations/silver/benchmark_silver_engines.py" --since 2025-06-01 --from-empty
+"""
+
+
+import os
+import sys
+import time
+import argparse
+import logging
+from datetime import datetime, timezone
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)  # load_silver.py
+while not os.path.exists(os.path.join(current_dir, 'utils')):
+    parent = os.path.dirname(current_dir)
+    if parent == current_dir:
+        raise RuntimeError("Could not find project root (utils folder not found)")
+    current_dir = parent
+sys.path.insert(0, current_dir)
+
+from utils.db import get_pg_connection
+from utils.silver_frames import STATION_INFORMATION_COLUMNS, STATION_STATUS_COLUMNS, PLAN_COLUMNS
+from load_silver import settled_bronze_id, silver_loaders
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Feed -> (silver table to checksum, its key order, content columns)
+TABLES = {
+    "station_information": ("silver.bst_station_information", "station_id", STATION_INFORMATION_COLUMNS),
+    "station_status": ("silver.bst_station_status_history", "station_id, last_reported", STATION_STATUS_COLUMNS),
+    "system_pricing_plans": ("silver.bst_plans", "plan_id", PLAN_COLUMNS),
+}
+
+
+def table_checksum(cur, table, order, columns):
+    """Row count and md5 over the content columns (timestamps of the load itself left out)."""
+    names = ", ".join(c for c, _, _ in columns)
+    cur.execute(
+        f"SELECT count(*), md5(string_agg(ROW({names})::text, E'\\n' ORDER BY {order})) FROM {table}"
+    )
+    return cur.fetchone()
+
+
+def run_engine(conn, engine, upto_id, since, from_empty):
+    loaders = silver_loaders(engine)
+    results = []
+    try:
+        with conn.cursor() as cur:
+            if from_empty:
+                cur.execute(
+                    "TRUNCATE silver.bst_station_information, silver.bst_station_status, "
+                    "silver.bst_station_status_history, silver.bst_plans"
+                )
+            for feed_type, (table, order, columns) in TABLES.items():
+                loader, _ = loaders[feed_type]
+                started = time.monotonic()
+                counts = loader(cur, 0, upto_id, since)
+                elapsed = time.monotonic() - started
+                rows, checksum = table_checksum(cur, table, order, columns)
+                results.append({
+                    "engine": engine,
+                    "feed": feed_type,
+                    "seconds": elapsed,
+                    "counts": counts,
+                    "rows": rows,
+                    "checksum": checksum,
+                })
+    finally:
+        conn.rollback()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since", default=None, help="ISO date or datetime (UTC if no offset); defaults to all of bronze")
+    parser.add_argument("--from-empty", action="store_true", help="truncate the target tables first (rolled back)")
+    args = parser.parse_args()
+
+    since = None
+    if args.since:
+        since = datetime.fromisoformat(args.since)
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+
+    results = []
+    with get_pg_connection() as conn:
+        upto_id = settled_bronze_id(conn)
+        if upto_id is None:
+            logger.error("Bronze writes still in flight, try again")
+            return
+        for engine in ("sql", "pandas"):
+            logger.info("Running the %s engine over bronze ids up to %d", engine, upto_id)
+            results.extend(run_engine(conn, engine, upto_id, since, args.from_empty))
+
+    print(
+        f"{'engine':<7} {'feed':<22} {'seconds':>8} {'inserted':>9} {'updated':>8} {'unchanged':>10} "
+        f"{'rejected':>9} {'rows':>9}  checksum"
+    )
+    for r in results:
+        c = r["counts"]
+        print(
+            f"{r['engine']:<7} {r['feed']:<22} {r['seconds']:>8.2f} {c['inserted']:>9} {c['updated']:>8} "
+            f"{c['unchanged']:>10} {c['rejected']:>9} {r['rows']:>9}  {r['checksum']}"
+        )
+    by_feed = {}
+    for r in results:
+        by_feed.setdefault(r["feed"], set()).add(r["checksum"])
+    for feed, checksums in by_feed.items():
+        print(f"{feed}: {'same output' if len(checksums) == 1 else 'OUTPUT DIFFERS'}")
+
+
+if __name__ == "__main__":
+    main()
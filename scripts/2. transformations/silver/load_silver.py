@@ -3,14 +3,64 @@
 This script reads raw JSON payloads stored in `bronze.gbfs_feed_raw` (source_name = 'bike-share-json')
 and extracts the GBFS feed objects into normalized SILVER tables.
 
+station_status is kept as an append-only history of every distinct
+(station_id, last_reported) snapshot; `silver.bst_station_status` holds the
+latest one per station.
+
+Loading is incremental: `silver.load_watermark` holds the last bronze id merged
+per (source_name, feed_type), each loader only reads rows above it, and the
+watermark is advanced in the same transaction as the merge. A run exits at
+once when bronze.gbfs_feed_latest shows no feed above its watermark.
+Bronze ids follow arrival, not fetch time: a payload drained late from the
+spool or replayed from the archive gets a new id but keeps its time_ingested.
+The upserted feeds keep the newest time_ingested merged per feed
+(load_watermark.last_time_ingested) and skip payloads at or below it; each
+row also stores the time_ingested of the payload that last changed it
+(source_time_ingested) and is only replaced by a newer one. Rows whose
+content didn't change are not rewritten.
+
+The loaders run concurrently, each on its own pooled connection, in the order
+of their declared dependencies. Nothing is committed until every loader has
+succeeded; then all transactions are prepared and committed (SILVER_TWO_PHASE,
+on by default), so a run is published for every feed or for none: once the
+last PREPARE succeeded the run only commits, and the prepared transactions a
+crash left behind are finished by the next run (recover_prepared). With
+SILVER_TWO_PHASE=false the transactions are committed one by one and a crash
+midway publishes some feeds but not others; the per-feed watermarks make the
+next run pick up exactly where each feed stopped. Runs that read through a
+temporary table (the pandas engine, --since over the cold archive), and runs
+against a server with max_prepared_transactions = 0, put every loader on one
+connection instead, which commits atomically on its own.
+
+Records that would fail a cast (a non-numeric capacity, an over-long name, ...)
+are written to `silver.rejected_rows` with reason codes and left out, so one
+bad station doesn't abort the run; the checks are in utils/silver_checks.py.
+
+With --engine pandas (SILVER_ENGINE), station_information, station_status and
+the pricing plans are normalized in Python (utils/silver_frames.py) and COPYed
+into a staging table, moving the JSON work off the database server; the merge
+into silver is the same.
+
+With --since, the watermark is ignored and every bronze row ingested since then
+is merged again (it is never moved back). Rows already moved to the cold
+archive (see bronze/archive_bronze.py) are loaded back into a temporary table
+and read together with bronze.
+
 Usage:
     python scripts/3. transformations/silver/load_silver.py
+    python scripts/3. transformations/silver/load_silver.py --since 2025-06-01
 """
 
 
 import os
 import sys
+import time
+import uuid
+import argparse
 import logging
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timedelta, timezone
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 while not os.path.exists(os.path.join(current_dir, 'utils')):
@@ -20,7 +70,19 @@ while not os.path.exists(os.path.join(current_dir, 'utils')):
     current_dir = parent
 sys.path.insert(0, current_dir)
 
+import psycopg2
+
 from utils.db import get_pg_connection
+from utils.cold_archive import ColdArchive
+from utils import silver_frames
+from utils.silver_frames import SILVER_ENGINE
+from utils.silver_checks import (
+    STATION_INFORMATION_CHECKS,
+    STATION_STATUS_CHECKS,
+    SYSTEM_INFORMATION_CHECKS,
+    PLAN_CHECKS,
+    reasons_sql,
+)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -28,274 +90,1057 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+SOURCE_NAME = "bike-share-json"
+
+# Loaders run at once, each on its own pooled connection
+SILVER_MAX_WORKERS = int(os.getenv("SILVER_MAX_WORKERS", "5"))
+# Publish with two-phase commit (needs max_prepared_transactions > 0 on the server)
+SILVER_TWO_PHASE = os.getenv("SILVER_TWO_PHASE", "true").lower() == "true"
+XID_PREFIX = "load_silver"
+# Attempts at a COMMIT PREPARED that failed once every transaction was prepared
+SILVER_COMMIT_ATTEMPTS = int(os.getenv("SILVER_COMMIT_ATTEMPTS", "5"))
+
+# How long to wait for in-flight bronze writes, or for a feed's watermark row
+# held by another run, before giving up on this run
+SILVER_WATERMARK_LOCK_TIMEOUT = os.getenv("SILVER_WATERMARK_LOCK_TIMEOUT", "10s")
+
+# Monthly partitions of silver.bst_station_status_history created ahead of time
+STATUS_HISTORY_PARTITIONS_AHEAD = int(os.getenv("STATUS_HISTORY_PARTITIONS_AHEAD", "1"))
+
+# Bronze rows a loader reads: above the feed's watermark, up to the settled id,
+# optionally from --since on. The id range is answered by the
+# (source_name, feed_type, id DESC) index of every partition.
+BRONZE_RANGE = """
+              AND id > %(after_id)s
+              AND id <= %(upto_id)s
+              AND (%(since)s::timestamptz IS NULL OR time_ingested >= %(since)s)"""
+
+# Newest bronze time_ingested merged into an upserted feed
+# (silver.load_watermark.last_time_ingested). Every payload is a full snapshot,
+# so one at or below it is older than what silver already reflects and is
+# skipped, even for rows it left unchanged.
+APPLIED_SINCE = """
+              AND time_ingested > COALESCE((
+                  SELECT w.last_time_ingested
+                  FROM silver.load_watermark w
+                  WHERE w.source_name = 'bike-share-json' AND w.feed_type = '{feed_type}'
+              ), '-infinity')"""
+
+ADVANCE_APPLIED = """
+        applied AS (
+            UPDATE silver.load_watermark
+            SET last_time_ingested = GREATEST(last_time_ingested, (SELECT max(time_ingested) FROM latest))
+            WHERE source_name = 'bike-share-json' AND feed_type = '{feed_type}'
+        )"""
+
+
+def settled_bronze_id(conn):
+    """
+    Highest bronze id below which every row is committed. Ids come from a
+    sequence, so a writer still in flight can hold a lower id than rows
+    already visible; a short SHARE lock waits for those writers to finish
+    (and holds new ones back for a moment). Returns None when the lock isn't
+    granted within SILVER_WATERMARK_LOCK_TIMEOUT.
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL lock_timeout = %s", (SILVER_WATERMARK_LOCK_TIMEOUT,))
+            cur.execute("LOCK TABLE bronze.gbfs_feed_raw IN SHARE MODE")
+            cur.execute("SELECT COALESCE(max(id), 0) FROM bronze.gbfs_feed_raw")
+            upto_id = cur.fetchone()[0]
+        conn.commit()
+    except psycopg2.errors.LockNotAvailable:
+        conn.rollback()
+        return None
+    return upto_id
+
+
+def feeds_with_new_rows(conn, feed_types, source_name=SOURCE_NAME):
+    """
+    Feeds whose newest bronze row (bronze.gbfs_feed_latest) is above their
+    watermark. The pointer only moves on commit, so this needs no lock and
+    lets a run with nothing to do stop before settled_bronze_id.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT l.feed_type
+            FROM bronze.gbfs_feed_latest l
+            LEFT JOIN silver.load_watermark w
+              ON w.source_name = l.source_name AND w.feed_type = l.feed_type
+            WHERE l.source_name = %s
+              AND l.feed_type = ANY(%s)
+              AND l.bronze_id > COALESCE(w.last_bronze_id, 0)
+            """,
+            (source_name, list(feed_types)),
+        )
+        feeds = [row[0] for row in cur.fetchall()]
+    conn.commit()
+    return feeds
+
+
+def latest_bronze_row(cur, feed_type, after_id, upto_id, since=None, source_name=SOURCE_NAME):
+    """
+    (id, time_ingested) of the feed's newest bronze row from
+    bronze.gbfs_feed_latest, or None when it is outside this run's range
+    (e.g. written after upto_id was settled).
+    """
+    cur.execute(
+        "SELECT bronze_id, time_ingested FROM bronze.gbfs_feed_latest WHERE source_name = %s AND feed_type = %s",
+        (source_name, feed_type),
+    )
+    row = cur.fetchone()
+    if row is None or not after_id < row[0] <= upto_id or (since is not None and row[1] < since):
+        return None
+    return row
+
+
+def read_watermark(cur, feed_type, source_name=SOURCE_NAME):
+    """
+    Last bronze id merged for a feed; the row is locked until commit so runs
+    don't overlap. A run still holding it (or a prepared transaction a crashed
+    run left behind) makes this fail after SILVER_WATERMARK_LOCK_TIMEOUT
+    instead of waiting forever.
+    """
+    try:
+        cur.execute("SET LOCAL lock_timeout = %s", (SILVER_WATERMARK_LOCK_TIMEOUT,))
+        cur.execute(
+            """
+            INSERT INTO silver.load_watermark (source_name, feed_type)
+            VALUES (%s, %s)
+            ON CONFLICT (source_name, feed_type) DO NOTHING
+            """,
+            (source_name, feed_type),
+        )
+        cur.execute(
+            """
+            SELECT last_bronze_id
+            FROM silver.load_watermark
+            WHERE source_name = %s AND feed_type = %s
+            FOR UPDATE
+            """,
+            (source_name, feed_type),
+        )
+        watermark = cur.fetchone()[0]
+    except psycopg2.errors.LockNotAvailable as e:
+        raise RuntimeError(
+            f"Watermark of {feed_type} still locked after {SILVER_WATERMARK_LOCK_TIMEOUT}: another load_silver "
+            f"run is publishing, or a crashed run left a prepared transaction (see pg_prepared_xacts)"
+        ) from e
+    cur.execute("SET LOCAL lock_timeout = DEFAULT")
+    return watermark
+
+
+def advance_watermark(cur, feed_type, upto_id, source_name=SOURCE_NAME):
+    cur.execute(
+        """
+        UPDATE silver.load_watermark
+        SET last_bronze_id = GREATEST(last_bronze_id, %s),
+            updated_at = now()
+        WHERE source_name = %s AND feed_type = %s
+        """,
+        (upto_id, source_name, feed_type),
+    )
+
+
+def merge_counts(cur):
+    """Counts from the closing SELECT of a loader statement: inserted, updated, unchanged, rejected."""
+    inserted, updated, unchanged, rejected = cur.fetchone()
+    return {"inserted": inserted, "updated": updated, "unchanged": unchanged, "rejected": rejected}
 
-def load_station_information(cur):
+
+def load_station_information(cur, after_id, upto_id, since=None, source="bronze.gbfs_feed_raw"):
     logger.info("Loading silver.bst_station_information from bronze.gbfs_feed_raw")
     cur.execute(
         """
         WITH station_rows AS (
             SELECT
                 (jsonb_array_elements(raw_payload->'data'->'stations')) AS station,
-                time_ingested
-            FROM bronze.gbfs_feed_raw
+                time_ingested,
+                id
+            FROM {source}
             WHERE source_name = 'bike-share-json'
-              AND feed_type = 'station_information'
+              AND feed_type = 'station_information'{bronze_range}
         ),
-        latest AS (
-            SELECT DISTINCT ON (station->>'station_id') station
+        checked AS (
+            SELECT station_rows.*, {reasons} AS reasons
             FROM station_rows
-            ORDER BY station->>'station_id', time_ingested DESC
-        )
-        INSERT INTO silver.bst_station_information (
-            station_id,
-            name,
-            physical_configuration,
-            lat,
-            lon,
-            address,
-            capacity,
-            is_charging_station,
-            rental_methods,
-            groups,
-            obcn,
-            short_name,
-            nearby_distance,
-            _ride_code_support,
-            rental_uris
-        )
+        ),
+        -- records that would fail a cast are set aside instead of failing the load
+        rejected AS (
+            INSERT INTO silver.rejected_rows (feed_type, bronze_id, record_key, reasons, record)
+            SELECT 'station_information', id, station->>'station_id', reasons, station
+            FROM checked
+            WHERE cardinality(reasons) > 0
+            ON CONFLICT (feed_type, bronze_id, (md5(record::text))) DO NOTHING
+        ),
+        latest AS (
+            SELECT DISTINCT ON (station->>'station_id') station, time_ingested
+            FROM checked
+            WHERE cardinality(reasons) = 0{applied_since}
+            ORDER BY station->>'station_id', time_ingested DESC, id DESC
+        ),
+        merged AS (
+            INSERT INTO silver.bst_station_information AS t (
+                station_id,
+                name,
+                physical_configuration,
+                lat,
+                lon,
+                address,
+                capacity,
+                is_charging_station,
+                rental_methods,
+                groups,
+                obcn,
+                short_name,
+                nearby_distance,
+                _ride_code_support,
+                rental_uris,
+                source_time_ingested
+            )
+            SELECT
+                station->>'station_id',
+                station->>'name',
+                station->>'physical_configuration',
+                NULLIF(station->>'lat', '')::numeric,
+                NULLIF(station->>'lon', '')::numeric,
+                station->>'address',
+                NULLIF(station->>'capacity', '')::int,
+                NULLIF(station->>'is_charging_station', '')::boolean,
+                ARRAY(SELECT jsonb_array_elements_text(COALESCE(station->'rental_methods', '[]'::jsonb))),
+                ARRAY(SELECT jsonb_array_elements_text(COALESCE(station->'groups', '[]'::jsonb))),
+                station->>'obcn',
+                station->>'short_name',
+                NULLIF(station->>'nearby_distance', '')::numeric,
+                NULLIF(station->>'_ride_code_support', '')::boolean,
+                station->'rental_uris',
+                time_ingested
+            FROM latest
+            ON CONFLICT (station_id) DO UPDATE SET
+                name = EXCLUDED.name,
+                physical_configuration = EXCLUDED.physical_configuration,
+                lat = EXCLUDED.lat,
+                lon = EXCLUDED.lon,
+                address = EXCLUDED.address,
+                capacity = EXCLUDED.capacity,
+                is_charging_station = EXCLUDED.is_charging_station,
+                rental_methods = EXCLUDED.rental_methods,
+                groups = EXCLUDED.groups,
+                obcn = EXCLUDED.obcn,
+                short_name = EXCLUDED.short_name,
+                nearby_distance = EXCLUDED.nearby_distance,
+                _ride_code_support = EXCLUDED._ride_code_support,
+                rental_uris = EXCLUDED.rental_uris,
+                source_time_ingested = EXCLUDED.source_time_ingested,
+                updated_at = now()
+            -- a spooled or replayed payload older than the stored one (a newer
+            -- bronze id, an older time_ingested) never moves a station back
+            WHERE (t.source_time_ingested IS NULL
+                   OR EXCLUDED.source_time_ingested > t.source_time_ingested)
+              -- unchanged rows are not rewritten
+              AND (
+                  t.name,
+                  t.physical_configuration,
+                  t.lat,
+                  t.lon,
+                  t.address,
+                  t.capacity,
+                  t.is_charging_station,
+                  t.rental_methods,
+                  t.groups,
+                  t.obcn,
+                  t.short_name,
+                  t.nearby_distance,
+                  t._ride_code_support,
+                  t.rental_uris
+              ) IS DISTINCT FROM (
+                  EXCLUDED.name,
+                  EXCLUDED.physical_configuration,
+                  EXCLUDED.lat,
+                  EXCLUDED.lon,
+                  EXCLUDED.address,
+                  EXCLUDED.capacity,
+                  EXCLUDED.is_charging_station,
+                  EXCLUDED.rental_methods,
+                  EXCLUDED.groups,
+                  EXCLUDED.obcn,
+                  EXCLUDED.short_name,
+                  EXCLUDED.nearby_distance,
+                  EXCLUDED._ride_code_support,
+                  EXCLUDED.rental_uris
+              )
+            RETURNING (xmax = 0) AS inserted
+        ),{advance_applied}
         SELECT
-            station->>'station_id',
-            station->>'name',
-            station->>'physical_configuration',
-            NULLIF(station->>'lat', '')::numeric,
-            NULLIF(station->>'lon', '')::numeric,
-            station->>'address',
-            NULLIF(station->>'capacity', '')::int,
-            NULLIF(station->>'is_charging_station', '')::boolean,
-            ARRAY(SELECT jsonb_array_elements_text(COALESCE(station->'rental_methods', '[]'::jsonb))),
-            ARRAY(SELECT jsonb_array_elements_text(COALESCE(station->'groups', '[]'::jsonb))),
-            station->>'obcn',
-            station->>'short_name',
-            NULLIF(station->>'nearby_distance', '')::numeric,
-            NULLIF(station->>'_ride_code_support', '')::boolean,
-            station->'rental_uris'
-        FROM latest
-        ON CONFLICT (station_id) DO UPDATE SET
-            name = EXCLUDED.name,
-            physical_configuration = EXCLUDED.physical_configuration,
-            lat = EXCLUDED.lat,
-            lon = EXCLUDED.lon,
-            address = EXCLUDED.address,
-            capacity = EXCLUDED.capacity,
-            is_charging_station = EXCLUDED.is_charging_station,
-            rental_methods = EXCLUDED.rental_methods,
-            groups = EXCLUDED.groups,
-            obcn = EXCLUDED.obcn,
-            short_name = EXCLUDED.short_name,
-            nearby_distance = EXCLUDED.nearby_distance,
-            _ride_code_support = EXCLUDED._ride_code_support,
-            rental_uris = EXCLUDED.rental_uris,
-            updated_at = now();
-        """
+            count(*) FILTER (WHERE inserted),
+            count(*) FILTER (WHERE NOT inserted),
+            (SELECT count(*) FROM latest) - count(*),
+            (SELECT count(*) FROM checked WHERE cardinality(reasons) > 0)
+        FROM merged;
+        """.format(
+            source=source,
+            bronze_range=BRONZE_RANGE,
+            applied_since=APPLIED_SINCE.format(feed_type="station_information"),
+            advance_applied=ADVANCE_APPLIED.format(feed_type="station_information"),
+            reasons=reasons_sql("station", STATION_INFORMATION_CHECKS),
+        ),
+        {"after_id": after_id, "upto_id": upto_id, "since": since},
     )
+    return merge_counts(cur)
+
+
+def _month_start(moment):
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+
+def _next_month(start):
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1, tzinfo=timezone.utc)
 
 
-def load_station_status(cur):
-    logger.info("Loading silver.bst_station_status from bronze.gbfs_feed_raw")
+STATUS_HISTORY_DEFAULT = "bst_station_status_history_default"
+
+
+def ensure_status_history_partitions(cur, now=None, ahead=STATUS_HISTORY_PARTITIONS_AHEAD):
+    """
+    Create the monthly partitions of silver.bst_station_status_history (range
+    on last_reported, epoch seconds) for the current and the next `ahead`
+    months. Snapshots outside them land in the default partition; those that
+    fall into a partition being created would make CREATE fail, so the default
+    partition is detached, emptied into the new partition and attached again
+    (as maintain_partitions.py does for bronze).
+    """
+    start = _month_start(now or datetime.now(timezone.utc))
+    for _ in range(ahead + 1):
+        end = _next_month(start)
+        name = f"bst_station_status_history_p{start:%Y_%m}"
+        cur.execute("SELECT to_regclass(%s)", (f"silver.{name}",))
+        if cur.fetchone()[0] is None:
+            bounds = (int(start.timestamp()), int(end.timestamp()))
+            cur.execute(
+                f"SELECT count(*) FROM silver.{STATUS_HISTORY_DEFAULT} WHERE last_reported >= %s AND last_reported < %s",
+                bounds,
+            )
+            stray_rows = cur.fetchone()[0]
+            logger.info("Creating partition silver.%s", name)
+            if stray_rows:
+                cur.execute(f"ALTER TABLE silver.bst_station_status_history DETACH PARTITION silver.{STATUS_HISTORY_DEFAULT}")
+            cur.execute(
+                f"CREATE TABLE silver.{name} PARTITION OF silver.bst_station_status_history "
+                f"FOR VALUES FROM (%s) TO (%s)",
+                bounds,
+            )
+            if stray_rows:
+                cur.execute(
+                    f"""
+                    WITH moved AS (
+                        DELETE FROM silver.{STATUS_HISTORY_DEFAULT}
+                        WHERE last_reported >= %s AND last_reported < %s
+                        RETURNING *
+                    )
+                    INSERT INTO silver.{name}
+                    SELECT * FROM moved
+                    """,
+                    bounds,
+                )
+                cur.execute(
+                    f"ALTER TABLE silver.bst_station_status_history "
+                    f"ATTACH PARTITION silver.{STATUS_HISTORY_DEFAULT} DEFAULT"
+                )
+                logger.info("Moved %d snapshots from the default partition into silver.%s", stray_rows, name)
+        start = end
+
+
+def load_station_status(cur, after_id, upto_id, since=None, source="bronze.gbfs_feed_raw"):
+    """
+    Append every new (station_id, last_reported) snapshot to
+    silver.bst_station_status_history (a snapshot repeated across polls is
+    stored once), then move silver.bst_station_status, the latest state per
+    station, forward from the snapshots just appended. Counts refer to the
+    history: snapshots appended, and snapshots already stored (unchanged).
+    """
+    logger.info("Loading silver.bst_station_status_history from bronze.gbfs_feed_raw")
+    ensure_status_history_partitions(cur)
     cur.execute(
         """
         WITH status_rows AS (
             SELECT
                 (jsonb_array_elements(raw_payload->'data'->'stations')) AS station,
-                time_ingested
-            FROM bronze.gbfs_feed_raw
+                id
+            FROM {source}
             WHERE source_name = 'bike-share-json'
-              AND feed_type = 'station_status'
+              AND feed_type = 'station_status'{bronze_range}
         ),
-        latest AS (
-            SELECT DISTINCT ON (station->>'station_id') station
+        checked AS (
+            SELECT status_rows.*, {reasons} AS reasons
             FROM status_rows
-            ORDER BY station->>'station_id', time_ingested DESC
-        )
-        INSERT INTO silver.bst_station_status (
-            station_id,
-            num_bikes_available,
-            num_bikes_disabled,
-            status,
-            traffic,
-            num_bikes_available_types,
-            num_docks_available,
-            num_docks_disabled,
-            last_reported,
-            is_installed,
-            is_renting,
-            is_returning
+        ),
+        -- records that would fail a cast are set aside instead of failing the load
+        rejected AS (
+            INSERT INTO silver.rejected_rows (feed_type, bronze_id, record_key, reasons, record)
+            SELECT 'station_status', id, station->>'station_id', reasons, station
+            FROM checked
+            WHERE cardinality(reasons) > 0
+            ON CONFLICT (feed_type, bronze_id, (md5(record::text))) DO NOTHING
+        ),
+        snapshots AS (
+            SELECT DISTINCT ON (station->>'station_id', NULLIF(station->>'last_reported', '')::int)
+                station,
+                id AS bronze_id
+            FROM checked
+            WHERE cardinality(reasons) = 0
+              AND NULLIF(station->>'last_reported', '') IS NOT NULL
+            ORDER BY station->>'station_id', NULLIF(station->>'last_reported', '')::int, id
+        ),
+        appended AS (
+            INSERT INTO silver.bst_station_status_history (
+                station_id,
+                last_reported,
+                num_bikes_available,
+                num_bikes_disabled,
+                status,
+                traffic,
+                num_bikes_available_types,
+                num_docks_available,
+                num_docks_disabled,
+                is_installed,
+                is_renting,
+                is_returning,
+                bronze_id
+            )
+            SELECT
+                station->>'station_id',
+                NULLIF(station->>'last_reported', '')::int,
+                NULLIF(station->>'num_bikes_available', '')::int,
+                NULLIF(station->>'num_bikes_disabled', '')::int,
+                station->>'status',
+                station->'traffic',
+                station->'num_bikes_available_types',
+                NULLIF(station->>'num_docks_available', '')::int,
+                NULLIF(station->>'num_docks_disabled', '')::int,
+                NULLIF(station->>'is_installed', '')::int,
+                NULLIF(station->>'is_renting', '')::int,
+                NULLIF(station->>'is_returning', '')::int,
+                bronze_id
+            FROM snapshots
+            ON CONFLICT (station_id, last_reported) DO NOTHING
+            RETURNING *
+        ),
+        latest AS (
+            SELECT DISTINCT ON (station_id) *
+            FROM appended
+            ORDER BY station_id, last_reported DESC
+        ),
+        current_state AS (
+            INSERT INTO silver.bst_station_status (
+                station_id,
+                num_bikes_available,
+                num_bikes_disabled,
+                status,
+                traffic,
+                num_bikes_available_types,
+                num_docks_available,
+                num_docks_disabled,
+                last_reported,
+                is_installed,
+                is_renting,
+                is_returning
+            )
+            SELECT
+                station_id,
+                num_bikes_available,
+                num_bikes_disabled,
+                status,
+                traffic,
+                num_bikes_available_types,
+                num_docks_available,
+                num_docks_disabled,
+                last_reported,
+                is_installed,
+                is_renting,
+                is_returning
+            FROM latest
+            ON CONFLICT (station_id) DO UPDATE SET
+                num_bikes_available = EXCLUDED.num_bikes_available,
+                num_bikes_disabled = EXCLUDED.num_bikes_disabled,
+                status = EXCLUDED.status,
+                traffic = EXCLUDED.traffic,
+                num_bikes_available_types = EXCLUDED.num_bikes_available_types,
+                num_docks_available = EXCLUDED.num_docks_available,
+                num_docks_disabled = EXCLUDED.num_docks_disabled,
+                last_reported = EXCLUDED.last_reported,
+                is_installed = EXCLUDED.is_installed,
+                is_renting = EXCLUDED.is_renting,
+                is_returning = EXCLUDED.is_returning,
+                updated_at = now()
+            -- a re-merge (--since) or a late snapshot never moves a station back in time
+            WHERE silver.bst_station_status.last_reported IS NULL
+               OR EXCLUDED.last_reported > silver.bst_station_status.last_reported
         )
         SELECT
-            station->>'station_id',
-            NULLIF(station->>'num_bikes_available', '')::int,
-            NULLIF(station->>'num_bikes_disabled', '')::int,
-            station->>'status',
-            station->'traffic',
-            station->'num_bikes_available_types',
-            NULLIF(station->>'num_docks_available', '')::int,
-            NULLIF(station->>'num_docks_disabled', '')::int,
-            NULLIF(station->>'last_reported', '')::int,
-            NULLIF(station->>'is_installed', '')::int,
-            NULLIF(station->>'is_renting', '')::int,
-            NULLIF(station->>'is_returning', '')::int
-        FROM latest
-        ON CONFLICT (station_id) DO UPDATE SET
-            num_bikes_available = EXCLUDED.num_bikes_available,
-            num_bikes_disabled = EXCLUDED.num_bikes_disabled,
-            status = EXCLUDED.status,
-            traffic = EXCLUDED.traffic,
-            num_bikes_available_types = EXCLUDED.num_bikes_available_types,
-            num_docks_available = EXCLUDED.num_docks_available,
-            num_docks_disabled = EXCLUDED.num_docks_disabled,
-            last_reported = EXCLUDED.last_reported,
-            is_installed = EXCLUDED.is_installed,
-            is_renting = EXCLUDED.is_renting,
-            is_returning = EXCLUDED.is_returning,
-            updated_at = now();
-        """
+            (SELECT count(*) FROM appended),
+            0,
+            (SELECT count(*) FROM snapshots) - (SELECT count(*) FROM appended),
+            (SELECT count(*) FROM checked WHERE cardinality(reasons) > 0);
+        """.format(
+            source=source,
+            bronze_range=BRONZE_RANGE,
+            reasons=reasons_sql("station", STATION_STATUS_CHECKS),
+        ),
+        {"after_id": after_id, "upto_id": upto_id, "since": since},
     )
+    return merge_counts(cur)
 
 
-def load_system_information(cur):
+def load_system_information(cur, after_id, upto_id, since=None, source="bronze.gbfs_feed_raw"):
     logger.info("Loading silver.bst_system_information from bronze.gbfs_feed_raw")
     cur.execute(
         """
         WITH info_rows AS (
             SELECT
                 raw_payload->'data' AS info,
-                time_ingested
-            FROM bronze.gbfs_feed_raw
+                time_ingested,
+                id
+            FROM {source}
             WHERE source_name = 'bike-share-json'
-              AND feed_type = 'system_information'
+              AND feed_type = 'system_information'{bronze_range}
         ),
-        latest AS (
-            SELECT DISTINCT ON (info->>'system_id') info
+        checked AS (
+            SELECT info_rows.*, {reasons} AS reasons
             FROM info_rows
-            ORDER BY info->>'system_id', time_ingested DESC
-        )
-        INSERT INTO silver.bst_system_information (
-            system_id,
-            timezone,
-            build_version,
-            build_label,
-            build_hash,
-            build_number,
-            mobile_head_version,
-            mobile_minimum_supported_version,
-            _vehicle_count,
-            _station_count,
-            language,
-            name
-        )
+        ),
+        -- records that would fail a cast are set aside instead of failing the load
+        rejected AS (
+            INSERT INTO silver.rejected_rows (feed_type, bronze_id, record_key, reasons, record)
+            SELECT 'system_information', id, info->>'system_id', reasons, info
+            FROM checked
+            WHERE cardinality(reasons) > 0
+            ON CONFLICT (feed_type, bronze_id, (md5(record::text))) DO NOTHING
+        ),
+        latest AS (
+            SELECT DISTINCT ON (info->>'system_id') info, time_ingested
+            FROM checked
+            WHERE cardinality(reasons) = 0{applied_since}
+            ORDER BY info->>'system_id', time_ingested DESC, id DESC
+        ),
+        merged AS (
+            INSERT INTO silver.bst_system_information AS t (
+                system_id,
+                timezone,
+                build_version,
+                build_label,
+                build_hash,
+                build_number,
+                mobile_head_version,
+                mobile_minimum_supported_version,
+                _vehicle_count,
+                _station_count,
+                language,
+                name,
+                source_time_ingested
+            )
+            SELECT
+                info->>'system_id',
+                info->>'timezone',
+                info->>'build_version',
+                info->>'build_label',
+                info->>'build_hash',
+                info->>'build_number',
+                info->>'mobile_head_version',
+                info->>'mobile_minimum_supported_version',
+                COALESCE(info->'vehicle_count', info->'_vehicle_count'),
+                NULLIF(COALESCE(info->>'station_count', info->>'_station_count'), '')::int,
+                info->>'language',
+                info->>'name',
+                time_ingested
+            FROM latest
+            ON CONFLICT (system_id) DO UPDATE SET
+                timezone = EXCLUDED.timezone,
+                build_version = EXCLUDED.build_version,
+                build_label = EXCLUDED.build_label,
+                build_hash = EXCLUDED.build_hash,
+                build_number = EXCLUDED.build_number,
+                mobile_head_version = EXCLUDED.mobile_head_version,
+                mobile_minimum_supported_version = EXCLUDED.mobile_minimum_supported_version,
+                _vehicle_count = EXCLUDED._vehicle_count,
+                _station_count = EXCLUDED._station_count,
+                language = EXCLUDED.language,
+                name = EXCLUDED.name,
+                source_time_ingested = EXCLUDED.source_time_ingested,
+                updated_at = now()
+            -- a spooled or replayed payload older than the stored one never wins
+            WHERE (t.source_time_ingested IS NULL
+                   OR EXCLUDED.source_time_ingested > t.source_time_ingested)
+              -- unchanged rows are not rewritten
+              AND (
+                  t.timezone,
+                  t.build_version,
+                  t.build_label,
+                  t.build_hash,
+                  t.build_number,
+                  t.mobile_head_version,
+                  t.mobile_minimum_supported_version,
+                  t._vehicle_count,
+                  t._station_count,
+                  t.language,
+                  t.name
+              ) IS DISTINCT FROM (
+                  EXCLUDED.timezone,
+                  EXCLUDED.build_version,
+                  EXCLUDED.build_label,
+                  EXCLUDED.build_hash,
+                  EXCLUDED.build_number,
+                  EXCLUDED.mobile_head_version,
+                  EXCLUDED.mobile_minimum_supported_version,
+                  EXCLUDED._vehicle_count,
+                  EXCLUDED._station_count,
+                  EXCLUDED.language,
+                  EXCLUDED.name
+              )
+            RETURNING (xmax = 0) AS inserted
+        ),{advance_applied}
         SELECT
-            info->>'system_id',
-            info->>'timezone',
-            info->>'build_version',
-            info->>'build_label',
-            info->>'build_hash',
-            info->>'build_number',
-            info->>'mobile_head_version',
-            info->>'mobile_minimum_supported_version',
-            COALESCE(info->'vehicle_count', info->'_vehicle_count'),
-            NULLIF(COALESCE(info->>'station_count', info->>'_station_count'), '')::int,
-            info->>'language',
-            info->>'name'
-        FROM latest
-        ON CONFLICT (system_id) DO UPDATE SET
-            timezone = EXCLUDED.timezone,
-            build_version = EXCLUDED.build_version,
-            build_label = EXCLUDED.build_label,
-            build_hash = EXCLUDED.build_hash,
-            build_number = EXCLUDED.build_number,
-            mobile_head_version = EXCLUDED.mobile_head_version,
-            mobile_minimum_supported_version = EXCLUDED.mobile_minimum_supported_version,
-            _vehicle_count = EXCLUDED._vehicle_count,
-            _station_count = EXCLUDED._station_count,
-            language = EXCLUDED.language,
-            name = EXCLUDED.name,
-            updated_at = now();
-        """
+            count(*) FILTER (WHERE inserted),
+            count(*) FILTER (WHERE NOT inserted),
+            (SELECT count(*) FROM latest) - count(*),
+            (SELECT count(*) FROM checked WHERE cardinality(reasons) > 0)
+        FROM merged;
+        """.format(
+            source=source,
+            bronze_range=BRONZE_RANGE,
+            applied_since=APPLIED_SINCE.format(feed_type="system_information"),
+            advance_applied=ADVANCE_APPLIED.format(feed_type="system_information"),
+            reasons=reasons_sql("info", SYSTEM_INFORMATION_CHECKS),
+        ),
+        {"after_id": after_id, "upto_id": upto_id, "since": since},
     )
+    return merge_counts(cur)
 
 
-def load_plans(cur):
+def load_plans(cur, after_id, upto_id, since=None, source="bronze.gbfs_feed_raw"):
     logger.info("Loading silver.bst_plans from bronze.gbfs_feed_raw")
     cur.execute(
         """
         WITH plan_rows AS (
             SELECT
                 jsonb_array_elements(raw_payload->'data'->'plans') AS plan,
-                time_ingested
-            FROM bronze.gbfs_feed_raw
+                time_ingested,
+                id
+            FROM {source}
             WHERE source_name = 'bike-share-json'
-              AND feed_type = 'system_pricing_plans'
+              AND feed_type = 'system_pricing_plans'{bronze_range}
         ),
-        latest AS (
-            SELECT DISTINCT ON (plan->>'plan_id') plan
+        checked AS (
+            SELECT plan_rows.*, {reasons} AS reasons
             FROM plan_rows
-            ORDER BY plan->>'plan_id', time_ingested DESC
-        )
-        INSERT INTO silver.bst_plans (
-            plan_id,
-            name,
-            currency,
-            price,
-            description,
-            is_taxable
-        )
+        ),
+        -- records that would fail a cast are set aside instead of failing the load
+        rejected AS (
+            INSERT INTO silver.rejected_rows (feed_type, bronze_id, record_key, reasons, record)
+            SELECT 'system_pricing_plans', id, plan->>'plan_id', reasons, plan
+            FROM checked
+            WHERE cardinality(reasons) > 0
+            ON CONFLICT (feed_type, bronze_id, (md5(record::text))) DO NOTHING
+        ),
+        latest AS (
+            SELECT DISTINCT ON (plan->>'plan_id') plan, time_ingested
+            FROM checked
+            WHERE cardinality(reasons) = 0{applied_since}
+            ORDER BY plan->>'plan_id', time_ingested DESC, id DESC
+        ),
+        merged AS (
+            INSERT INTO silver.bst_plans AS t (
+                plan_id,
+                name,
+                currency,
+                price,
+                description,
+                is_taxable,
+                source_time_ingested
+            )
+            SELECT
+                plan->>'plan_id',
+                plan->>'name',
+                plan->>'currency',
+                NULLIF(plan->>'price', '')::numeric,
+                plan->>'description',
+                (NULLIF(plan->>'is_taxable', '')::boolean)::int,
+                time_ingested
+            FROM latest
+            ON CONFLICT (plan_id) DO UPDATE SET
+                name = EXCLUDED.name,
+                currency = EXCLUDED.currency,
+                price = EXCLUDED.price,
+                description = EXCLUDED.description,
+                is_taxable = EXCLUDED.is_taxable,
+                source_time_ingested = EXCLUDED.source_time_ingested,
+                updated_at = now()
+            -- a spooled or replayed payload older than the stored one never wins
+            WHERE (t.source_time_ingested IS NULL
+                   OR EXCLUDED.source_time_ingested > t.source_time_ingested)
+              -- unchanged rows are not rewritten
+              AND (
+                  t.name,
+                  t.currency,
+                  t.price,
+                  t.description,
+                  t.is_taxable
+              ) IS DISTINCT FROM (
+                  EXCLUDED.name,
+                  EXCLUDED.currency,
+                  EXCLUDED.price,
+                  EXCLUDED.description,
+                  EXCLUDED.is_taxable
+              )
+            RETURNING (xmax = 0) AS inserted
+        ),{advance_applied}
         SELECT
-            plan->>'plan_id',
-            plan->>'name',
-            plan->>'currency',
-            NULLIF(plan->>'price', '')::numeric,
-            plan->>'description',
-            (NULLIF(plan->>'is_taxable', '')::boolean)::int
-        FROM latest
-        ON CONFLICT (plan_id) DO UPDATE SET
-            name = EXCLUDED.name,
-            currency = EXCLUDED.currency,
-            price = EXCLUDED.price,
-            description = EXCLUDED.description,
-            is_taxable = EXCLUDED.is_taxable,
-            updated_at = now();
-        """
+            count(*) FILTER (WHERE inserted),
+            count(*) FILTER (WHERE NOT inserted),
+            (SELECT count(*) FROM latest) - count(*),
+            (SELECT count(*) FROM checked WHERE cardinality(reasons) > 0)
+        FROM merged;
+        """.format(
+            source=source,
+            bronze_range=BRONZE_RANGE,
+            applied_since=APPLIED_SINCE.format(feed_type="system_pricing_plans"),
+            advance_applied=ADVANCE_APPLIED.format(feed_type="system_pricing_plans"),
+            reasons=reasons_sql("plan", PLAN_CHECKS),
+        ),
+        {"after_id": after_id, "upto_id": upto_id, "since": since},
     )
+    return merge_counts(cur)
 
 
-def load_system_regions(cur):
+# A spooled or replayed system_regions payload is only appended when it is
+# newer than every one already stored
+REGIONS_NEWER = """
+          AND NOT EXISTS (
+              SELECT 1 FROM silver.bst_system_regions r
+              WHERE r.source_time_ingested >= time_ingested
+          )"""
+
+
+def load_system_regions(cur, after_id, upto_id, since=None, source="bronze.gbfs_feed_raw"):
     logger.info("Loading silver.bst_system_regions from bronze.gbfs_feed_raw")
+    # Only the newest payload is kept: fetch it by primary key through the
+    # pointer when it is in range, instead of sorting the range
+    latest = latest_bronze_row(cur, "system_regions", after_id, upto_id, since)
+    if latest is not None and source == "bronze.gbfs_feed_raw":
+        cur.execute(
+            """
+            INSERT INTO silver.bst_system_regions (last_updated, ttl, data, source_time_ingested)
+            SELECT
+                last_updated::int,
+                ttl::int,
+                raw_payload->'data',
+                time_ingested
+            FROM bronze.gbfs_feed_raw
+            WHERE id = %s AND time_ingested = %s{newer};
+            """.format(newer=REGIONS_NEWER),
+            latest,
+        )
+        return {"inserted": cur.rowcount, "updated": 0, "unchanged": 0, "rejected": 0}
+
     cur.execute(
         """
-        INSERT INTO silver.bst_system_regions (last_updated, ttl, data)
+        INSERT INTO silver.bst_system_regions (last_updated, ttl, data, source_time_ingested)
         SELECT
-            NULLIF(raw_payload->>'last_updated', '')::int,
-            NULLIF(raw_payload->>'ttl', '')::int,
-            raw_payload->'data'
-        FROM bronze.gbfs_feed_raw
+            last_updated::int,
+            ttl::int,
+            raw_payload->'data',
+            time_ingested
+        FROM {source}
         WHERE source_name = 'bike-share-json'
-          AND feed_type = 'system_regions'
-        ORDER BY time_ingested DESC
+          AND feed_type = 'system_regions'{bronze_range}{newer}
+        ORDER BY time_ingested DESC, id DESC
         LIMIT 1;
-        """
+        """.format(source=source, bronze_range=BRONZE_RANGE, newer=REGIONS_NEWER),
+        {"after_id": after_id, "upto_id": upto_id, "since": since},
     )
+    return {"inserted": cur.rowcount, "updated": 0, "unchanged": 0, "rejected": 0}
+
+
+def bronze_source(conn, since, archive=None):
+    """
+    Relation the loaders should read. When the window starts before the cold
+    archive's `archived_until`, the archived rows are copied into a temporary
+    table and a temporary view combines them with bronze.gbfs_feed_raw.
+    """
+    archive = archive or ColdArchive()
+    archived_until = archive.archived_until()
+    if archived_until is None or (since is not None and since >= archived_until):
+        return "bronze.gbfs_feed_raw"
+
+    start = since or datetime.min.replace(tzinfo=timezone.utc)
+    rows = archive.load_to_temp_table(conn, start, archived_until)
+    logger.info("Loaded %d archived bronze rows from %s to %s", rows, start, archived_until)
+    with conn.cursor() as cur:
+        cur.execute(
+            "CREATE OR REPLACE TEMP VIEW bronze_window AS "
+            "SELECT * FROM bronze.gbfs_feed_raw UNION ALL SELECT * FROM pg_temp.bronze_cold"
+        )
+    return "bronze_window"
+
+
+# Every loader with the loaders it has to wait for. They read disjoint bronze
+# slices and write disjoint tables, so today none depends on another.
+SILVER_LOADERS = {
+    "station_information": (load_station_information, ()),
+    "station_status": (load_station_status, ()),
+    "system_information": (load_system_information, ()),
+    "system_pricing_plans": (load_plans, ()),
+    "system_regions": (load_system_regions, ()),
+}
+
+
+def load_station_status_frames(cur, after_id, upto_id, since=None, source="bronze.gbfs_feed_raw"):
+    ensure_status_history_partitions(cur)
+    return silver_frames.load_station_status(cur, after_id, upto_id, since, source)
+
+
+# The pandas engine normalizes these feeds' arrays in Python and COPYs typed
+# rows into a staging table; the other feeds stay on SQL.
+FRAME_LOADERS = {
+    "station_information": silver_frames.load_station_information,
+    "station_status": load_station_status_frames,
+    "system_pricing_plans": silver_frames.load_plans,
+}
+
+
+def silver_loaders(engine):
+    """SILVER_LOADERS for engine 'sql' or 'pandas'."""
+    if engine not in ("sql", "pandas"):
+        raise ValueError(f"SILVER_ENGINE must be 'sql' or 'pandas', got {engine!r}")
+    if engine == "sql":
+        return dict(SILVER_LOADERS)
+    return {
+        feed_type: (FRAME_LOADERS.get(feed_type, loader), depends_on)
+        for feed_type, (loader, depends_on) in SILVER_LOADERS.items()
+    }
+
+
+def run_loader(conn, feed_type, loader, upto_id, since, source):
+    """Merge one feed and advance its watermark, without committing."""
+    started = time.monotonic()
+    with conn.cursor() as cur:
+        watermark = read_watermark(cur, feed_type)
+        after_id = 0 if since else watermark
+        counts = None
+        if after_id < upto_id:
+            counts = loader(cur, after_id, upto_id, since, source)
+            advance_watermark(cur, feed_type, upto_id)
+    return {"watermark": watermark, "counts": counts, "seconds": time.monotonic() - started}
+
+
+def run_loaders(conns, upto_id, since, source, max_workers, loaders=None):
+    """
+    Run `loaders` (default SILVER_LOADERS) concurrently, each on its
+    connection from `conns`, a loader starting as soon as the ones it depends
+    on have finished. Returns {feed_type: result}; after a failure no new
+    loader is started, and the first error is raised once the running ones
+    are done.
+    """
+    pending = dict(loaders or SILVER_LOADERS)
+    running, results, failure = {}, {}, None
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            if failure is None:
+                for feed_type, (loader, depends_on) in list(pending.items()):
+                    if all(d in results for d in depends_on):
+                        del pending[feed_type]
+                        future = pool.submit(run_loader, conns[feed_type], feed_type, loader, upto_id, since, source)
+                        running[future] = feed_type
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                feed_type = running.pop(future)
+                try:
+                    results[feed_type] = future.result()
+                except Exception as e:
+                    logger.error("Loader %s failed: %s", feed_type, e)
+                    failure = failure or e
+    if failure is not None:
+        raise failure
+    if pending:
+        raise ValueError(f"Loaders with unmet or circular dependencies: {sorted(pending)}")
+    return results
+
+
+def recover_prepared(conn, older_than=60):
+    """
+    Finish the prepared silver transactions of crashed runs (xid
+    load_silver:<run_id>:<n>). A run prepares its transactions in order and
+    commits them in the same order, so the first one decides: still prepared,
+    nothing was committed and the run is rolled back (the watermarks make the
+    next run redo it); gone, the run had started committing and the rest is
+    committed too. Runs prepared less than `older_than` seconds ago may still
+    be publishing and are left alone.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=older_than)
+    runs = {}
+    for xid in conn.tpc_recover():
+        parts = str(xid.gtrid).split(":")
+        if len(parts) == 3 and parts[0] == XID_PREFIX and parts[2].isdigit():
+            runs.setdefault(parts[1], {})[int(parts[2])] = xid
+    for run_id, xids in runs.items():
+        if any(xid.prepared is None or xid.prepared >= cutoff for xid in xids.values()):
+            continue
+        if 0 in xids:
+            logger.warning("Rolling back %d prepared transactions of crashed run %s", len(xids), run_id)
+            for xid in xids.values():
+                conn.tpc_rollback(xid)
+        else:
+            logger.warning("Committing %d prepared transactions left by run %s", len(xids), run_id)
+            for _, xid in sorted(xids.items()):
+                conn.tpc_commit(xid)
+
+
+def can_prepare(conn):
+    """Whether the server allows prepared transactions (max_prepared_transactions > 0)."""
+    with conn.cursor() as cur:
+        cur.execute("SHOW max_prepared_transactions")
+        limit = int(cur.fetchone()[0])
+    conn.commit()
+    return limit > 0
+
+
+def commit_prepared(xid, attempts=SILVER_COMMIT_ATTEMPTS):
+    """
+    COMMIT PREPARED `xid` from a fresh connection, retrying with backoff; an
+    xid no longer prepared has already been committed.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            with get_pg_connection() as conn:
+                prepared = {str(x.gtrid): x for x in conn.tpc_recover()}
+                if xid in prepared:
+                    conn.tpc_commit(prepared[xid])
+            return
+        except psycopg2.Error as e:
+            logger.warning("COMMIT PREPARED %s failed (attempt %d of %d): %s", xid, attempt, attempts, e)
+            if attempt < attempts:
+                time.sleep(2 ** attempt)
+    raise RuntimeError(
+        f"Could not commit prepared transaction {xid}; it is left prepared with the ones after it, "
+        f"and the next load_silver run commits them"
+    )
+
+
+def publish(conns, xids=None):
+    """
+    Commit every loader's transaction once all of them have succeeded. With
+    two-phase commit (`xids`, one per connection in the order they were
+    begun) all are prepared first, so a failure before the last PREPARE rolls
+    everything back. After it the run is decided: the transactions are
+    committed in order, a failed commit is retried, and one that still fails
+    stays prepared with the rest for recover_prepared to commit; none is
+    rolled back.
+    """
+    unique = list({id(c): c for c in conns.values()}.values())
+    if xids is None:
+        for conn in unique:
+            conn.commit()
+        return
+
+    try:
+        for conn in unique:
+            conn.tpc_prepare()
+    except Exception:
+        discard(conns, two_phase=True)
+        raise
+    for conn, xid in zip(unique, xids):
+        try:
+            conn.tpc_commit()
+        except psycopg2.Error as e:
+            logger.warning("COMMIT PREPARED %s failed: %s", xid, e)
+            conn.close()  # the prepared transaction outlives the session
+            commit_prepared(xid)
 
 
 def main():
-    logger.info("Starting SILVER layer load")
-    with get_pg_connection() as conn, conn.cursor() as cur:
-        load_station_information(cur)
-        load_station_status(cur)
-        load_system_information(cur)
-        load_plans(cur)
-        load_system_regions(cur)
-        conn.commit()
-    logger.info("SILVER layer load complete")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since", default=None, help="ISO date or datetime (UTC if no offset); re-merges everything since then")
+    parser.add_argument("--workers", type=int, default=None, help="loaders run at once; defaults to SILVER_MAX_WORKERS")
+    parser.add_argument(
+        "--two-phase", action=argparse.BooleanOptionalAction, default=SILVER_TWO_PHASE,
+        help="publish with two-phase commit; defaults to SILVER_TWO_PHASE",
+    )
+    parser.add_argument("--engine", choices=("sql", "pandas"), default=SILVER_ENGINE, help="defaults to SILVER_ENGINE")
+    args = parser.parse_args()
+    loaders = silver_loaders(args.engine)
+
+    since = None
+    if args.since:
+        since = datetime.fromisoformat(args.since)
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+
+    started = time.monotonic()
+    with get_pg_connection() as conn, ExitStack() as stack:
+        # A crashed run's prepared transactions hold its watermark locks
+        recover_prepared(conn)
+        if not since and not feeds_with_new_rows(conn, loaders):
+            logger.info("No new bronze rows for any feed, nothing to load")
+            return
+        upto_id = settled_bronze_id(conn)
+        if upto_id is None:
+            logger.warning("Bronze writes still in flight after %s, skipping this run", SILVER_WATERMARK_LOCK_TIMEOUT)
+            return
+        logger.info("Starting SILVER layer load (bronze ids up to %d%s)", upto_id, f", since {since}" if since else "")
+
+        source = bronze_source(conn, since) if since else "bronze.gbfs_feed_raw"
+        # Archived rows and the pandas staging tables are temporary, and a transaction
+        # that used temporary objects can't be prepared
+        single = source != "bronze.gbfs_feed_raw" or args.engine == "pandas"
+        two_phase = args.two_phase and not single
+        if two_phase and not can_prepare(conn):
+            logger.warning(
+                "max_prepared_transactions is 0 on the server, loading on one connection instead of "
+                "publishing with two-phase commit"
+            )
+            two_phase, single = False, True
+        if single:
+            # One connection, one loader at a time: a single transaction commits atomically on its own
+            conns = dict.fromkeys(SILVER_LOADERS, conn)
+            workers = 1
+        else:
+            conns = {
+                feed_type: conn if i == 0 else stack.enter_context(get_pg_connection())
+                for i, feed_type in enumerate(SILVER_LOADERS)
+            }
+            workers = args.workers or SILVER_MAX_WORKERS
+
+        xids = None
+        if two_phase:
+            run_id = uuid.uuid4().hex
+            xids = []
+            for n, c in enumerate({id(c): c for c in conns.values()}.values()):
+                xids.append(f"{XID_PREFIX}:{run_id}:{n}")
+                c.tpc_begin(xids[-1])
+
+        try:
+            results = run_loaders(conns, upto_id, since, source, workers, loaders)
+        except Exception:
+            discard(conns, two_phase)
+            raise
+        publish(conns, xids)
+
+    for feed_type, result in results.items():
+        counts = result["counts"]
+        if counts is None:
+            logger.info("%s: no new bronze rows (watermark %d)", feed_type, result["watermark"])
+        else:
+            logger.info(
+                "%s: %d inserted, %d updated, %d unchanged in %.2fs",
+                feed_type, counts["inserted"], counts["updated"], counts["unchanged"], result["seconds"],
+            )
+            if counts["rejected"]:
+                logger.warning("%s: %d records rejected, see silver.rejected_rows", feed_type, counts["rejected"])
+    logger.info(
+        "SILVER layer load complete in %.2fs (%s engine, %d workers)", time.monotonic() - started, args.engine, workers,
+    )
 
 
 if __name__ == "__main__":
@@ -9,12 +9,15 @@
     Note:
         - bike-share-json : bst
         - gbfs-specification : gbfs
+        - Safe to run again on an existing silver schema: missing tables are
+          created and the ADD COLUMN IF NOT EXISTS statements bring tables
+          created by an earlier version up to what load_silver.py expects.
 */
 
 -- Bike-Share-Toronto  
 
 -- 1. station_information
-CREATE TABLE silver.bst_station_information (
+CREATE TABLE IF NOT EXISTS silver.bst_station_information (
     station_id VARCHAR(100) PRIMARY KEY,
     name VARCHAR(255) NOT NULL,
     physical_configuration VARCHAR(100),
@@ -30,12 +33,15 @@ CREATE TABLE silver.bst_station_information (
     nearby_distance NUMERIC(10,4),
     _ride_code_support BOOLEAN,
     rental_uris JSONB,
+    source_time_ingested TIMESTAMPTZ,                 -- time_ingested of the bronze payload that last changed the row
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- 2. station_status
-CREATE TABLE silver.bst_station_status (
+ALTER TABLE silver.bst_station_information ADD COLUMN IF NOT EXISTS source_time_ingested TIMESTAMPTZ;
+
+-- 2. station_status: latest snapshot per station, derived from the history below
+CREATE TABLE IF NOT EXISTS silver.bst_station_status (
     station_id VARCHAR(100) PRIMARY KEY,
     num_bikes_available INTEGER,
     num_bikes_disabled INTEGER,
@@ -52,8 +58,51 @@ CREATE TABLE silver.bst_station_status (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- 2b. station_status history: every distinct snapshot, append-only.
+--     Range-partitioned by month of last_reported (epoch seconds); load_silver.py
+--     creates the partitions, snapshots outside them go to the default partition.
+--     load_seq numbers the rows in commit order: station_status loads hold the
+--     feed's silver.load_watermark row lock until they commit, so a load draws
+--     its numbers only after the previous one is visible. The gold load consumes
+--     the history by load_seq (gold.load_watermark).
+CREATE SEQUENCE IF NOT EXISTS silver.bst_station_status_history_load_seq;
+
+CREATE TABLE IF NOT EXISTS silver.bst_station_status_history (
+    station_id VARCHAR(100) NOT NULL,
+    last_reported INTEGER NOT NULL,
+    num_bikes_available INTEGER,
+    num_bikes_disabled INTEGER,
+    status VARCHAR(50),
+    traffic JSONB,
+    num_bikes_available_types JSONB,
+    num_docks_available INTEGER,
+    num_docks_disabled INTEGER,
+    is_installed INTEGER,
+    is_renting INTEGER,
+    is_returning INTEGER,
+    bronze_id BIGINT,                                 -- bronze.gbfs_feed_raw row it came from
+    loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    load_seq BIGINT DEFAULT nextval('silver.bst_station_status_history_load_seq'),
+    PRIMARY KEY (station_id, last_reported)
+) PARTITION BY RANGE (last_reported);
+
+-- Existing snapshots are numbered as the column is added; the gold load then
+-- reads them once more, and its facts skip what they already hold
+ALTER TABLE silver.bst_station_status_history
+    ADD COLUMN IF NOT EXISTS load_seq BIGINT DEFAULT nextval('silver.bst_station_status_history_load_seq');
+
+CREATE TABLE IF NOT EXISTS silver.bst_station_status_history_default
+    PARTITION OF silver.bst_station_status_history DEFAULT;
+
+-- The gold load picks up the snapshots appended since its last run
+CREATE INDEX IF NOT EXISTS idx_station_status_history_load_seq
+    ON silver.bst_station_status_history (load_seq);
+
+-- Replaced by load_seq
+DROP INDEX IF EXISTS silver.idx_station_status_history_loaded_at;
+
 -- 3. System_Information
-CREATE TABLE silver.bst_system_information (
+CREATE TABLE IF NOT EXISTS silver.bst_system_information (
     system_id VARCHAR(100) PRIMARY KEY,
     timezone VARCHAR(100),
     build_version VARCHAR(100),
@@ -66,30 +115,109 @@ CREATE TABLE silver.bst_system_information (
     _station_count INTEGER,
     language VARCHAR(50),
     name VARCHAR(255),
+    source_time_ingested TIMESTAMPTZ,                 -- time_ingested of the bronze payload that last changed the row
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+ALTER TABLE silver.bst_system_information ADD COLUMN IF NOT EXISTS source_time_ingested TIMESTAMPTZ;
+
 -- 4. Pricing Plans
 
-CREATE TABLE silver.bst_plans (
+CREATE TABLE IF NOT EXISTS silver.bst_plans (
     plan_id VARCHAR(100) PRIMARY KEY,
     name VARCHAR(255),
     currency VARCHAR(10),
     price NUMERIC(10,2),
     description TEXT,
     is_taxable INTEGER,
+    source_time_ingested TIMESTAMPTZ,                 -- time_ingested of the bronze payload that last changed the row
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+ALTER TABLE silver.bst_plans ADD COLUMN IF NOT EXISTS source_time_ingested TIMESTAMPTZ;
+
 -- 5. System Regions
-CREATE TABLE silver.bst_system_regions (
+CREATE TABLE IF NOT EXISTS silver.bst_system_regions (
     id SERIAL PRIMARY KEY,
     last_updated INTEGER,
     ttl INTEGER,
     data JSONB,
+    source_time_ingested TIMESTAMPTZ,                 -- time_ingested of the bronze payload the row reflects
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+ALTER TABLE silver.bst_system_regions ADD COLUMN IF NOT EXISTS source_time_ingested TIMESTAMPTZ;
+
+-- 6. Load watermark: last bronze.gbfs_feed_raw id merged into silver per feed,
+--    advanced by load_silver.py in the same transaction as the merge
+CREATE TABLE IF NOT EXISTS silver.load_watermark (
+    source_name VARCHAR(100) NOT NULL,
+    feed_type VARCHAR(100) NOT NULL,
+    last_bronze_id BIGINT NOT NULL DEFAULT 0,
+    last_time_ingested TIMESTAMPTZ,                   -- newest payload merged (upserted feeds); older ones are skipped
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (source_name, feed_type)
+);
+
+ALTER TABLE silver.load_watermark ADD COLUMN IF NOT EXISTS last_time_ingested TIMESTAMPTZ;
+
+-- 7. Rejected rows: GBFS records a loader could not cast into its silver table
+--    (reason codes '<reason>:<column>', see utils/silver_checks.py). They are set
+--    aside here and the rest of the batch is loaded.
+CREATE TABLE IF NOT EXISTS silver.rejected_rows (
+    id BIGSERIAL PRIMARY KEY,
+    feed_type VARCHAR(100) NOT NULL,
+    bronze_id BIGINT NOT NULL,                        -- bronze.gbfs_feed_raw row it came from
+    record_key TEXT,                                  -- station_id, plan_id or system_id, if any
+    reasons TEXT[] NOT NULL,                          -- e.g. {not_int:capacity,too_long:name}
+    record JSONB NOT NULL,
+    rejected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- A record rejected again by a re-run (--since) is stored once
+CREATE UNIQUE INDEX IF NOT EXISTS idx_rejected_rows_record
+    ON silver.rejected_rows (feed_type, bronze_id, (md5(record::text)));
+
+CREATE INDEX IF NOT EXISTS idx_rejected_rows_rejected_at
+    ON silver.rejected_rows (rejected_at);
+
+-- Castability checks of the quarantine. NULL in, NULL out (the loaders cast
+-- NULLIF(value, '')); fits_* expect a value that already passed is_*.
+CREATE OR REPLACE FUNCTION silver.is_int(value text)
+RETURNS boolean
+LANGUAGE sql
+IMMUTABLE PARALLEL SAFE
+AS $$ SELECT value ~ '^\s*[+-]?[0-9]+\s*$' $$;
+
+CREATE OR REPLACE FUNCTION silver.fits_int(value text)
+RETURNS boolean
+LANGUAGE sql
+IMMUTABLE PARALLEL SAFE
+AS $$ SELECT value::numeric BETWEEN -2147483648 AND 2147483647 $$;
+
+CREATE OR REPLACE FUNCTION silver.is_numeric(value text)
+RETURNS boolean
+LANGUAGE sql
+IMMUTABLE PARALLEL SAFE
+AS $$ SELECT value ~ '^\s*[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]{1,3})?\s*$' $$;
+
+-- Whether the value survives the cast to NUMERIC(digits, decimals), rounding included
+CREATE OR REPLACE FUNCTION silver.fits_numeric(value text, digits int, decimals int)
+RETURNS boolean
+LANGUAGE sql
+IMMUTABLE PARALLEL SAFE
+AS $$ SELECT abs(round(value::numeric, decimals)) < 10::numeric ^ (digits - decimals) $$;
+
+CREATE OR REPLACE FUNCTION silver.is_boolean(value text)
+RETURNS boolean
+LANGUAGE sql
+IMMUTABLE PARALLEL SAFE
+AS $$
+    SELECT lower(btrim(value, E' \t\n\r\f\v')) IN (
+        't', 'tr', 'tru', 'true', 'y', 'ye', 'yes', 'on', '1',
+        'f', 'fa', 'fal', 'fals', 'false', 'n', 'no', 'of', 'off', '0'
+    )
+$$;
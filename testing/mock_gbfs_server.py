@@ -0,0 +1,264 @@
+"""
+Local CKAN + GBFS stand-in server for offline and load testing.
+
+Purpose:
+    Serve the same endpoints the extraction pipeline talks to, seeded from the
+    fixtures in .vscode/gbfs_feeds, so run_pipeline, the polling daemon and the
+    bronze loader can be benchmarked reproducibly without the City of Toronto API.
+
+Endpoints:
+    /api/3/action/package_show?id=<dataset_id>
+    /api/3/action/resource_show?id=<resource_id>
+    /gbfs/<resource_id>/gbfs.json             feeds index of one resource
+    /gbfs/<resource_id>/en/<feed_name>        one GBFS feed
+
+Scaling:
+    --stations N clones the fixture stations (new ids, jittered coordinates) up to
+    N stations; station_status is regenerated with fresh availability every
+    --status-ttl seconds. Latency, jitter, error rate and TTLs are configurable.
+
+Usage:
+    python testing/mock_gbfs_server.py --port 8080 --stations 50000 --latency-ms 80 --jitter-ms 40 --error-rate 0.01
+    # then point the pipeline at it
+    BASE_URL=http://localhost:8080 DATASET_ID=bike-share-toronto python "scripts/1. extraction & loading/data_extarction.py"
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Dynamically find the project root by looking for the 'utils' folder
+current_dir = os.path.dirname(os.path.abspath(__file__))
+while not os.path.exists(os.path.join(current_dir, 'utils')):
+    parent = os.path.dirname(current_dir)
+    if parent == current_dir:
+        raise RuntimeError("Could not find project root (utils folder not found)")
+    current_dir = parent
+sys.path.insert(0, current_dir)
+
+from utils.el_global import load_json_from_file
+
+FIXTURES_DIR = os.path.join(current_dir, ".vscode", "gbfs_feeds")
+
+
+class MockFeed:
+    """One pre-serialized GBFS feed body, rebuilt when its generator says so."""
+
+    def __init__(self, build, ttl, refresh_every=None):
+        self._build = build
+        self.ttl = ttl
+        self._refresh_every = refresh_every
+        self._lock = threading.Lock()
+        self._built_at = None
+        self.body = self.etag = self.last_modified = None
+
+    def get(self):
+        with self._lock:
+            if (
+                self._built_at is None
+                or (self._refresh_every and time.time() - self._built_at >= self._refresh_every)
+            ):
+                now = time.time()
+                payload = {"last_updated": int(now), "ttl": self.ttl, "data": self._build(now)}
+                self.body = json.dumps(payload).encode("utf-8")
+                self.etag = '"%s"' % hashlib.md5(self.body).hexdigest()
+                self.last_modified = formatdate(now, usegmt=True)
+                self._built_at = now
+            return self.body, self.etag, self.last_modified
+
+
+def scale_stations(stations, count, rng):
+    """Clone fixture stations up to `count`, with new ids and jittered coordinates."""
+    scaled = []
+    for i in range(count):
+        station = dict(stations[i % len(stations)])
+        if i >= len(stations):
+            station["station_id"] = str(1_000_000 + i)
+            station["lat"] = round(station["lat"] + rng.uniform(-0.05, 0.05), 6)
+            station["lon"] = round(station["lon"] + rng.uniform(-0.05, 0.05), 6)
+        scaled.append(station)
+    return scaled
+
+
+def build_station_status(stations, template, rng, now):
+    """Fresh random availability for every station, shaped like the fixture's first record."""
+    records = []
+    for station in stations:
+        capacity = station.get("capacity") or 20
+        bikes = rng.randint(0, capacity)
+        ebikes = rng.randint(0, bikes)
+        record = dict(template)
+        record.update({
+            "station_id": station["station_id"],
+            "num_bikes_available": bikes,
+            "num_bikes_disabled": rng.randint(0, 2),
+            "num_bikes_available_types": {"mechanical": bikes - ebikes, "ebike": ebikes},
+            "num_docks_available": capacity - bikes,
+            "num_docks_disabled": 0,
+            "last_reported": int(now) - rng.randint(0, 300),
+        })
+        records.append(record)
+    return {"stations": records}
+
+
+def build_site(base_url, dataset_id, station_count, ttl, status_ttl, seed):
+    """Return (ckan_package, {resource_id: (resource, feeds_index, {feed_name: MockFeed})})."""
+    rng = random.Random(seed)
+    resources = {}
+    raw_metadata_dir = os.path.join(FIXTURES_DIR, "raw_metadata")
+    for file_name in sorted(os.listdir(raw_metadata_dir)):
+        folder = file_name[: -len("_raw.json")]
+        raw = load_json_from_file(os.path.join(raw_metadata_dir, file_name))
+        resource = dict(raw["metadata"])
+        resource_id = resource["id"]
+        resource["url"] = f"{base_url}/gbfs/{resource_id}/gbfs.json"
+
+        feeds = {}
+        for feed in raw["data"]["data"]["en"]["feeds"]:
+            fixture = load_json_from_file(
+                os.path.join(FIXTURES_DIR, "feeds_data", folder, feed["name"].replace(" ", "_") + ".json")
+            )
+            feeds[feed["name"]] = fixture["data"]["data"]
+
+        stations = scale_stations(feeds["station_information"]["stations"], station_count, rng)
+        status_template = feeds["station_status"]["stations"][0]
+        # Spec fields only: the fixture's vendor _station_count would not match the scaled station list
+        info = {k: v for k, v in feeds["system_information"].items() if k != "_station_count"}
+
+        mock_feeds = {
+            "station_information": MockFeed(lambda now, s=stations: {"stations": s}, ttl),
+            "station_status": MockFeed(
+                lambda now, s=stations, t=status_template: build_station_status(s, t, rng, now),
+                status_ttl,
+                refresh_every=status_ttl,
+            ),
+            "system_information": MockFeed(lambda now, d=info: d, ttl),
+        }
+        for name, data in feeds.items():
+            mock_feeds.setdefault(name, MockFeed(lambda now, d=data: d, ttl))
+
+        feeds_index = {
+            "last_updated": int(time.time()),
+            "ttl": ttl,
+            "data": {"en": {"feeds": [
+                {"name": name, "url": f"{base_url}/gbfs/{resource_id}/en/{name.replace(' ', '_')}"}
+                for name in feeds
+            ]}},
+        }
+        resources[resource_id] = (resource, feeds_index, mock_feeds)
+
+    # A datastore resource the pipeline is expected to ignore
+    datastore_resource = {"id": "datastore-trips", "name": "bike-share-ridership", "url": "", "datastore_active": True}
+    package = {
+        "id": dataset_id,
+        "name": dataset_id,
+        "resources": [r for r, _, _ in resources.values()] + [datastore_resource],
+    }
+    return package, resources
+
+
+def make_handler(package, resources, args):
+    rng = random.Random(args.seed)
+    rng_lock = threading.Lock()
+    feed_paths = {
+        f"/gbfs/{resource_id}/en/{name.replace(' ', '_')}": feed
+        for resource_id, (_, _, feeds) in resources.items()
+        for name, feed in feeds.items()
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real endpoints
+
+        def log_message(self, format, *log_args):
+            if args.verbose:
+                super().log_message(format, *log_args)
+
+        def _send(self, status, body=b"", headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_json(self, payload):
+            self._send(200, json.dumps(payload).encode("utf-8"))
+
+        def do_GET(self):
+            with rng_lock:
+                delay = max(0.0, args.latency_ms + rng.uniform(-args.jitter_ms, args.jitter_ms)) / 1000
+                fail = rng.random() < args.error_rate
+            time.sleep(delay)
+            if fail:
+                self._send(503, b'{"error": "injected failure"}')
+                return
+
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path == "/api/3/action/package_show":
+                if query.get("id", [None])[0] != package["name"]:
+                    self._send(404, b'{"success": false}')
+                else:
+                    self._send_json({"success": True, "result": package})
+            elif url.path == "/api/3/action/resource_show":
+                match = resources.get(query.get("id", [None])[0])
+                if match is None:
+                    self._send(404, b'{"success": false}')
+                else:
+                    self._send_json({"success": True, "result": match[0]})
+            elif url.path.startswith("/gbfs/") and url.path.endswith("/gbfs.json"):
+                match = resources.get(url.path.split("/")[2])
+                if match is None:
+                    self._send(404)
+                else:
+                    self._send_json(match[1])
+            elif url.path in feed_paths:
+                body, etag, last_modified = feed_paths[url.path].get()
+                if self.headers.get("If-None-Match") == etag:
+                    self._send(304, headers={"ETag": etag, "Last-Modified": last_modified})
+                else:
+                    self._send(200, body, headers={"ETag": etag, "Last-Modified": last_modified})
+            else:
+                self._send(404)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local CKAN + GBFS stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--dataset-id", default="bike-share-toronto")
+    parser.add_argument("--stations", type=int, default=1008, help="number of stations to serve")
+    parser.add_argument("--ttl", type=int, default=10, help="ttl advertised by the static feeds")
+    parser.add_argument("--status-ttl", type=int, default=4, help="ttl (and refresh period) of station_status")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mean added latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="+/- uniform jitter on the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    base_url = f"http://{args.host}:{args.port}"
+    package, resources = build_site(base_url, args.dataset_id, args.stations, args.ttl, args.status_ttl, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(package, resources, args))
+    print(f"Mock CKAN/GBFS server on {base_url} (dataset '{args.dataset_id}', {args.stations} stations)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Parity of the silver checks and loaders between the SQL and the pandas engine.
+
+The Python checks (utils/silver_checks.rejection_reasons) must reject exactly
+the records the SQL checks (reasons_sql) reject, and the pandas station_status
+loader must write the same history and quarantine as the SQL one. Runs over
+the GBFS fixtures under .vscode/gbfs_feeds/feeds_data plus edge-case records,
+against the Postgres configured in .env (skipped when it is not reachable).
+
+Usage:
+    python -m pytest -q testing/test_silver_engine_parity.py
+"""
+
+
+import os
+import sys
+import glob
+
+import pytest
+import psycopg2
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+while not os.path.exists(os.path.join(current_dir, 'utils')):
+    parent = os.path.dirname(current_dir)
+    if parent == current_dir:
+        raise RuntimeError("Could not find project root (utils folder not found)")
+    current_dir = parent
+sys.path.insert(0, current_dir)
+sys.path.insert(0, os.path.join(current_dir, "scripts", "2. transformations", "silver"))  # load_silver.py
+
+from utils.db import get_pg_connection
+from utils import silver_frames
+from utils.silver_checks import (
+    STATION_INFORMATION_CHECKS,
+    STATION_STATUS_CHECKS,
+    loads,
+    dumps,
+    reasons_sql,
+    rejection_reasons,
+)
+
+FIXTURES_DIR = os.path.join(current_dir, ".vscode", "gbfs_feeds", "feeds_data")
+
+# Raw JSON text, so Postgres parses the numbers itself (1E2, -0, 1.50E1, ...)
+STATION_STATUS_EDGE_CASES = """[
+    {"station_id": "e01", "last_reported": 1E2, "num_bikes_available": 1E0},
+    {"station_id": "e02", "last_reported": 1.0},
+    {"station_id": "e03", "last_reported": 1.50E1},
+    {"station_id": "e04", "last_reported": -0},
+    {"station_id": "e05", "last_reported": 2147483648},
+    {"station_id": "e06", "last_reported": "  17 "},
+    {"station_id": "e07", "last_reported": ""},
+    {"station_id": "e08", "last_reported": null},
+    {"station_id": "e09"},
+    {"station_id": "e10", "last_reported": "abc"},
+    {"station_id": "e11", "last_reported": true},
+    {"station_id": "e12", "last_reported": {"a": 1}},
+    {"last_reported": 1700000000},
+    {"station_id": "", "last_reported": 1700000000},
+    {"station_id": "e15", "last_reported": 1700000000, "status": "IN_SERVICE", "num_docks_available": 1e-2},
+    {"station_id": "e16", "last_reported": 1700000000, "num_docks_available": "1e2"},
+    {"station_id": "e17", "last_reported": 1700000000, "is_installed": 1E400},
+    {"station_id": "e18", "last_reported": 1700000000, "traffic": {"a": 1.50E1}, "num_bikes_available_types": {"ebike": 2}},
+    {"station_id": "e19", "last_reported": 1700000000, "status": "%s"},
+    {"station_id": "%s", "last_reported": 1700000000},
+    {"station_id": "e21", "last_reported": -2147483648, "num_bikes_disabled": " -3"}
+]""" % ("X" * 51, "Y" * 101)
+
+STATION_INFORMATION_EDGE_CASES = """[
+    {"station_id": "i01", "name": "a", "lat": 1E1, "lon": -79.1234567891, "capacity": 1E2},
+    {"station_id": "i02", "name": "b", "lat": 99.999999995, "capacity": 1.0},
+    {"station_id": "i03", "name": "c", "nearby_distance": 999999.99995, "is_charging_station": "yes"},
+    {"station_id": "i04", "name": "d", "is_charging_station": "maybe", "rental_methods": "KEY"},
+    {"station_id": "i05", "name": "", "groups": ["a", 1.0, null], "_ride_code_support": " T "},
+    {"station_id": "i06", "lat": "", "capacity": ""},
+    {"station_id": "i07", "name": "f", "lat": "1e2", "capacity": "  12 "}
+]"""
+
+
+def fixture_records(feed_name):
+    """Records of every fixture of a feed, parsed like the pandas engine parses payloads."""
+    records = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*", f"{feed_name}.json"))):
+        with open(path, encoding="utf-8") as f:
+            records.extend(loads(f.read())["data"]["data"]["stations"])
+    return records
+
+
+@pytest.fixture(scope="module")
+def conn():
+    try:
+        with get_pg_connection() as connection:
+            yield connection
+            connection.rollback()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"Postgres not reachable: {e}")
+
+
+def sql_reasons(conn, records_json, checks):
+    with conn.cursor() as cur:
+        cur.execute(
+            f"SELECT {reasons_sql('r.value', checks)} "
+            "FROM jsonb_array_elements(%s::jsonb) WITH ORDINALITY r ORDER BY r.ordinality",
+            (records_json,),
+        )
+        reasons = [sorted(row[0]) for row in cur.fetchall()]
+    conn.rollback()
+    return reasons
+
+
+@pytest.mark.parametrize("feed_name, checks, edge_cases", [
+    ("station_status", STATION_STATUS_CHECKS, STATION_STATUS_EDGE_CASES),
+    ("station_information", STATION_INFORMATION_CHECKS, STATION_INFORMATION_EDGE_CASES),
+])
+def test_rejection_reasons_match_sql(conn, feed_name, checks, edge_cases):
+    records = fixture_records(feed_name) + loads(edge_cases)
+    records_json = "[" + ", ".join(
+        [dumps(r) for r in fixture_records(feed_name)] + [edge_cases.strip()[1:-1]]
+    ) + "]"
+    expected = sql_reasons(conn, records_json, checks)
+    actual = [sorted(r) for r in rejection_reasons(records, checks)]
+    assert len(actual) == len(expected)
+    mismatches = [
+        (record, got, want) for record, got, want in zip(records, actual, expected) if got != want
+    ]
+    assert not mismatches
+
+
+HISTORY_SQL = """
+SELECT station_id, last_reported, num_bikes_available, num_bikes_disabled, status, traffic,
+       num_bikes_available_types, num_docks_available, num_docks_disabled,
+       is_installed, is_renting, is_returning, bronze_id
+FROM silver.bst_station_status_history
+WHERE bronze_id < 0
+ORDER BY station_id, last_reported
+"""
+
+REJECTED_SQL = """
+SELECT bronze_id, record_key, reasons, record
+FROM silver.rejected_rows
+WHERE feed_type = 'station_status' AND bronze_id < 0
+ORDER BY bronze_id, record::text
+"""
+
+
+def run_station_status(cur, loader):
+    cur.execute("SAVEPOINT parity")
+    counts = loader(cur, -1000, 0, None, "pg_temp.parity_bronze")
+    cur.execute(HISTORY_SQL)
+    history = cur.fetchall()
+    cur.execute(REJECTED_SQL)
+    rejected = cur.fetchall()
+    cur.execute("ROLLBACK TO SAVEPOINT parity")
+    return counts, history, rejected
+
+
+def test_station_status_loaders_match(conn):
+    import load_silver
+
+    payloads = [
+        dumps({"last_updated": 1, "ttl": 1, "data": {"stations": fixture_records("station_status")}}),
+        '{"last_updated": 2, "ttl": 1, "data": {"stations": ' + STATION_STATUS_EDGE_CASES + "}}",
+    ]
+    with conn.cursor() as cur:
+        cur.execute("CREATE TEMP TABLE parity_bronze (LIKE bronze.gbfs_feed_raw INCLUDING GENERATED) ON COMMIT DROP")
+        for n, payload in enumerate(payloads):
+            cur.execute(
+                """
+                INSERT INTO pg_temp.parity_bronze
+                    (id, feed_type, source_name, load_batch_id, file_name, api_url, time_ingested, raw_payload)
+                VALUES (%s, 'station_status', 'bike-share-json', 'parity', 'station_status.json', 'fixture', now(), %s)
+                """,
+                (-100 + n, payload),
+            )
+        sql = run_station_status(cur, load_silver.load_station_status)
+        pandas = run_station_status(cur, silver_frames.load_station_status)
+    conn.rollback()
+
+    assert sql[1], "no snapshots loaded"
+    assert pandas[0] == sql[0]
+    assert pandas[1] == sql[1]
+    assert pandas[2] == sql[2]
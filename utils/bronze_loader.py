@@ -1,8 +1,14 @@
 # utils/bronze_loader.py
 import os
+import io
+import json
+import codecs
 import sys
-from typing import Dict, Any
-from psycopg2.extras import Json
+import time
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Tuple, BinaryIO, Union
+from psycopg2.extras import execute_values
 # Dynamically find the project root by looking for the 'utils' folder
 current_dir = os.path.dirname(os.path.abspath(__file__))
 while not os.path.exists(os.path.join(current_dir, 'utils')):
@@ -13,7 +19,29 @@ while not os.path.exists(os.path.join(current_dir, 'utils')):
 sys.path.insert(0, current_dir)
 from utils.db import get_pg_connection
 
+# Rows per COPY statement (and per commit) in bulk_copy_to_bronze
+BRONZE_COPY_BATCH_SIZE = int(os.getenv("BRONZE_COPY_BATCH_SIZE", "1000"))
+
+# Inserts only when the payload differs from the latest stored one for the same
+# (source_name, feed_type), looked up in bronze.gbfs_feed_latest; returns no row
+# when it is a duplicate. The pointer row is locked before the comparison, so a
+# concurrent writer of the same feed waits until this one commits and then
+# compares against the payload it stored. The very first payload of a feed has
+# no pointer row to lock yet: two writers racing on it may both store it.
+# The payload arrives as JSON text and is parsed once, by Postgres. content_hash
+# is a generated column computed by bronze.gbfs_content_hash(), so Python never
+# has to decode the payload to deduplicate it.
 INSERT_SQL = """
+WITH new_row AS (
+    SELECT %(raw_payload)s::jsonb AS raw_payload
+),
+latest AS (
+    SELECT content_hash
+    FROM bronze.gbfs_feed_latest
+    WHERE source_name = %(source_name)s
+      AND feed_type = %(feed_type)s
+    FOR UPDATE
+)
 INSERT INTO bronze.gbfs_feed_raw (
     feed_type,
     source_name,
@@ -21,17 +49,24 @@ INSERT INTO bronze.gbfs_feed_raw (
     file_name,
     api_url,
     version,
-    raw_payload
+    raw_payload,
+    payload_bytes
 )
-VALUES (%(feed_type)s,
-        %(source_name)s,
-        %(load_batch_id)s,
-        %(file_name)s,
-        %(api_url)s,
-        %(version)s,
-        %(raw_payload)s);
+SELECT %(feed_type)s,
+       %(source_name)s,
+       %(load_batch_id)s,
+       %(file_name)s,
+       %(api_url)s,
+       %(version)s,
+       new_row.raw_payload,
+       %(payload_bytes)s
+FROM new_row
+WHERE NOT %(skip_duplicates)s
+   OR bronze.gbfs_content_hash(new_row.raw_payload) IS DISTINCT FROM (SELECT content_hash FROM latest)
+RETURNING id;
 """
 
+
 def load_feed_to_bronze(
     *,
     feed_name: str,
@@ -39,17 +74,378 @@ def load_feed_to_bronze(
     batch_id: str,
     api_url: str,
     payload: Dict[str, Any],
-) -> None:
+    skip_duplicates: bool = True,
+    conn=None,
+) -> Optional[int]:
+    """
+    Insert one decoded feed payload into bronze.gbfs_feed_raw and return its id.
+    Returns None when skip_duplicates is on and the payload is identical
+    (see bronze.gbfs_content_hash) to the latest one stored for this feed.
+    Pass `conn` to reuse an open connection instead of opening a new one.
+
+    Prefer load_raw_feed_to_bronze when the response bytes are still at hand.
+    """
     version = payload.get("version")  # GBFS root version if present[web:22]
-    params = {
+    raw_payload = json.dumps(payload)
+    params = _insert_params(
+        feed_name, source_name, batch_id, api_url, version, raw_payload, len(raw_payload.encode("utf-8")),
+    )
+    params["skip_duplicates"] = skip_duplicates
+    if conn is not None:
+        return _insert(conn, params)
+    with get_pg_connection() as conn:
+        return _insert(conn, params)
+
+
+def load_raw_feed_to_bronze(
+    *,
+    feed_name: str,
+    source_name: str,
+    batch_id: str,
+    api_url: str,
+    raw_body: Union[bytes, BinaryIO],
+    version: Optional[str] = None,
+    skip_duplicates: bool = True,
+    conn=None,
+) -> Optional[int]:
+    """
+    Same as load_feed_to_bronze for the undecoded response body: the bytes
+    are passed through as text and Postgres parses them straight into jsonb,
+    so the payload is never decoded or re-serialized in Python. raw_body may
+    also be a binary file (e.g. StreamedFeed.raw_file()). Use
+    utils.gbfs_stream.peek_header to get `version` cheaply.
+    """
+    params = _insert_params(feed_name, source_name, batch_id, api_url, version, *_payload_text(raw_body))
+    params["skip_duplicates"] = skip_duplicates
+    if conn is not None:
+        return _insert(conn, params)
+    with get_pg_connection() as conn:
+        return _insert(conn, params)
+
+
+def _payload_text(raw_body):
+    """
+    (JSON text, size in bytes) of a raw body given as bytes or as a binary file.
+    A file is decoded straight into the text, without an intermediate bytes copy.
+    """
+    if isinstance(raw_body, (bytes, bytearray)):
+        return raw_body.decode("utf-8"), len(raw_body)
+    start = raw_body.tell()
+    text = codecs.getreader("utf-8")(raw_body).read()
+    return text, raw_body.tell() - start
+
+
+def _insert_params(feed_name, source_name, batch_id, api_url, version, raw_payload, payload_bytes):
+    return {
         "feed_type": feed_name,
         "source_name": source_name,
         "load_batch_id": batch_id,
         "file_name": f"{feed_name}.json",
         "api_url": api_url,
         "version": version,
-        "raw_payload": Json(payload),
+        "raw_payload": raw_payload,
+        "payload_bytes": payload_bytes,
     }
-    with get_pg_connection() as conn, conn.cursor() as cur:
+
+
+def _insert(conn, params):
+    with conn.cursor() as cur:
         cur.execute(INSERT_SQL, params)
-        conn.commit()
+        row = cur.fetchone()
+    conn.commit()
+    return row[0] if row else None
+
+
+# COPY of complete bronze rows (e.g. replayed from utils/raw_archive.py),
+# keeping their original load_batch_id and time_ingested. content_hash is
+# still computed by the generated column.
+COPY_COLUMNS = (
+    "time_ingested",
+    "load_batch_id",
+    "source_name",
+    "feed_type",
+    "file_name",
+    "api_url",
+    "version",
+    "raw_payload",
+    "payload_bytes",
+)
+
+COPY_READ_SIZE = 256 * 1024
+
+
+def _copy_value(value):
+    """Render one value as a COPY text-format field."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif not isinstance(value, str):
+        value = str(value)
+    if "\\" in value:
+        value = value.replace("\\", "\\\\")
+    return value.replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+class _CopyStream(io.RawIOBase):
+    """
+    Read-only file over up to `limit` rows of `rows`, rendered as COPY text
+    lines of `columns` on demand, so copy_expert never needs the whole batch
+    in memory.
+    """
+
+    def __init__(self, rows, limit, columns=COPY_COLUMNS):
+        self._rows = rows
+        self._limit = limit
+        self._columns = columns
+        self._buf = b""
+        self._pos = 0
+        self.rows = 0
+        self.bytes = 0
+        self.exhausted = False
+
+    def readable(self):
+        return True
+
+    def _line(self, row):
+        values = []
+        for column in self._columns:
+            value = row.get(column)
+            if value is None and column == "time_ingested":
+                value = datetime.now(timezone.utc)
+            elif value is None and column == "file_name":
+                value = f"{row['feed_type']}.json"
+            elif value is None and column == "payload_bytes":
+                value = len(row["raw_payload"].encode("utf-8"))
+            values.append(_copy_value(value))
+        return ("\t".join(values) + "\n").encode("utf-8")
+
+    def read(self, size=-1):
+        while self._pos >= len(self._buf):
+            row = next(self._rows, None) if self.rows < self._limit else None
+            if row is None:
+                self.exhausted = self.rows < self._limit
+                return b""
+            self._buf, self._pos = self._line(row), 0
+            self.rows += 1
+            self.bytes += len(self._buf)
+        end = len(self._buf) if size < 0 else self._pos + size
+        chunk = self._buf[self._pos:end]
+        self._pos += len(chunk)
+        return chunk
+
+
+def bulk_copy_to_bronze(
+    rows,
+    *,
+    batch_size: Optional[int] = None,
+    table: str = "bronze.gbfs_feed_raw",
+    columns: Tuple[str, ...] = COPY_COLUMNS,
+    conn=None,
+) -> Dict[str, Any]:
+    """
+    Stream an iterable of bronze row dicts (keys as in COPY_COLUMNS,
+    raw_payload as JSON text) into bronze.gbfs_feed_raw with COPY FROM STDIN,
+    committing every `batch_size` rows (BRONZE_COPY_BATCH_SIZE). No duplicate
+    check: load into an empty range. `table` and `columns` allow loading
+    the same rows into a copy of the table (e.g. with their original `id`).
+
+    Returns {"rows", "bytes", "seconds", "rows_per_second"}.
+    """
+    if conn is None:
+        with get_pg_connection() as conn:
+            return bulk_copy_to_bronze(rows, batch_size=batch_size, table=table, columns=columns, conn=conn)
+
+    batch_size = batch_size or BRONZE_COPY_BATCH_SIZE
+    rows = iter(rows)
+    started = time.monotonic()
+    stats = {"rows": 0, "bytes": 0}
+    copy_sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+
+    with conn.cursor() as cur:
+        while True:
+            stream = _CopyStream(rows, batch_size, columns)
+            cur.copy_expert(copy_sql, stream, size=COPY_READ_SIZE)
+            conn.commit()
+            stats["rows"] += stream.rows
+            stats["bytes"] += stream.bytes
+            if stream.exhausted:
+                break
+
+    stats["seconds"] = time.monotonic() - started
+    stats["rows_per_second"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+# One multi-row INSERT for a whole load batch, with the same duplicate check as
+# INSERT_SQL applied row by row. The batch's pointer rows are locked in key
+# order, so two batches sharing feeds cannot deadlock. execute_values fills
+# VALUES %s; the returned (id, source_name, feed_type) rows identify which
+# payloads were stored.
+BATCH_INSERT_SQL = """
+WITH new_rows (ord, load_batch_id, source_name, feed_type, api_url, version, raw_payload, payload_bytes, skip_duplicates) AS (
+    VALUES %s
+),
+latest AS (
+    SELECT l.source_name, l.feed_type, l.content_hash
+    FROM bronze.gbfs_feed_latest l
+    WHERE (l.source_name, l.feed_type) IN (SELECT source_name, feed_type FROM new_rows)
+    ORDER BY l.source_name, l.feed_type
+    FOR UPDATE
+)
+INSERT INTO bronze.gbfs_feed_raw (
+    feed_type,
+    source_name,
+    load_batch_id,
+    file_name,
+    api_url,
+    version,
+    raw_payload,
+    payload_bytes
+)
+SELECT n.feed_type,
+       n.source_name,
+       n.load_batch_id,
+       n.feed_type || '.json',
+       n.api_url,
+       n.version,
+       n.raw_payload,
+       n.payload_bytes
+FROM new_rows n
+WHERE NOT n.skip_duplicates
+   OR bronze.gbfs_content_hash(n.raw_payload) IS DISTINCT FROM (
+        SELECT l.content_hash
+        FROM latest l
+        WHERE l.source_name = n.source_name
+          AND l.feed_type = n.feed_type
+   )
+ORDER BY n.ord
+RETURNING id, source_name, feed_type
+"""
+
+BATCH_INSERT_TEMPLATE = """(
+    %(ord)s,
+    %(load_batch_id)s,
+    %(source_name)s,
+    %(feed_type)s,
+    %(api_url)s,
+    %(version)s,
+    %(raw_payload)s::jsonb,
+    %(bytes)s::integer,
+    %(skip_duplicates)s
+)"""
+
+
+class BronzeBatchWriter:
+    """
+    Collects the raw payloads of one load_batch_id and writes them to
+    bronze.gbfs_feed_raw in a single transaction, so a batch is stored
+    completely or not at all. `add` is thread-safe; each
+    (source_name, feed_name) is expected once per batch.
+
+    `flush(conn)` inserts what was added so far without committing, so a
+    writer thread can load payloads while others are still being fetched;
+    `write(conn)` on the same connection inserts the rest and commits.
+
+    Usage:
+        writer = BronzeBatchWriter(batch_id)
+        writer.add(feed_name=..., source_name=..., api_url=..., raw_body=..., version=...)
+        result = writer.write()
+        # {"ids": {(source_name, feed_name): id or None}, "inserted": 3, "bytes": 52311}
+    """
+
+    def __init__(self, batch_id: str, skip_duplicates: bool = True):
+        self.batch_id = batch_id
+        self.skip_duplicates = skip_duplicates
+        self._rows = []
+        self._lock = threading.Lock()
+        # Rows already inserted in the open transaction, and what they returned
+        self._flushed = 0
+        self._returned = []
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(
+        self,
+        *,
+        feed_name: str,
+        source_name: str,
+        api_url: str,
+        raw_body: Union[bytes, BinaryIO],
+        version: Optional[str] = None,
+    ):
+        """raw_body: the response body as bytes or as a binary file (e.g. StreamedFeed.raw_file())."""
+        raw_payload, size = _payload_text(raw_body)
+        with self._lock:
+            self._rows.append({
+                "ord": len(self._rows),
+                "load_batch_id": self.batch_id,
+                "source_name": source_name,
+                "feed_type": feed_name,
+                "api_url": api_url,
+                "version": version,
+                "raw_payload": raw_payload,
+                "skip_duplicates": self.skip_duplicates,
+                "bytes": size,
+            })
+
+    def flush(self, conn, upto: Optional[int] = None) -> int:
+        """
+        Insert the rows added since the last flush (up to row `upto`) in the
+        connection's open transaction, without committing. On failure the
+        transaction is rolled back and everything counts as unflushed again.
+        Returns the number of rows sent.
+        """
+        with self._lock:
+            upto = len(self._rows) if upto is None else upto
+            rows = self._rows[self._flushed:upto]
+        if not rows:
+            return 0
+        try:
+            with conn.cursor() as cur:
+                returned = execute_values(
+                    cur, BATCH_INSERT_SQL, rows,
+                    template=BATCH_INSERT_TEMPLATE, page_size=len(rows), fetch=True,
+                )
+        except Exception:
+            conn.rollback()
+            self._flushed, self._returned = 0, []
+            raise
+        self._flushed = upto
+        self._returned.extend(returned)
+        return len(rows)
+
+    def write(self, conn=None) -> Dict[str, Any]:
+        """
+        Insert everything added so far and commit. Returns the stored id per
+        (source_name, feed_name) (None for payloads skipped as duplicates),
+        the number of rows inserted and the total raw bytes of the batch.
+        The rows are kept when the write fails, so it can be retried.
+        """
+        with self._lock:
+            rows = list(self._rows)
+        ids: Dict[Tuple[str, str], Optional[int]] = {(r["source_name"], r["feed_type"]): None for r in rows}
+        result = {"ids": ids, "inserted": 0, "bytes": sum(r["bytes"] for r in rows)}
+        if not rows:
+            return result
+        if conn is None:
+            with get_pg_connection() as conn:
+                return self._write(conn, len(rows), result)
+        return self._write(conn, len(rows), result)
+
+    def _write(self, conn, count, result):
+        self.flush(conn, upto=count)
+        try:
+            conn.commit()
+        except Exception:
+            self._flushed, self._returned = 0, []
+            raise
+        returned, self._returned = self._returned, []
+        with self._lock:
+            del self._rows[:count]
+            self._flushed = 0
+        for bronze_id, source_name, feed_type in returned:
+            result["ids"][(source_name, feed_type)] = bronze_id
+        result["inserted"] = len(returned)
+        return result
@@ -0,0 +1,208 @@
+# utils/cold_archive.py
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime, timezone
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.bronze_loader import bulk_copy_to_bronze, COPY_COLUMNS
+
+# Read cold archive settings from environment variables
+# e.g. COLD_ARCHIVE_DIR, BRONZE_HOT_DAYS
+COLD_ARCHIVE_DIR = os.getenv("COLD_ARCHIVE_DIR", "archive/cold")
+BRONZE_HOT_DAYS = int(os.getenv("BRONZE_HOT_DAYS", "28"))
+COLD_ARCHIVE_COMPRESSION = os.getenv("COLD_ARCHIVE_COMPRESSION", "zstd")
+
+# Bronze columns kept in the archive; generated columns are recomputed on reload
+COLUMNS = (
+    "id",
+    "time_ingested",
+    "load_batch_id",
+    "source_name",
+    "feed_type",
+    "file_name",
+    "api_url",
+    "version",
+    "raw_payload",
+    "content_hash",
+    "payload_bytes",
+)
+
+SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("time_ingested", pa.timestamp("us", tz="UTC")),
+    ("load_batch_id", pa.string()),
+    ("source_name", pa.string()),
+    ("feed_type", pa.string()),
+    ("file_name", pa.string()),
+    ("api_url", pa.string()),
+    ("version", pa.string()),
+    ("raw_payload", pa.string()),
+    ("content_hash", pa.string()),
+    ("payload_bytes", pa.int32()),
+])
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ColdArchive:
+    """
+    Compressed Parquet copies of old bronze rows, one file per archived bronze
+    partition, in the directory of the UTC day of its oldest row:
+    <archive_dir>/date=YYYY-MM-DD/part-<min_id>-<max_id>.parquet
+
+    <archive_dir>/manifest.json lists every file with its row count, id and
+    time range, size and sha256, plus `archived_until`: every bronze row
+    ingested before it has been moved here. raw_payload is stored as the
+    jsonb text Postgres returned.
+    """
+
+    def __init__(self, archive_dir=None):
+        self.archive_dir = archive_dir or COLD_ARCHIVE_DIR
+        self.manifest_path = os.path.join(self.archive_dir, "manifest.json")
+        self._lock = threading.Lock()
+
+    def manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {"archived_until": None, "files": []}
+        with open(self.manifest_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def archived_until(self):
+        """Exclusive upper bound of the archived time range, or None if nothing is archived."""
+        value = self.manifest()["archived_until"]
+        return datetime.fromisoformat(value) if value else None
+
+    def _write_manifest(self, manifest):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def write_file(self, chunks):
+        """
+        Write rows to one Parquet file. `chunks` is an iterable of lists of
+        row dicts (keys as COLUMNS), written one row group each so memory
+        stays at one chunk. Returns the manifest entry, or None when there
+        were no rows. The manifest is not updated; see `commit_file`.
+        """
+        os.makedirs(self.archive_dir, exist_ok=True)
+        tmp_path = os.path.join(self.archive_dir, f"part.{threading.get_ident()}.parquet.tmp")
+
+        entry = {"date": None, "rows": 0, "min_id": None, "max_id": None,
+                 "min_time": None, "max_time": None}
+        writer = None
+        try:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                frame = pd.DataFrame(chunk, columns=list(COLUMNS))
+                frame["time_ingested"] = pd.to_datetime(frame["time_ingested"], utc=True)
+                table = pa.Table.from_pandas(frame, schema=SCHEMA, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, SCHEMA, compression=COLD_ARCHIVE_COMPRESSION)
+                writer.write_table(table)
+
+                entry["rows"] += len(frame)
+                ids = (int(frame["id"].min()), int(frame["id"].max()))
+                times = (frame["time_ingested"].min(), frame["time_ingested"].max())
+                entry["min_id"] = ids[0] if entry["min_id"] is None else min(entry["min_id"], ids[0])
+                entry["max_id"] = ids[1] if entry["max_id"] is None else max(entry["max_id"], ids[1])
+                entry["min_time"] = times[0] if entry["min_time"] is None else min(entry["min_time"], times[0])
+                entry["max_time"] = times[1] if entry["max_time"] is None else max(entry["max_time"], times[1])
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if writer is None:
+            return None
+        with open(tmp_path, "rb+") as f:
+            os.fsync(f.fileno())
+        entry["date"] = entry["min_time"].date().isoformat()
+        day_dir = os.path.join(self.archive_dir, f"date={entry['date']}")
+        os.makedirs(day_dir, exist_ok=True)
+        file_name = f"part-{entry['min_id']}-{entry['max_id']}.parquet"
+        path = os.path.join(day_dir, file_name)
+        os.replace(tmp_path, path)
+
+        entry["path"] = os.path.relpath(path, self.archive_dir)
+        entry["min_time"] = entry["min_time"].isoformat()
+        entry["max_time"] = entry["max_time"].isoformat()
+        entry["bytes"] = os.path.getsize(path)
+        entry["sha256"] = _sha256(path)
+        entry["archived_at"] = datetime.now(timezone.utc).isoformat()
+        return entry
+
+    def commit_file(self, entry, archived_until):
+        """Record a written file (or None) and advance archived_until in the manifest."""
+        with self._lock:
+            manifest = self.manifest()
+            if entry is not None:
+                manifest["files"] = [f for f in manifest["files"] if f["path"] != entry["path"]]
+                manifest["files"].append(entry)
+            current = manifest["archived_until"]
+            if current is None or datetime.fromisoformat(current) < archived_until:
+                manifest["archived_until"] = archived_until.isoformat()
+            self._write_manifest(manifest)
+
+    def iter_records(self, start, end, source_name=None, feed_type=None, batch_size=100):
+        """
+        Yield archived rows with start <= time_ingested < end (aware datetimes)
+        as dicts (keys as COLUMNS, time_ingested a datetime), optionally for
+        one source/feed only. Only files whose time range overlaps are opened,
+        and rows are read batch_size at a time. A row archived twice (job
+        interrupted between writing and deleting) is yielded once.
+        """
+        seen_ids = set()
+        for entry in sorted(self.manifest()["files"], key=lambda f: f["min_time"]):
+            if datetime.fromisoformat(entry["max_time"]) < start or datetime.fromisoformat(entry["min_time"]) >= end:
+                continue
+            parquet = pq.ParquetFile(os.path.join(self.archive_dir, entry["path"]))
+            for batch in parquet.iter_batches(batch_size=batch_size):
+                for row in batch.to_pylist():
+                    if not start <= row["time_ingested"] < end:
+                        continue
+                    if source_name is not None and row["source_name"] != source_name:
+                        continue
+                    if feed_type is not None and row["feed_type"] != feed_type:
+                        continue
+                    if row["id"] in seen_ids:
+                        continue
+                    seen_ids.add(row["id"])
+                    yield row
+
+    def load_to_temp_table(self, conn, start, end, table="bronze_cold"):
+        """
+        Copy archived rows with start <= time_ingested < end into a temporary
+        table shaped like bronze.gbfs_feed_raw (generated columns included),
+        so SQL written against bronze can read them. Commits; the temporary
+        table lives until the connection is closed. Returns the row count.
+        """
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS pg_temp.{table}")
+            cur.execute(f"CREATE TEMP TABLE {table} (LIKE bronze.gbfs_feed_raw INCLUDING GENERATED)")
+        conn.commit()
+        stats = bulk_copy_to_bronze(
+            self.iter_records(start, end),
+            table=f"pg_temp.{table}",
+            columns=("id",) + COPY_COLUMNS,
+            conn=conn,
+        )
+        with conn.cursor() as cur:
+            cur.execute(f"ANALYZE pg_temp.{table}")
+        conn.commit()
+        return stats["rows"]
+
@@ -1,8 +1,18 @@
 # utils/db.py
 import os
+import time
+import atexit
+import threading
 import psycopg2
+from psycopg2 import pool as pg_pool
 from contextlib import contextmanager
-import psycopg2
+
+# Connection pool sizing and health settings (see .env)
+PG_POOL_MIN = int(os.getenv("PG_POOL_MIN", "1"))
+PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", "10"))
+PG_POOL_MAX_AGE = float(os.getenv("PG_POOL_MAX_AGE", "1800"))              # recycle connections older than this, seconds
+PG_POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", "30"))                # max wait for a free connection, seconds
+PG_POOL_VALIDATE_IDLE = float(os.getenv("PG_POOL_VALIDATE_IDLE", "30"))    # ping connections idle longer than this
 
 # Read connection info from environment variables
 # e.g. POSTGRES_HOST, POSTGRES_DB, POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_PORT
@@ -15,21 +25,157 @@ def _get_pg_params():
         "port": int(os.getenv("POSTGRES_PORT", "5433")),
     }
 
+
+class ConnectionPool:
+    """
+    Thread-safe Postgres connection pool (psycopg2 ThreadedConnectionPool).
+
+    - callers block up to `timeout` seconds for a free connection instead of
+      getting PoolError when all `maxconn` are checked out
+    - on checkout, closed connections and ones older than `max_age` are
+      replaced, and connections idle longer than PG_POOL_VALIDATE_IDLE are
+      pinged with SELECT 1 first
+    - on return, an open transaction is rolled back (what closing a
+      connection used to do) and autocommit is switched back off
+    """
+
+    def __init__(self, minconn=None, maxconn=None, max_age=None, timeout=None, **params):
+        self.maxconn = maxconn or PG_POOL_MAX
+        self.max_age = PG_POOL_MAX_AGE if max_age is None else max_age
+        self.timeout = PG_POOL_TIMEOUT if timeout is None else timeout
+        self._pool = pg_pool.ThreadedConnectionPool(
+            min(PG_POOL_MIN if minconn is None else minconn, self.maxconn),
+            self.maxconn,
+            **(params or _get_pg_params()),
+        )
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._lock = threading.Lock()
+        self._opened_at = {}    # id(conn) -> monotonic time the connection was opened
+        self._returned_at = {}  # id(conn) -> monotonic time it was last returned
+        self._stats = {
+            "checkouts": 0,
+            "wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "opened": 0,
+            "recycled": 0,
+            "in_use": 0,
+        }
+
+    def getconn(self):
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise pg_pool.PoolError(f"No Postgres connection free after {self.timeout}s ({self.maxconn} in use)")
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        waited = time.monotonic() - started
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["wait_seconds"] += waited
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+            self._stats["in_use"] += 1
+        return conn
+
+    def _checkout(self):
+        while True:
+            conn = self._pool.getconn()
+            now = time.monotonic()
+            with self._lock:
+                if id(conn) not in self._opened_at:
+                    self._opened_at[id(conn)] = now
+                    self._stats["opened"] += 1
+                opened_at = self._opened_at[id(conn)]
+                returned_at = self._returned_at.get(id(conn), now)
+
+            if conn.closed or now - opened_at > self.max_age:
+                self._discard(conn)
+                continue
+            if now - returned_at > PG_POOL_VALIDATE_IDLE:
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT 1")
+                    conn.rollback()
+                except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                    self._discard(conn)
+                    continue
+            return conn
+
+    def _discard(self, conn):
+        with self._lock:
+            self._opened_at.pop(id(conn), None)
+            self._returned_at.pop(id(conn), None)
+            self._stats["recycled"] += 1
+        self._pool.putconn(conn, close=True)
+
+    def putconn(self, conn, close=False):
+        try:
+            if close or conn.closed:
+                with self._lock:
+                    self._opened_at.pop(id(conn), None)
+                    self._returned_at.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)
+                return
+            if conn.autocommit:
+                conn.autocommit = False
+            with self._lock:
+                self._returned_at[id(conn)] = time.monotonic()
+            self._pool.putconn(conn)  # rolls back an open transaction
+        finally:
+            with self._lock:
+                self._stats["in_use"] -= 1
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def closeall(self):
+        self._pool.closeall()
+
+
+_pg_pool = None
+_pg_pool_lock = threading.Lock()
+
+
+def get_pg_pool():
+    """Return the process-wide ConnectionPool, created on first use."""
+    global _pg_pool
+    with _pg_pool_lock:
+        if _pg_pool is None:
+            _pg_pool = ConnectionPool()
+            atexit.register(_pg_pool.closeall)
+        return _pg_pool
+
+
+def get_pool_stats():
+    """Checkout and wait-time counters of the process-wide pool ({} if it was never used)."""
+    return _pg_pool.stats() if _pg_pool is not None else {}
+
+
 @contextmanager
 def get_pg_connection():
     """
+    Borrow a connection from the process-wide pool; it is handed back (and any
+    uncommitted work rolled back) when the block exits.
+
     Usage:
         with get_pg_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("SELECT 1")
                 conn.commit()
     """
-    params = _get_pg_params()
-    conn = psycopg2.connect(**params)  # opens connection[web:27][web:29]
+    pool = get_pg_pool()
+    conn = pool.getconn()
+    broken = False
     try:
         yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True  # don't hand a possibly dead connection to the next caller
+        raise
     finally:
-        conn.close()
+        pool.putconn(conn, close=broken)
 
 
 # utils/io.py
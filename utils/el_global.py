@@ -2,23 +2,233 @@ import requests
 import pandas as pd
 import os
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urlparse, urlencode
+from requests.adapters import HTTPAdapter
+
+from utils.fetch_policy import get_fetch_policy
+from utils.gbfs_stream import stream_feed
+
+
+# Shared HTTP client settings, read from the environment like utils/db.py does
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", "10"))
+FETCH_MAX_PER_HOST = int(os.getenv("FETCH_MAX_PER_HOST", "6"))
+
+_session = None
+_session_lock = threading.Lock()
+_host_semaphores = {}
+
+
+def get_http_session():
+    """
+    Return the process-wide requests.Session.
+    The session keeps a keep-alive connection pool per host, so repeated
+    fetches against the GBFS host reuse the same TCP+TLS connections.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=FETCH_MAX_WORKERS,
+                pool_maxsize=FETCH_MAX_PER_HOST,
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def _host_semaphore(url):
+    host = urlparse(url).netloc
+    with _session_lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(FETCH_MAX_PER_HOST)
+        return _host_semaphores[host]
+
+
+def _send(url, headers, stream, timeout):
+    with _host_semaphore(url):
+        return get_http_session().get(url, headers=headers, stream=stream, timeout=timeout)
+
+
+def http_get(url, headers=None, stream=False):
+    """
+    GET through the shared session under the fetch policy (utils/fetch_policy.py):
+    adaptive timeout, jittered retries, optional hedging and a per-host
+    circuit breaker. Streaming responses are never hedged.
+    """
+    return get_fetch_policy().call(url, partial(_send, url, headers or {}, stream), hedge=not stream)
 
 
 def get_package_metadata(base_url, dataset_id):
-    url = f"{base_url}/api/3/action/package_show"
-    params = {"id": dataset_id}
-    return requests.get(url, params=params).json()
+    url = f"{base_url}/api/3/action/package_show?{urlencode({'id': dataset_id})}"
+    return http_get(url).json()
 
 
 def get_resource_metadata(base_url, resource_id):
     url = f"{base_url}/api/3/action/resource_show?id={resource_id}"
-    return requests.get(url).json()
+    return http_get(url).json()
+
+
+def discover_gbfs_resources(base_url, dataset_id, resource_names, cache=None):
+    """
+    Resolve the GBFS entry point (feeds.json) URL of each wanted CKAN resource.
+    Returns {resource_name: url}.
+
+    The package_show response already lists every resource with its name and
+    url, so one request is enough; resource_show is only called for resources
+    whose url is missing. With a DiscoveryCache (utils/fetch_cache.py) even
+    that request is skipped until the cached entry expires or is invalidated.
+    """
+    resources = cache.get(dataset_id) if cache is not None else None
+    if resources is None:
+        resources = {}
+        package = get_package_metadata(base_url, dataset_id)
+        for resource in package["result"]["resources"]:
+            if resource["datastore_active"]:
+                continue
+            name, url = resource.get("name"), resource.get("url")
+            if not name or not url:
+                metadata = get_resource_metadata(base_url, resource["id"])["result"]
+                name, url = metadata["name"], metadata["url"]
+            resources[resource["id"]] = {"name": name, "url": url}
+        if cache is not None:
+            cache.put(dataset_id, resources)
+
+    return {
+        resource["name"]: resource["url"]
+        for resource in resources.values()
+        if resource["name"] in resource_names
+    }
+
+
+def fetch_raw(url):
+    """Fetch a document and return the response body bytes, undecoded."""
+    response = http_get(url)
+    response.raise_for_status()
+    return response.content
 
 
 def fetch_json(url):
-    response = requests.get(url)
+    return json.loads(fetch_raw(url))
+
+
+# Cache statuses returned by fetch_raw_cached; anything but "miss" means
+# the payload is the one we already had, so it does not need to be stored again.
+CACHE_FRESH = "fresh"              # still inside the feed's ttl, no request sent
+CACHE_NOT_MODIFIED = "not_modified"  # server answered 304 to a conditional request
+CACHE_UNCHANGED = "unchanged"      # downloaded, but last_updated did not move
+CACHE_MISS = "miss"
+
+
+def fetch_raw_cached(url, cache):
+    """
+    Fetch a GBFS document through a FetchCache (utils/fetch_cache.py).
+    Returns (raw_body, cache_status), see the CACHE_* constants above.
+    """
+    entry = cache.get(url)
+    if entry is not None and cache.is_fresh(entry):
+        return entry["body"].encode("utf-8"), CACHE_FRESH
+
+    response = http_get(url, headers=_conditional_headers(entry))
+    if response.status_code == 304 and entry is not None:
+        cache.touch(entry)
+        return entry["body"].encode("utf-8"), CACHE_NOT_MODIFIED
     response.raise_for_status()
-    return response.json()
+    body = response.content
+
+    new_entry = cache.put(
+        url,
+        body,
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
+    )
+    return body, _miss_status(entry, new_entry)
+
+
+def stream_raw_cached(url, cache):
+    """
+    Streaming counterpart of fetch_raw_cached. Returns (streamed, cache_status,
+    done): on a miss, streamed is a StreamedFeed over the response body (None
+    otherwise). Once its records() are exhausted, done() copies the body into
+    the cache from the StreamedFeed's spool file and returns the final status,
+    CACHE_MISS or CACHE_UNCHANGED.
+    """
+    entry = cache.get(url)
+    if entry is not None and cache.is_fresh(entry):
+        return None, CACHE_FRESH, None
+
+    response = http_get(url, headers=_conditional_headers(entry), stream=True)
+    if response.status_code == 304 and entry is not None:
+        response.close()
+        cache.touch(entry)
+        return None, CACHE_NOT_MODIFIED, None
+    streamed = stream_feed(response)
+
+    def done():
+        new_entry = cache.put(
+            url,
+            streamed.raw_file(),
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            header=streamed.header,
+        )
+        return _miss_status(entry, new_entry)
+
+    return streamed, CACHE_MISS, done
+
+
+def _conditional_headers(entry):
+    headers = {}
+    if entry is not None:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def _miss_status(entry, new_entry):
+    """CACHE_UNCHANGED when a downloaded body has the cached last_updated, else CACHE_MISS."""
+    if (
+        entry is not None
+        and new_entry["last_updated"] is not None
+        and new_entry["last_updated"] == entry.get("last_updated")
+    ):
+        return CACHE_UNCHANGED
+    return CACHE_MISS
+
+
+def fetch_json_cached(url, cache):
+    """Same as fetch_raw_cached, returning the decoded payload: (payload, cache_status)."""
+    body, cache_status = fetch_raw_cached(url, cache)
+    return json.loads(body), cache_status
+
+
+def fetch_many_json(urls, max_workers=None, fetch=fetch_json):
+    """
+    Fetch several JSON documents in parallel over the shared session.
+    Concurrency is bounded globally by max_workers and per host by
+    FETCH_MAX_PER_HOST. `fetch` is called once per url (e.g. fetch_raw
+    or a fetch_raw_cached partial). Returns {url: result or Exception} so one
+    failed feed does not discard the others.
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+    workers = min(max_workers or FETCH_MAX_WORKERS, len(urls))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {url: pool.submit(fetch, url) for url in urls}
+    results = {}
+    for url, future in futures.items():
+        try:
+            results[url] = future.result()
+        except Exception as exc:
+            results[url] = exc
+    return results
 
 
 def load_json_from_file(file_path):
@@ -0,0 +1,190 @@
+# utils/fetch_cache.py
+import os
+import json
+import time
+import hashlib
+import threading
+
+from utils.gbfs_stream import peek_header, json_string_chunks
+
+# Read cache settings from environment variables
+# e.g. FETCH_CACHE_DIR, FETCH_CACHE_MAX_ENTRIES, FETCH_CACHE_MAX_AGE
+FETCH_CACHE_DIR = os.getenv("FETCH_CACHE_DIR", ".cache/gbfs_fetch")
+FETCH_CACHE_MAX_ENTRIES = int(os.getenv("FETCH_CACHE_MAX_ENTRIES", "500"))
+FETCH_CACHE_MAX_AGE = int(os.getenv("FETCH_CACHE_MAX_AGE", "86400"))
+
+
+class FetchCache:
+    """
+    On-disk cache of GBFS responses, one JSON file per URL.
+
+    Each entry keeps the raw response body together with what is needed to avoid the
+    next download: the feed's ttl/last_updated and the ETag/Last-Modified
+    response headers. Entries older than max_age seconds are evicted, and
+    the least recently fetched entries go first once max_entries is reached.
+    """
+
+    def __init__(self, cache_dir=None, max_entries=None, max_age=None):
+        self.cache_dir = cache_dir or FETCH_CACHE_DIR
+        self.max_entries = max_entries or FETCH_CACHE_MAX_ENTRIES
+        self.max_age = max_age or FETCH_CACHE_MAX_AGE
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, url):
+        path = self._path(url)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("url") != url or "body" not in entry or time.time() - entry["fetched_at"] > self.max_age:
+            return None
+        return entry
+
+    def put(self, url, body, etag=None, last_modified=None, header=None):
+        """
+        Store a raw response body; ttl/last_updated come from a header peek, not a
+        full decode. body may also be a binary file (e.g. StreamedFeed.raw_file()),
+        copied into the entry in chunks; pass the already parsed `header` with it.
+        """
+        if header is None:
+            try:
+                header = peek_header(body)
+            except ValueError:
+                header = {}
+        entry = {
+            "url": url,
+            "fetched_at": time.time(),
+            "etag": etag,
+            "last_modified": last_modified,
+            "ttl": header.get("ttl"),
+            "last_updated": header.get("last_updated"),
+        }
+        if isinstance(body, (bytes, bytearray)):
+            entry["body"] = body.decode("utf-8")
+            self._write(entry)
+        else:
+            self._write(entry, body_file=body)
+        return entry
+
+    def touch(self, entry):
+        """Mark a cached entry as revalidated (e.g. after a 304) by resetting its fetch time."""
+        entry = {**entry, "fetched_at": time.time()}
+        self._write(entry)
+        return entry
+
+    def _write(self, entry, body_file=None):
+        path = self._path(entry["url"])
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            if body_file is None:
+                json.dump(entry, f)
+            else:
+                f.write(json.dumps(entry)[:-1] + ', "body": ')
+                for chunk in json_string_chunks(body_file, ensure_ascii=True):
+                    f.write(chunk)
+                f.write("}")
+        os.replace(tmp_path, path)  # atomic swap, readers never see half a file
+        self.evict()
+
+    def is_fresh(self, entry, now=None):
+        """
+        True while the feed is still inside its advertised TTL.
+        GBFS defines ttl relative to last_updated; fall back to the fetch time
+        when last_updated is missing or not a unix timestamp, and never trust a
+        server clock that runs ahead of ours.
+        """
+        ttl = entry.get("ttl")
+        if not isinstance(ttl, (int, float)) or ttl <= 0:
+            return False
+        now = now or time.time()
+        last_updated = entry.get("last_updated")
+        if not isinstance(last_updated, (int, float)):
+            last_updated = entry["fetched_at"]
+        return now < min(last_updated, entry["fetched_at"]) + ttl
+
+    def evict(self):
+        with self._lock:
+            try:
+                names = [n for n in os.listdir(self.cache_dir) if n.endswith(".json")]
+            except OSError:
+                return
+            files = []
+            now = time.time()
+            for name in names:
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    mtime = os.path.getmtime(path)
+                except OSError:
+                    continue
+                if now - mtime > self.max_age:
+                    _remove_quietly(path)
+                else:
+                    files.append((mtime, path))
+            files.sort()
+            for _, path in files[: max(0, len(files) - self.max_entries)]:
+                _remove_quietly(path)
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+DISCOVERY_CACHE_PATH = os.getenv("DISCOVERY_CACHE_PATH", ".cache/ckan_discovery.json")
+DISCOVERY_CACHE_MAX_AGE = int(os.getenv("DISCOVERY_CACHE_MAX_AGE", "86400"))
+
+
+class DiscoveryCache:
+    """
+    On-disk cache of CKAN resource discovery, keyed by dataset id and then
+    resource id: {dataset_id: {"fetched_at": ..., "resources": {resource_id: {"name", "url"}}}}.
+    A dataset entry is refreshed lazily once older than max_age, or
+    explicitly via invalidate() when a resolved URL stops working.
+    """
+
+    def __init__(self, path=None, max_age=None):
+        self.path = path or DISCOVERY_CACHE_PATH
+        self.max_age = max_age or DISCOVERY_CACHE_MAX_AGE
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, data):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, dataset_id):
+        """Return {resource_id: {"name", "url"}} or None when missing or expired."""
+        with self._lock:
+            entry = self._load().get(dataset_id)
+        if entry is None or time.time() - entry["fetched_at"] > self.max_age:
+            return None
+        return entry["resources"]
+
+    def put(self, dataset_id, resources):
+        with self._lock:
+            data = self._load()
+            data[dataset_id] = {"fetched_at": time.time(), "resources": resources}
+            self._save(data)
+
+    def invalidate(self, dataset_id):
+        with self._lock:
+            data = self._load()
+            if data.pop(dataset_id, None) is not None:
+                self._save(data)
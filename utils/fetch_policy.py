@@ -0,0 +1,238 @@
+# utils/fetch_policy.py
+import os
+import time
+import random
+import threading
+from collections import deque
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+
+# Read fetch policy settings from environment variables (see .env)
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "30"))        # default and ceiling, seconds
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))              # retries after the first try
+FETCH_MIN_TIMEOUT = float(os.getenv("FETCH_MIN_TIMEOUT", "2"))
+FETCH_TIMEOUT_P99_MULTIPLIER = float(os.getenv("FETCH_TIMEOUT_P99_MULTIPLIER", "3"))
+FETCH_LATENCY_WINDOW = int(os.getenv("FETCH_LATENCY_WINDOW", "100"))
+FETCH_LATENCY_MIN_SAMPLES = int(os.getenv("FETCH_LATENCY_MIN_SAMPLES", "5"))
+FETCH_RETRY_BACKOFF = float(os.getenv("FETCH_RETRY_BACKOFF", "0.5"))
+FETCH_RETRY_BACKOFF_MAX = float(os.getenv("FETCH_RETRY_BACKOFF_MAX", "10"))
+FETCH_HEDGE_ENABLED = os.getenv("FETCH_HEDGE_ENABLED", "false").lower() == "true"
+FETCH_BREAKER_THRESHOLD = int(os.getenv("FETCH_BREAKER_THRESHOLD", "5"))
+FETCH_BREAKER_COOLDOWN = float(os.getenv("FETCH_BREAKER_COOLDOWN", "30"))
+
+# Responses worth retrying; other 4xx are the caller's problem
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised without sending a request while a host's circuit breaker is open."""
+
+
+class LatencyTracker:
+    """Sliding window of successful request durations for one feed."""
+
+    def __init__(self, window=None):
+        self._samples = deque(maxlen=window or FETCH_LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p):
+        """Nearest-rank percentile, or None until FETCH_LATENCY_MIN_SAMPLES samples exist."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < FETCH_LATENCY_MIN_SAMPLES:
+            return None
+        index = min(len(samples) - 1, max(0, int(round(p / 100 * len(samples))) - 1))
+        return samples[index]
+
+
+class CircuitBreaker:
+    """
+    Per-host breaker: after `threshold` consecutive failed calls (a call fails
+    once its retries are used up) the host is skipped for `cooldown` seconds,
+    then a single trial call is let through (half-open); its outcome closes or
+    re-opens the circuit.
+    """
+
+    def __init__(self, threshold=None, cooldown=None):
+        self.threshold = threshold or FETCH_BREAKER_THRESHOLD
+        self.cooldown = cooldown or FETCH_BREAKER_COOLDOWN
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self, host):
+        """
+        Raise CircuitOpenError while the circuit is open. Returns True when
+        this call holds the half-open trial slot: only that call's outcome
+        (or end_call) releases it.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if time.monotonic() - self._opened_at < self.cooldown or self._trial_in_flight:
+                raise CircuitOpenError(f"Circuit open for {host} after {self._failures} consecutive failures")
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self, trial=False):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            if trial:
+                self._trial_in_flight = False
+
+    def record_failure(self, trial=False):
+        with self._lock:
+            self._failures += 1
+            if trial:
+                self._trial_in_flight = False
+            if self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+    def end_call(self, trial=False):
+        """Release the half-open trial, also when the call ended without an outcome (e.g. a bug raised)."""
+        if not trial:
+            return
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class FetchPolicy:
+    """
+    Timeouts, retries, hedging and circuit breaking around one HTTP GET.
+
+    - timeout: FETCH_TIMEOUT_P99_MULTIPLIER x the feed's observed p99 latency,
+      clamped to [FETCH_MIN_TIMEOUT, REQUEST_TIMEOUT]; REQUEST_TIMEOUT until
+      enough samples exist.
+    - retries: up to RETRY_ATTEMPTS, on connection errors, timeouts and
+      RETRY_STATUSES, sleeping a "full jitter" exponential backoff in between.
+    - hedging (FETCH_HEDGE_ENABLED): when a request is still running after the
+      feed's p95, a duplicate is sent and the first usable answer wins; the
+      other response is closed.
+    - circuit breaker: per host, see CircuitBreaker.
+    """
+
+    def __init__(self, hedge_enabled=None, retries=None):
+        self.hedge_enabled = FETCH_HEDGE_ENABLED if hedge_enabled is None else hedge_enabled
+        self.retries = RETRY_ATTEMPTS if retries is None else retries
+        self._latency = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self._hedge_pool = ThreadPoolExecutor(thread_name_prefix="fetch-hedge")
+
+    def latency(self, url):
+        with self._lock:
+            return self._latency.setdefault(url, LatencyTracker())
+
+    def breaker(self, host):
+        with self._lock:
+            return self._breakers.setdefault(host, CircuitBreaker())
+
+    def timeout_for(self, url):
+        p99 = self.latency(url).percentile(99)
+        if p99 is None:
+            return REQUEST_TIMEOUT
+        return min(max(p99 * FETCH_TIMEOUT_P99_MULTIPLIER, FETCH_MIN_TIMEOUT), REQUEST_TIMEOUT)
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(FETCH_RETRY_BACKOFF_MAX, FETCH_RETRY_BACKOFF * 2 ** attempt))
+
+    def call(self, url, send, hedge=True):
+        """
+        Run `send(timeout)` (which performs the GET and returns a Response)
+        under this policy. Returns the last response, which may still carry an
+        error status for the caller's raise_for_status(); raises the last
+        exception when every attempt failed without a response.
+        """
+        host = urlparse(url).netloc
+        breaker = self.breaker(host)
+        trial = breaker.before_call(host)
+        try:
+            for attempt in range(self.retries + 1):
+                timeout = self.timeout_for(url)
+                try:
+                    if hedge and self.hedge_enabled:
+                        response = self._send_hedged(url, send, timeout)
+                    else:
+                        response = self._send_timed(url, send, timeout)
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt == self.retries:
+                        breaker.record_failure(trial)
+                        raise
+                except requests.RequestException:
+                    breaker.record_failure(trial)  # not retryable (bad URL, redirect loop, ...)
+                    raise
+                else:
+                    if response.status_code not in RETRY_STATUSES:
+                        breaker.record_success(trial)
+                        return response
+                    if attempt == self.retries:
+                        breaker.record_failure(trial)
+                        return response
+                    response.close()
+                time.sleep(self.backoff(attempt))
+        finally:
+            breaker.end_call(trial)
+
+    def _send_timed(self, url, send, timeout):
+        started = time.monotonic()
+        response = send(timeout)
+        if response.status_code not in RETRY_STATUSES:
+            self.latency(url).record(time.monotonic() - started)
+        return response
+
+    def _send_hedged(self, url, send, timeout):
+        hedge_after = self.latency(url).percentile(95)
+        first = self._hedge_pool.submit(self._send_timed, url, send, timeout)
+        if hedge_after is None:
+            return first.result()
+        done, _ = wait([first], timeout=hedge_after)
+        if done:
+            return first.result()
+
+        # Still running past p95: race a duplicate request against it. The first
+        # non-retryable response wins; a fast 5xx or error only counts if the
+        # other request does no better.
+        futures = [first, self._hedge_pool.submit(self._send_timed, url, send, timeout)]
+        pending = set(futures)
+        winner = None
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and future.result().status_code not in RETRY_STATUSES:
+                    winner = future
+                    break
+        if winner is None:
+            winner = next((f for f in futures if f.exception() is None), None)
+        # Close the losing response, now or whenever it arrives, so its pooled
+        # connection is released (it would stay checked out with stream=True)
+        for future in futures:
+            if future is not winner:
+                future.add_done_callback(_close_response)
+        if winner is None:
+            raise futures[-1].exception()
+        return winner.result()
+
+
+def _close_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+_policy = None
+_policy_lock = threading.Lock()
+
+
+def get_fetch_policy():
+    """Return the process-wide FetchPolicy, so latency history is shared by all fetches."""
+    global _policy
+    with _policy_lock:
+        if _policy is None:
+            _policy = FetchPolicy()
+        return _policy
@@ -0,0 +1,291 @@
+# utils/gbfs_stream.py
+import os
+import csv
+import json
+import codecs
+import tempfile
+from functools import partial
+
+# Record arrays inside a GBFS payload's `data` object, in lookup order
+# (same order save_feed_to_csv uses).
+RECORD_KEYS = ("stations", "plans", "regions")
+
+# Raw bodies above this size are spooled to a temporary file instead of memory
+STREAM_SPOOL_MAX_MEMORY = int(os.getenv("STREAM_SPOOL_MAX_MEMORY", str(8 * 1024 * 1024)))
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+
+
+class _TextStream:
+    """Incrementally decoded text buffer over an iterator of byte chunks."""
+
+    def __init__(self, chunks, raw_sink=None):
+        self._chunks = iter(chunks)
+        self._decode = codecs.getincrementaldecoder("utf-8")().decode
+        self._raw_sink = raw_sink
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Read one more chunk; returns False at end of input."""
+        if self.eof:
+            return False
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self.eof = True
+            self.buf = self.buf[self.pos:] + self._decode(b"", final=True)
+            self.pos = 0
+            return False
+        if self._raw_sink is not None:
+            self._raw_sink.write(chunk)
+        # Drop the consumed part of the buffer so memory stays bounded
+        self.buf = self.buf[self.pos:] + self._decode(chunk)
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                raise ValueError("Unexpected end of JSON stream")
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos}, got {self.buf[self.pos]!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decode one complete JSON value, reading more input as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self.buf) and not self.eof and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def _object_keys(stream):
+    """Yield the keys of the object whose `{` was just consumed; the caller reads each value."""
+    if stream.peek() == "}":
+        stream.pos += 1
+        return
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        yield key
+        char = stream.peek()
+        stream.pos += 1
+        if char == "}":
+            return
+        if char != ",":
+            raise ValueError(f"Expected ',' or '}}' at offset {stream.pos - 1}, got {char!r}")
+
+
+def _array_items(stream):
+    """Yield the items of the array whose `[` comes next."""
+    stream.expect("[")
+    if stream.peek() == "]":
+        stream.pos += 1
+        return
+    while True:
+        yield stream.value()
+        char = stream.peek()
+        stream.pos += 1
+        if char == "]":
+            return
+        if char != ",":
+            raise ValueError(f"Expected ',' or ']' at offset {stream.pos - 1}, got {char!r}")
+
+
+def _byte_chunks(raw_body, chunk_size=STREAM_CHUNK_SIZE):
+    return (raw_body[i:i + chunk_size] for i in range(0, len(raw_body), chunk_size))
+
+
+def raw_size(raw_body):
+    """Size in bytes of a raw body given as bytes or as a seekable binary file (from its current position)."""
+    if isinstance(raw_body, (bytes, bytearray)):
+        return len(raw_body)
+    start = raw_body.tell()
+    size = raw_body.seek(0, os.SEEK_END) - start
+    raw_body.seek(start)
+    return size
+
+
+def json_string_chunks(raw_body, ensure_ascii=False):
+    """
+    Yield a raw UTF-8 body (bytes, or a binary file read from its current
+    position) as one JSON string literal, quotes included, a chunk at a time,
+    so it can be embedded in a JSON document without decoding it whole.
+    """
+    if isinstance(raw_body, (bytes, bytearray)):
+        chunks = _byte_chunks(raw_body)
+    else:
+        chunks = iter(partial(raw_body.read, STREAM_CHUNK_SIZE), b"")
+    decode = codecs.getincrementaldecoder("utf-8")().decode
+    yield '"'
+    for chunk in chunks:
+        text = decode(chunk)
+        if text:
+            yield json.dumps(text, ensure_ascii=ensure_ascii)[1:-1]
+    text = decode(b"", final=True)
+    if text:
+        yield json.dumps(text, ensure_ascii=ensure_ascii)[1:-1]
+    yield '"'
+
+
+# Top-level fields every GBFS version requires; `version` is optional in 1.x
+HEADER_FIELDS = ("ttl", "last_updated")
+
+
+def peek_header(raw_body, fields=HEADER_FIELDS):
+    """
+    Lightweight look at a raw GBFS body: decode only the top-level values that
+    come before `data` (version, ttl and last_updated in GBFS feeds). The rest of
+    the body is not even decoded to text, unless one of `fields` was not among
+    them: then `data` is decoded and skipped so fields placed after it are seen.
+    """
+    stream = _TextStream(_byte_chunks(raw_body, 4096))
+    header = {}
+    stream.expect("{")
+    for key in _object_keys(stream):
+        if key == "data":
+            if all(field in header for field in fields):
+                break
+            stream.value()
+            continue
+        header[key] = stream.value()
+    return header
+
+
+class StreamedFeed:
+    """
+    A GBFS payload parsed incrementally from its response body.
+
+    `records()` yields the entries of data.stations / data.plans / data.regions
+    one at a time (or the whole `data` object as a single record when there is
+    no such array), so the full object graph is never built in memory. Once
+    `records()` is exhausted, `header` holds every other value of the payload
+    (version, ttl, last_updated, ...) and `raw_file()` the untouched response
+    bytes, spooled to disk above STREAM_SPOOL_MAX_MEMORY.
+    """
+
+    def __init__(self, chunks, keep_raw=True):
+        self._raw = tempfile.SpooledTemporaryFile(max_size=STREAM_SPOOL_MAX_MEMORY) if keep_raw else None
+        self._stream = _TextStream(chunks, raw_sink=self._raw)
+        self.header = {}
+        self.records_key = None
+        self.record_count = 0
+
+    def records(self):
+        stream = self._stream
+        stream.expect("{")
+        for key in _object_keys(stream):
+            if key == "data" and stream.peek() == "{":
+                yield from self._data_records()
+            else:
+                self.header[key] = stream.value()
+        # Drain anything after the closing brace into the raw copy
+        while stream.fill():
+            pass
+
+    def _data_records(self):
+        stream = self._stream
+        stream.expect("{")
+        data = {}
+        for key in _object_keys(stream):
+            if key in RECORD_KEYS and self.records_key is None and stream.peek() == "[":
+                self.records_key = key
+                for record in _array_items(stream):
+                    self.record_count += 1
+                    yield record
+            else:
+                data[key] = stream.value()
+        if self.records_key is None:
+            # No record array: the data object itself is the single record
+            self.record_count = 1
+            yield data
+        else:
+            data[self.records_key] = []
+        self.header["data"] = data
+
+    @classmethod
+    def from_bytes(cls, raw_body):
+        """Parse a body that is already in memory, without keeping a second raw copy."""
+        return cls(_byte_chunks(raw_body), keep_raw=False)
+
+    def raw_file(self):
+        """
+        The response body exactly as received, as a binary file rewound to its
+        start; hand it to writers that accept a file instead of reading it whole.
+        Only complete once records() is exhausted.
+        """
+        self._raw.seek(0)
+        return self._raw
+
+    def close(self):
+        if self._raw is not None:
+            self._raw.close()
+
+
+def stream_feed(response):
+    """Wrap a streaming GBFS response (requests, stream=True) in a StreamedFeed over its body."""
+    response.raise_for_status()
+    return StreamedFeed(response.iter_content(chunk_size=STREAM_CHUNK_SIZE))
+
+
+def _flatten(record, prefix=""):
+    """Flatten nested dicts into dotted keys, like pd.json_normalize (nested columns last)."""
+    flat = {}
+    nested = {}
+    for key, value in record.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            nested.update(_flatten(value, f"{name}."))  # empty dicts produce no column
+        else:
+            flat[name] = value
+    flat.update(nested)
+    return flat
+
+
+def save_records_to_csv(feed_name, records, output_folder):
+    """
+    Streaming counterpart of save_feed_to_csv: write an iterable of records to
+    <output_folder>/<feed_name>.csv with bounded memory.
+
+    Records are spooled once to a temporary JSON-lines file while the column
+    set is collected, then written out as CSV in a second pass.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    file_path = os.path.join(output_folder, f"{feed_name}.csv")
+
+    columns = {}
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as spool:
+        for record in records:
+            flat = _flatten(record)
+            for column in flat:
+                columns.setdefault(column, None)
+            spool.write(json.dumps(flat))
+            spool.write("\n")
+
+        spool.seek(0)
+        with open(file_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(columns))
+            writer.writeheader()
+            for line in spool:
+                writer.writerow(json.loads(line))
+
+    return file_path
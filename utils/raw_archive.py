@@ -0,0 +1,141 @@
+# utils/raw_archive.py
+import os
+import json
+import gzip
+import zlib
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone, timedelta
+
+from utils.gbfs_stream import json_string_chunks
+
+try:
+    import fcntl
+except ImportError:  # Windows: no lock between processes
+    fcntl = None
+
+# Read archive settings from environment variables
+# e.g. RAW_ARCHIVE_ENABLED, RAW_ARCHIVE_DIR
+RAW_ARCHIVE_ENABLED = os.getenv("RAW_ARCHIVE_ENABLED", "false").lower() == "true"
+RAW_ARCHIVE_DIR = os.getenv("RAW_ARCHIVE_DIR", "archive/raw")
+
+
+class RawArchive:
+    """
+    Append-only archive of raw API responses, one gzip file per UTC day:
+    <archive_dir>/YYYY-MM-DD.jsonl.gz
+
+    Every append adds one gzip member holding one JSON line with the bronze
+    metadata (time_ingested, load_batch_id, source_name, feed_type, api_url,
+    version) and the untouched response body. Concatenated gzip members are a
+    valid gzip stream, so files are only appended to. A crash mid-append
+    leaves a cut-off member at the end; the first append to a file in a
+    process truncates it back to its last complete member. Appends hold an
+    exclusive lock on the file, so the extractor and the polling daemon can
+    share a day.
+    """
+
+    def __init__(self, archive_dir=None):
+        self.archive_dir = archive_dir or RAW_ARCHIVE_DIR
+        self._lock = threading.Lock()
+        self._repaired = set()
+        os.makedirs(self.archive_dir, exist_ok=True)
+
+    def _path(self, day):
+        return os.path.join(self.archive_dir, f"{day.isoformat()}.jsonl.gz")
+
+    def append(self, *, source_name, feed_name, batch_id, api_url, raw_body, version=None, time_ingested=None):
+        """
+        Archive one response. raw_body is the body as bytes or as a binary file
+        (e.g. StreamedFeed.raw_file()), which is compressed in chunks.
+        """
+        time_ingested = time_ingested or datetime.now(timezone.utc)
+        record = {
+            "time_ingested": time_ingested.isoformat(),
+            "load_batch_id": batch_id,
+            "source_name": source_name,
+            "feed_type": feed_name,
+            "api_url": api_url,
+            "version": version,
+        }
+        # raw_payload goes last, streamed into the member after the metadata
+        head = json.dumps(record, ensure_ascii=False)[:-1] + ', "raw_payload": '
+        path = self._path(time_ingested.astimezone(timezone.utc).date())
+        with self._lock, open(path, "ab") as f, _locked(f):
+            if path not in self._repaired:
+                _repair_tail(f)
+                self._repaired.add(path)
+            with gzip.GzipFile(filename="", fileobj=f, mode="wb") as member:
+                member.write(head.encode("utf-8"))
+                for chunk in json_string_chunks(raw_body):
+                    member.write(chunk.encode("utf-8"))
+                member.write(b"}\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def iter_records(self, start, end):
+        """
+        Yield archived records with start <= time_ingested < end (aware datetimes),
+        in file order. time_ingested is returned as a datetime.
+        """
+        day = start.astimezone(timezone.utc).date()
+        last_day = end.astimezone(timezone.utc).date()
+        while day <= last_day:
+            path = self._path(day)
+            if os.path.exists(path):
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    try:
+                        for line in f:
+                            record = json.loads(line)
+                            record["time_ingested"] = datetime.fromisoformat(record["time_ingested"])
+                            if start <= record["time_ingested"] < end:
+                                yield record
+                    except EOFError:
+                        pass  # last member cut short by a crash mid-append
+            day += timedelta(days=1)
+
+
+@contextmanager
+def _locked(f):
+    """Exclusive lock on an open archive file, against other processes."""
+    if fcntl is None:
+        yield
+        return
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _complete_length(f, chunk_size=1 << 20):
+    """Bytes of `f` taken up by complete gzip members, from the start."""
+    f.seek(0)
+    complete = offset = 0
+    member = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    while True:
+        data = f.read(chunk_size)
+        if not data:
+            return complete
+        while data:
+            try:
+                member.decompress(data)
+            except zlib.error:
+                return complete
+            if not member.eof:
+                offset += len(data)
+                break
+            offset += len(data) - len(member.unused_data)
+            complete = offset
+            data = member.unused_data
+            member = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+
+def _repair_tail(f):
+    """Cut a member left incomplete by a crash mid-append, so new members follow complete ones."""
+    with open(f.name, "rb") as reader:
+        complete = _complete_length(reader)
+    size = os.fstat(f.fileno()).st_size
+    if complete < size:
+        f.truncate(complete)
+        os.fsync(f.fileno())
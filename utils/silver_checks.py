@@ -0,0 +1,253 @@
+# utils/silver_checks.py
+import json
+from decimal import Decimal, ROUND_HALF_UP
+
+import pandas as pd
+
+# Checks a GBFS record has to pass before a silver loader casts it, one list per
+# feed: (column, key in the GBFS object, kind, limit). A record failing any check
+# goes to silver.rejected_rows with reason codes '<reason>:<column>' and the rest
+# of the batch loads without it. Kinds, after NULLIF(value, ''):
+#   required  value present (NOT NULL columns)
+#   text      length <= limit (VARCHAR(limit))
+#   int       castable to integer
+#   numeric   castable to numeric, fits NUMERIC(precision, scale) = limit
+#   boolean   castable to boolean
+#   array     absent or a JSON array (jsonb_array_elements_text)
+# A tuple key is read like COALESCE(obj->>'a', obj->>'b').
+STATION_INFORMATION_CHECKS = [
+    ("station_id", "station_id", "required", None),
+    ("station_id", "station_id", "text", 100),
+    ("name", "name", "required", None),
+    ("name", "name", "text", 255),
+    ("physical_configuration", "physical_configuration", "text", 100),
+    ("lat", "lat", "numeric", (10, 8)),
+    ("lon", "lon", "numeric", (11, 8)),
+    ("address", "address", "text", 255),
+    ("capacity", "capacity", "int", None),
+    ("is_charging_station", "is_charging_station", "boolean", None),
+    ("rental_methods", "rental_methods", "array", None),
+    ("groups", "groups", "array", None),
+    ("obcn", "obcn", "text", 100),
+    ("short_name", "short_name", "text", 100),
+    ("nearby_distance", "nearby_distance", "numeric", (10, 4)),
+    ("_ride_code_support", "_ride_code_support", "boolean", None),
+]
+
+STATION_STATUS_CHECKS = [
+    ("station_id", "station_id", "required", None),
+    ("station_id", "station_id", "text", 100),
+    ("last_reported", "last_reported", "required", None),
+    ("last_reported", "last_reported", "int", None),
+    ("num_bikes_available", "num_bikes_available", "int", None),
+    ("num_bikes_disabled", "num_bikes_disabled", "int", None),
+    ("status", "status", "text", 50),
+    ("num_docks_available", "num_docks_available", "int", None),
+    ("num_docks_disabled", "num_docks_disabled", "int", None),
+    ("is_installed", "is_installed", "int", None),
+    ("is_renting", "is_renting", "int", None),
+    ("is_returning", "is_returning", "int", None),
+]
+
+SYSTEM_INFORMATION_CHECKS = [
+    ("system_id", "system_id", "required", None),
+    ("system_id", "system_id", "text", 100),
+    ("timezone", "timezone", "text", 100),
+    ("build_version", "build_version", "text", 100),
+    ("build_label", "build_label", "text", 100),
+    ("build_hash", "build_hash", "text", 100),
+    ("build_number", "build_number", "text", 100),
+    ("mobile_head_version", "mobile_head_version", "text", 100),
+    ("mobile_minimum_supported_version", "mobile_minimum_supported_version", "text", 100),
+    ("_station_count", ("station_count", "_station_count"), "int", None),
+    ("language", "language", "text", 50),
+    ("name", "name", "text", 255),
+]
+
+PLAN_CHECKS = [
+    ("plan_id", "plan_id", "required", None),
+    ("plan_id", "plan_id", "text", 100),
+    ("name", "name", "text", 255),
+    ("currency", "currency", "text", 10),
+    ("price", "price", "numeric", (10, 2)),
+    ("is_taxable", "is_taxable", "boolean", None),
+]
+
+INT_PATTERN = r"\s*[+-]?[0-9]+\s*"
+NUMERIC_PATTERN = r"\s*[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]{1,3})?\s*"
+# Everything Postgres' boolean input accepts (case-insensitive, unique prefixes)
+BOOLEAN_TEXT = {
+    **dict.fromkeys(["t", "tr", "tru", "true", "y", "ye", "yes", "on", "1"], True),
+    **dict.fromkeys(["f", "fa", "fal", "fals", "false", "n", "no", "of", "off", "0"], False),
+}
+_SPACE = " \t\n\r\f\v"
+
+# Quarantined records; a record rejected again by a re-run (--since) is stored once
+REJECT_SQL = """
+INSERT INTO silver.rejected_rows (feed_type, bronze_id, record_key, reasons, record)
+VALUES %s
+ON CONFLICT (feed_type, bronze_id, (md5(record::text))) DO NOTHING
+"""
+
+REJECT_TEMPLATE = "(%(feed_type)s, %(bronze_id)s, %(record_key)s, %(reasons)s::text[], %(record)s::jsonb)"
+
+
+def _text_sql(record, key):
+    if isinstance(key, tuple):
+        return "COALESCE(" + ", ".join(f"{record}->>'{k}'" for k in key) + ")"
+    return f"{record}->>'{key}'"
+
+
+def reasons_sql(record, checks):
+    """
+    SQL text[] of the reason codes of the jsonb object `record` ('{}' when it
+    passes every check). Casts are only attempted once the format matched, so
+    the expression itself never fails.
+    """
+    cases = []
+    for column, key, kind, limit in checks:
+        value = f"NULLIF({_text_sql(record, key)}, '')"
+        if kind == "required":
+            cases.append(f"CASE WHEN {_text_sql(record, key)} IS NULL THEN 'missing:{column}' END")
+        elif kind == "text":
+            cases.append(f"CASE WHEN length({_text_sql(record, key)}) > {limit} THEN 'too_long:{column}' END")
+        elif kind == "int":
+            cases.append(
+                f"CASE WHEN NOT silver.is_int({value}) THEN 'not_int:{column}' "
+                f"WHEN NOT silver.fits_int({value}) THEN 'out_of_range:{column}' END"
+            )
+        elif kind == "numeric":
+            precision, scale = limit
+            cases.append(
+                f"CASE WHEN NOT silver.is_numeric({value}) THEN 'not_numeric:{column}' "
+                f"WHEN NOT silver.fits_numeric({value}, {precision}, {scale}) THEN 'out_of_range:{column}' END"
+            )
+        elif kind == "boolean":
+            cases.append(f"CASE WHEN NOT silver.is_boolean({value}) THEN 'not_boolean:{column}' END")
+        elif kind == "array":
+            cases.append(
+                f"CASE WHEN jsonb_typeof({record}->'{key}') <> 'array' THEN 'not_array:{column}' END"
+            )
+        else:
+            raise ValueError(f"unknown check kind {kind!r}")
+    return "array_remove(ARRAY[\n        " + ",\n        ".join(cases) + "\n    ]::text[], NULL)"
+
+
+def loads(text):
+    """
+    json.loads with JSON numbers that have a fraction or an exponent read as
+    Decimal, so they keep the digits Postgres' numeric keeps (a float turns
+    1E2 into 100.0, which is not an integer).
+    """
+    return json.loads(text, parse_float=Decimal)
+
+
+def number_text(value):
+    """A JSON number as Postgres' numeric prints it: 1E2 -> 100, 1.50E1 -> 15.0, -0 -> 0."""
+    if value.is_zero():
+        value = abs(value)
+    return format(value, "f")
+
+
+def dumps(value):
+    """json.dumps (Postgres' jsonb spacing) that also writes the Decimals of `loads`."""
+    if isinstance(value, Decimal):
+        return number_text(value)
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{json.dumps(k, ensure_ascii=False)}: {dumps(v)}" for k, v in value.items()) + "}"
+    if isinstance(value, list):
+        return "[" + ", ".join(dumps(v) for v in value) + "]"
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _scalar_text(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, Decimal):
+        return number_text(value)
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return dumps(value)
+
+
+def _key_text(record, key):
+    """`->>` (or the COALESCE of a tuple key) of one record, None for NULL."""
+    if not isinstance(record, dict):
+        return None
+    for k in key if isinstance(key, tuple) else (key,):
+        value = record.get(k)
+        if value is not None:
+            return _scalar_text(value)
+    return None
+
+
+def _fits_numeric(text, precision, scale):
+    value = abs(Decimal(text.strip(_SPACE)))
+    limit = Decimal(10) ** (precision - scale)
+    if value >= limit:
+        return False
+    return value.quantize(Decimal(1).scaleb(-scale), rounding=ROUND_HALF_UP) < limit
+
+
+def rejection_reasons(records, checks):
+    """
+    reasons_sql for a list of GBFS objects (dicts), evaluated column by
+    column: a list of reason codes per record, [] for the clean ones.
+    """
+    reasons = [[] for _ in records]
+    key_texts = {}
+    for column, key, kind, limit in checks:
+        if kind == "array":
+            for i, r in enumerate(records):
+                if isinstance(r, dict) and key in r and not isinstance(r[key], list):
+                    reasons[i].append(f"not_array:{column}")
+            continue
+        if key not in key_texts:
+            key_texts[key] = pd.Series([_key_text(r, key) for r in records], dtype=object)
+        texts = key_texts[key]
+        if kind == "required":
+            bad = texts.isna()
+            codes = pd.Series(f"missing:{column}", index=texts.index).where(bad)
+        elif kind == "text":
+            bad = texts.str.len().fillna(0) > limit
+            codes = pd.Series(f"too_long:{column}", index=texts.index).where(bad)
+        else:
+            texts = texts.where(texts != "", None)
+            present = texts.notna()
+            if kind == "boolean":
+                valid = texts.str.strip(_SPACE).str.lower().isin(BOOLEAN_TEXT.keys())
+                codes = pd.Series(f"not_boolean:{column}", index=texts.index).where(present & ~valid)
+            else:
+                pattern = INT_PATTERN if kind == "int" else NUMERIC_PATTERN
+                valid = texts.str.fullmatch(pattern).fillna(False).astype(bool)
+                numbers = pd.to_numeric(texts[present & valid].str.strip(_SPACE), errors="coerce").astype(float)
+                if kind == "int":
+                    fits = numbers.between(-2147483648, 2147483647)
+                else:
+                    # exact check (rounding to the scale) only near the limit
+                    fits = numbers.abs() < 10.0 ** (limit[0] - limit[1]) - 1
+                    near = texts[fits[~fits].index]
+                    fits[near.index] = near.map(lambda t: _fits_numeric(t, *limit)).astype(bool)
+                codes = pd.Series(None, index=texts.index, dtype=object)
+                codes[present & ~valid] = f"not_{kind}:{column}"
+                codes[fits[~fits.astype(bool)].index] = f"out_of_range:{column}"
+        for i in codes[codes.notna()].index:
+            reasons[i].append(codes[i])
+    return reasons
+
+
+def reject_rows(records, reasons, bronze_ids, feed_type, key):
+    """REJECT_SQL rows for the records that have reasons."""
+    return [
+        {
+            "feed_type": feed_type,
+            "bronze_id": int(bronze_id),
+            "record_key": _key_text(record, key),
+            "reasons": record_reasons,
+            "record": dumps(record),
+        }
+        for record, record_reasons, bronze_id in zip(records, reasons, bronze_ids)
+        if record_reasons
+    ]
@@ -0,0 +1,391 @@
+# utils/silver_frames.py
+import io
+import os
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+
+from utils.silver_checks import (
+    STATION_INFORMATION_CHECKS,
+    STATION_STATUS_CHECKS,
+    PLAN_CHECKS,
+    BOOLEAN_TEXT,
+    REJECT_SQL,
+    REJECT_TEMPLATE,
+    rejection_reasons,
+    reject_rows,
+    loads,
+    dumps,
+    number_text,
+)
+
+# Read silver engine settings from environment variables
+# e.g. SILVER_ENGINE, SILVER_FRAME_CHUNK_ROWS
+SILVER_ENGINE = os.getenv("SILVER_ENGINE", "sql")
+SILVER_FRAME_CHUNK_ROWS = int(os.getenv("SILVER_FRAME_CHUNK_ROWS", "50"))
+
+_MISSING = object()
+
+# Bronze rows to normalize; same slice as the SQL loaders read. Only the array
+# (or object) being normalized is sent, serialized once by Postgres.
+READ_SQL = """
+SELECT id, time_ingested, ({path})::text
+FROM {source}
+WHERE source_name = %(source_name)s
+  AND feed_type = %(feed_type)s
+  AND id > %(after_id)s
+  AND id <= %(upto_id)s
+  AND (%(since)s::timestamptz IS NULL OR time_ingested >= %(since)s)
+"""
+
+# (column, kind, key in the GBFS object). Kinds mirror the SQL loaders:
+#   text     station->>'key'
+#   numeric  NULLIF(station->>'key', '')::numeric   (int, bool likewise)
+#   bool_int (NULLIF(station->>'key', '')::boolean)::int
+#   array    ARRAY(SELECT jsonb_array_elements_text(COALESCE(station->'key', '[]')))
+#   json     station->'key'
+STATION_INFORMATION_COLUMNS = [
+    ("station_id", "text", "station_id"),
+    ("name", "text", "name"),
+    ("physical_configuration", "text", "physical_configuration"),
+    ("lat", "numeric", "lat"),
+    ("lon", "numeric", "lon"),
+    ("address", "text", "address"),
+    ("capacity", "int", "capacity"),
+    ("is_charging_station", "bool", "is_charging_station"),
+    ("rental_methods", "array", "rental_methods"),
+    ("groups", "array", "groups"),
+    ("obcn", "text", "obcn"),
+    ("short_name", "text", "short_name"),
+    ("nearby_distance", "numeric", "nearby_distance"),
+    ("_ride_code_support", "bool", "_ride_code_support"),
+    ("rental_uris", "json", "rental_uris"),
+]
+
+STATION_STATUS_COLUMNS = [
+    ("station_id", "text", "station_id"),
+    ("last_reported", "int", "last_reported"),
+    ("num_bikes_available", "int", "num_bikes_available"),
+    ("num_bikes_disabled", "int", "num_bikes_disabled"),
+    ("status", "text", "status"),
+    ("traffic", "json", "traffic"),
+    ("num_bikes_available_types", "json", "num_bikes_available_types"),
+    ("num_docks_available", "int", "num_docks_available"),
+    ("num_docks_disabled", "int", "num_docks_disabled"),
+    ("is_installed", "int", "is_installed"),
+    ("is_renting", "int", "is_renting"),
+    ("is_returning", "int", "is_returning"),
+]
+
+PLAN_COLUMNS = [
+    ("plan_id", "text", "plan_id"),
+    ("name", "text", "name"),
+    ("currency", "text", "currency"),
+    ("price", "numeric", "price"),
+    ("description", "text", "description"),
+    ("is_taxable", "bool_int", "is_taxable"),
+]
+
+def _json_text(value):
+    """`->>` of one JSON value: strings as-is, everything else as JSON text, null as NULL."""
+    if value is _MISSING or value is None:
+        return None
+    if isinstance(value, str):
+        return value
+    if isinstance(value, Decimal):
+        return number_text(value)
+    return dumps(value)
+
+
+def _nullif_empty(texts):
+    return texts.where(texts != "", None)
+
+
+def _to_numeric_text(texts):
+    """Validate like ::numeric and keep the original digits, so Postgres rounds exactly as in SQL."""
+    texts = _nullif_empty(texts)
+    present = texts.notna()
+    pd.to_numeric(texts[present].str.strip(), errors="raise")
+    return texts
+
+
+def _to_int_text(texts):
+    texts = _nullif_empty(texts)
+    present = texts.notna()
+    bad = present & ~texts.str.fullmatch(r"\s*[+-]?\d+\s*").fillna(False).astype(bool)
+    if bad.any():
+        raise ValueError(f"invalid input syntax for type integer: {texts[bad].iloc[0]!r}")
+    return texts
+
+
+def _to_bool(texts):
+    texts = _nullif_empty(texts)
+    flags = texts.str.strip().str.lower().map(BOOLEAN_TEXT)
+    bad = texts.notna() & flags.isna()
+    if bad.any():
+        raise ValueError(f"invalid input syntax for type boolean: {texts[bad].iloc[0]!r}")
+    return flags
+
+
+def _array_literal(value):
+    """Postgres array literal of a JSON array's elements as text (ARRAY(jsonb_array_elements_text(...)))."""
+    if value is _MISSING or value is None:
+        value = []
+    if not isinstance(value, list):
+        raise ValueError(f"cannot extract elements from a scalar: {value!r}")
+    items = []
+    for element in value:
+        text = _json_text(element)
+        if text is None:
+            items.append("NULL")
+        else:
+            items.append('"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"')
+    return "{" + ",".join(items) + "}"
+
+
+def normalize(records, columns):
+    """
+    Columnar, typed version of a list of GBFS objects (dicts): one Series per
+    column holding the COPY text of each value or None for NULL, with the
+    SQL loaders' casts applied and validated. Raises ValueError where the SQL
+    cast would fail.
+    """
+    frame = {}
+    for column, kind, key in columns:
+        raw = [r.get(key, _MISSING) if isinstance(r, dict) else _MISSING for r in records]
+        if kind == "json":
+            frame[column] = pd.Series(
+                [None if v is _MISSING else dumps(v) for v in raw], dtype=object,
+            )
+        elif kind == "array":
+            frame[column] = pd.Series([_array_literal(v) for v in raw], dtype=object)
+        else:
+            texts = pd.Series([_json_text(v) for v in raw], dtype=object)
+            if kind == "numeric":
+                texts = _to_numeric_text(texts)
+            elif kind == "int":
+                texts = _to_int_text(texts)
+            elif kind == "bool":
+                flags = _to_bool(texts)
+                texts = flags.map({True: "true", False: "false"}).astype(object).where(flags.notna(), None)
+            elif kind == "bool_int":
+                flags = _to_bool(texts)
+                texts = flags.map({True: "1", False: "0"}).astype(object).where(flags.notna(), None)
+            frame[column] = texts
+    return pd.DataFrame(frame, columns=[c for c, _, _ in columns])
+
+
+def copy_text(frame):
+    """Render a frame of text/None columns as COPY text-format lines (tab separated, \\N for NULL)."""
+    if frame.empty:
+        return ""
+    escaped = []
+    for column in frame.columns:
+        values = frame[column].astype(object)
+        null = values.isna()
+        text = values.where(~null, "").astype(str)
+        text = (
+            text.str.replace("\\", "\\\\", regex=False)
+                .str.replace("\t", "\\t", regex=False)
+                .str.replace("\n", "\\n", regex=False)
+                .str.replace("\r", "\\r", regex=False)
+        )
+        escaped.append(text.where(~null, "\\N"))
+    lines = escaped[0].str.cat(escaped[1:], sep="\t") if len(escaped) > 1 else escaped[0]
+    return "\n".join(lines.tolist()) + "\n"
+
+
+def stage_feed(cur, stage, table, columns, path, feed_type, after_id, upto_id, since, source,
+               checks, key, source_name="bike-share-json", chunk_rows=None):
+    """
+    Create temp table `stage` shaped like `table` (plus _bronze_id and
+    _time_ingested), read the bronze slice chunk_rows payloads at a time,
+    normalize each chunk and COPY it in. Objects failing `checks` go to
+    silver.rejected_rows instead. Returns (objects staged, objects rejected).
+    The stage's columns are nullable: objects the SQL loaders skip (e.g. an
+    empty last_reported) are dropped by the merge, as there, instead of
+    failing the COPY.
+    """
+    names = [c for c, _, _ in columns] + ["_bronze_id", "_time_ingested"]
+    cur.execute(
+        f"CREATE TEMP TABLE {stage} (LIKE {table}) ON COMMIT DROP;"
+        f"ALTER TABLE {stage} "
+        + ", ".join(f"ALTER COLUMN {c} DROP NOT NULL" for c, _, _ in columns)
+        + ", ADD COLUMN _bronze_id bigint, ADD COLUMN _time_ingested timestamptz"
+    )
+    copy_sql = f"COPY {stage} ({', '.join(names)}) FROM STDIN"
+    chunk_rows = chunk_rows or SILVER_FRAME_CHUNK_ROWS
+    staged = rejected = 0
+    # Server-side cursor: payloads arrive chunk_rows at a time while the COPY runs on `cur`
+    with cur.connection.cursor(name=f"{stage}_read") as reader:
+        reader.itersize = chunk_rows
+        reader.execute(
+            READ_SQL.format(path=path, source=source),
+            {"source_name": source_name, "feed_type": feed_type, "after_id": after_id,
+             "upto_id": upto_id, "since": since},
+        )
+        while True:
+            rows = reader.fetchmany(chunk_rows)
+            if not rows:
+                break
+            chunk_staged, chunk_rejected = _stage_chunk(cur, copy_sql, columns, rows, checks, feed_type, key)
+            staged += chunk_staged
+            rejected += chunk_rejected
+    return staged, rejected
+
+
+def _stage_chunk(cur, copy_sql, columns, rows, checks, feed_type, key):
+    records, bronze_ids, times = [], [], []
+    for bronze_id, time_ingested, text in rows:
+        objects = loads(text) if text is not None else None
+        if isinstance(objects, dict):
+            objects = [objects]
+        elif not isinstance(objects, list):
+            continue
+        records.extend(objects)
+        bronze_ids.append(np.full(len(objects), bronze_id, dtype=np.int64))
+        times.extend([time_ingested.isoformat()] * len(objects))
+    if not records:
+        return 0, 0
+    bronze_ids = np.concatenate(bronze_ids)
+
+    reasons = rejection_reasons(records, checks)
+    rejects = reject_rows(records, reasons, bronze_ids, feed_type, key)
+    if rejects:
+        execute_values(cur, REJECT_SQL, rejects, template=REJECT_TEMPLATE, page_size=len(rejects))
+        keep = [not r for r in reasons]
+        records = [record for record, k in zip(records, keep) if k]
+        bronze_ids = bronze_ids[np.array(keep, dtype=bool)]
+        times = [t for t, k in zip(times, keep) if k]
+        if not records:
+            return 0, len(rejects)
+
+    frame = normalize(records, columns)
+    frame["_bronze_id"] = bronze_ids.astype(str)
+    frame["_time_ingested"] = times
+    cur.copy_expert(copy_sql, io.BytesIO(copy_text(frame).encode("utf-8")))
+    return len(frame), len(rejects)
+
+
+def merge_sql(stage, table, key, columns, feed_type, source_name="bike-share-json"):
+    """
+    Upsert the latest staged row per `key` into `table`, skipping payloads at
+    or below the feed's last_time_ingested, rows stored from a newer payload
+    (source_time_ingested) and unchanged rows; returns (inserted, updated,
+    unchanged) like the SQL loaders.
+    """
+    names = [c for c, _, _ in columns]
+    others = [c for c in names if c != key]
+    return f"""
+WITH latest AS (
+    SELECT DISTINCT ON ({key}) *
+    FROM {stage}
+    WHERE _time_ingested > COALESCE((
+        SELECT w.last_time_ingested
+        FROM silver.load_watermark w
+        WHERE w.source_name = '{source_name}' AND w.feed_type = '{feed_type}'
+    ), '-infinity')
+    ORDER BY {key}, _time_ingested DESC, _bronze_id DESC
+),
+merged AS (
+    INSERT INTO {table} AS t ({", ".join(names)}, source_time_ingested)
+    SELECT {", ".join(names)}, _time_ingested
+    FROM latest
+    ON CONFLICT ({key}) DO UPDATE SET
+        {", ".join(f"{c} = EXCLUDED.{c}" for c in others)},
+        source_time_ingested = EXCLUDED.source_time_ingested,
+        updated_at = now()
+    WHERE (t.source_time_ingested IS NULL OR EXCLUDED.source_time_ingested > t.source_time_ingested)
+      AND ({", ".join(f"t.{c}" for c in others)})
+          IS DISTINCT FROM ({", ".join(f"EXCLUDED.{c}" for c in others)})
+    RETURNING (xmax = 0) AS inserted
+),
+applied AS (
+    UPDATE silver.load_watermark
+    SET last_time_ingested = GREATEST(last_time_ingested, (SELECT max(_time_ingested) FROM latest))
+    WHERE source_name = '{source_name}' AND feed_type = '{feed_type}'
+)
+SELECT
+    count(*) FILTER (WHERE inserted),
+    count(*) FILTER (WHERE NOT inserted),
+    (SELECT count(*) FROM latest) - count(*)
+FROM merged
+"""
+
+
+def status_history_sql(stage):
+    """Append staged snapshots to the station_status history and move the latest-state table forward."""
+    history = [c for c, _, _ in STATION_STATUS_COLUMNS]
+    latest = [c for c in history if c != "station_id"]
+    return f"""
+WITH snapshots AS (
+    SELECT DISTINCT ON (station_id, last_reported) *
+    FROM {stage}
+    WHERE last_reported IS NOT NULL
+    ORDER BY station_id, last_reported, _bronze_id
+),
+appended AS (
+    INSERT INTO silver.bst_station_status_history ({", ".join(history)}, bronze_id)
+    SELECT {", ".join(history)}, _bronze_id
+    FROM snapshots
+    ON CONFLICT (station_id, last_reported) DO NOTHING
+    RETURNING *
+),
+latest AS (
+    SELECT DISTINCT ON (station_id) *
+    FROM appended
+    ORDER BY station_id, last_reported DESC
+),
+current_state AS (
+    INSERT INTO silver.bst_station_status ({", ".join(history)})
+    SELECT {", ".join(history)}
+    FROM latest
+    ON CONFLICT (station_id) DO UPDATE SET
+        {", ".join(f"{c} = EXCLUDED.{c}" for c in latest)},
+        updated_at = now()
+    WHERE silver.bst_station_status.last_reported IS NULL
+       OR EXCLUDED.last_reported > silver.bst_station_status.last_reported
+)
+SELECT
+    (SELECT count(*) FROM appended),
+    0,
+    (SELECT count(*) FROM snapshots) - (SELECT count(*) FROM appended)
+"""
+
+
+def _counts(cur, rejected):
+    inserted, updated, unchanged = cur.fetchone()
+    return {"inserted": inserted, "updated": updated, "unchanged": unchanged, "rejected": rejected}
+
+
+def load_station_information(cur, after_id, upto_id, since=None, source="bronze.gbfs_feed_raw"):
+    _, rejected = stage_feed(
+        cur, "stage_station_information", "silver.bst_station_information", STATION_INFORMATION_COLUMNS,
+        "raw_payload->'data'->'stations'", "station_information", after_id, upto_id, since, source,
+        STATION_INFORMATION_CHECKS, "station_id",
+    )
+    cur.execute(merge_sql("stage_station_information", "silver.bst_station_information", "station_id",
+                          STATION_INFORMATION_COLUMNS, "station_information"))
+    return _counts(cur, rejected)
+
+
+def load_station_status(cur, after_id, upto_id, since=None, source="bronze.gbfs_feed_raw"):
+    _, rejected = stage_feed(
+        cur, "stage_station_status", "silver.bst_station_status_history", STATION_STATUS_COLUMNS,
+        "raw_payload->'data'->'stations'", "station_status", after_id, upto_id, since, source,
+        STATION_STATUS_CHECKS, "station_id",
+    )
+    cur.execute(status_history_sql("stage_station_status"))
+    return _counts(cur, rejected)
+
+
+def load_plans(cur, after_id, upto_id, since=None, source="bronze.gbfs_feed_raw"):
+    _, rejected = stage_feed(
+        cur, "stage_plans", "silver.bst_plans", PLAN_COLUMNS,
+        "raw_payload->'data'->'plans'", "system_pricing_plans", after_id, upto_id, since, source,
+        PLAN_CHECKS, "plan_id",
+    )
+    cur.execute(merge_sql("stage_plans", "silver.bst_plans", "plan_id", PLAN_COLUMNS, "system_pricing_plans"))
+    return _counts(cur, rejected)
@@ -0,0 +1,290 @@
+# utils/spool.py
+import os
+import json
+import threading
+from datetime import datetime, timezone
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from utils.gbfs_stream import json_string_chunks, raw_size
+
+# Read spool settings from environment variables
+# e.g. SPOOL_ENABLED, SPOOL_DIR
+SPOOL_ENABLED = os.getenv("SPOOL_ENABLED", "false").lower() == "true"
+SPOOL_DIR = os.getenv("SPOOL_DIR", "spool/bronze")
+SPOOL_SEGMENT_BYTES = int(os.getenv("SPOOL_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+SPOOL_DRAIN_BATCH = int(os.getenv("SPOOL_DRAIN_BATCH", "200"))
+# Undrained bytes above which the polling daemon stops fetching until the drain catches up
+SPOOL_MAX_BYTES = int(os.getenv("SPOOL_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+CHECKPOINT_FILE = "checkpoint.json"
+REJECTED_FILE = "rejected.jsonl"
+
+# Drains spooled payloads: same duplicate check and pointer row locks as
+# BATCH_INSERT_SQL, extended to earlier rows of the same drain batch (lag), plus
+# ON CONFLICT on the spool key so payloads redelivered after a crash between
+# commit and checkpoint are skipped.
+DRAIN_INSERT_SQL = """
+WITH new_rows (ord, time_ingested, load_batch_id, source_name, feed_type, api_url, version, raw_payload, payload_bytes) AS (
+    VALUES %s
+),
+latest AS (
+    SELECT l.source_name, l.feed_type, l.content_hash
+    FROM bronze.gbfs_feed_latest l
+    WHERE (l.source_name, l.feed_type) IN (SELECT source_name, feed_type FROM new_rows)
+    ORDER BY l.source_name, l.feed_type
+    FOR UPDATE
+),
+hashed AS (
+    SELECT n.*,
+           bronze.gbfs_content_hash(n.raw_payload) AS content_hash,
+           lag(bronze.gbfs_content_hash(n.raw_payload)) OVER (
+               PARTITION BY n.source_name, n.feed_type ORDER BY n.ord
+           ) AS previous_hash
+    FROM new_rows n
+)
+INSERT INTO bronze.gbfs_feed_raw (
+    time_ingested,
+    feed_type,
+    source_name,
+    load_batch_id,
+    file_name,
+    api_url,
+    version,
+    raw_payload,
+    payload_bytes
+)
+SELECT h.time_ingested,
+       h.feed_type,
+       h.source_name,
+       h.load_batch_id,
+       h.feed_type || '.json',
+       h.api_url,
+       h.version,
+       h.raw_payload,
+       h.payload_bytes
+FROM hashed h
+WHERE h.content_hash IS DISTINCT FROM COALESCE(h.previous_hash, (
+        SELECT l.content_hash
+        FROM latest l
+        WHERE l.source_name = h.source_name
+          AND l.feed_type = h.feed_type
+   ))
+ORDER BY h.ord
+ON CONFLICT (load_batch_id, source_name, feed_type, time_ingested) DO NOTHING
+RETURNING id
+"""
+
+DRAIN_INSERT_TEMPLATE = """(
+    %(ord)s,
+    %(time_ingested)s::timestamptz,
+    %(load_batch_id)s,
+    %(source_name)s,
+    %(feed_type)s,
+    %(api_url)s,
+    %(version)s,
+    %(raw_payload)s::jsonb,
+    %(payload_bytes)s::integer
+)"""
+
+
+def _fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class BronzeSpool:
+    """
+    Write-ahead log of payloads on their way to bronze.gbfs_feed_raw.
+
+    `append` writes one JSON line to the current segment
+    (<spool_dir>/segment-000001.log, ...) and fsyncs it before returning, so
+    a fetched payload survives Postgres being down and the process crashing.
+    A drainer (`drain_spool`) reads from the checkpoint
+    (<spool_dir>/checkpoint.json), inserts in bulk and then advances the
+    checkpoint; fully drained segments are deleted.
+    """
+
+    def __init__(self, spool_dir=None, segment_bytes=None):
+        self.spool_dir = spool_dir or SPOOL_DIR
+        self.segment_bytes = segment_bytes or SPOOL_SEGMENT_BYTES
+        self._lock = threading.Lock()
+        os.makedirs(self.spool_dir, exist_ok=True)
+        segments = self.segments()
+        self._segment = segments[-1] if segments else 1
+        self._repair_tail(self._segment)
+        self._file = None
+
+    def _path(self, segment):
+        return os.path.join(self.spool_dir, f"segment-{segment:06d}.log")
+
+    def segments(self):
+        return sorted(
+            int(name[len("segment-"):-len(".log")])
+            for name in os.listdir(self.spool_dir)
+            if name.startswith("segment-") and name.endswith(".log")
+        )
+
+    def _repair_tail(self, segment):
+        """Cut a line left incomplete by a crash mid-append, so new lines start clean."""
+        path = self._path(segment)
+        if not os.path.exists(path):
+            return
+        with open(path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+                os.fsync(f.fileno())
+
+    def append(self, *, feed_name, source_name, batch_id, api_url, raw_body, version=None, time_ingested=None):
+        """
+        Spool one payload. raw_body is the response body as bytes or as a binary
+        file (e.g. StreamedFeed.raw_file()), which is copied in chunks.
+        """
+        record = {
+            "time_ingested": (time_ingested or datetime.now(timezone.utc)).isoformat(),
+            "load_batch_id": batch_id,
+            "source_name": source_name,
+            "feed_type": feed_name,
+            "api_url": api_url,
+            "version": version,
+            "payload_bytes": raw_size(raw_body),
+        }
+        # raw_payload goes last, streamed into the line after the metadata
+        head = json.dumps(record, ensure_ascii=False)[:-1] + ', "raw_payload": '
+        with self._lock:
+            if self._file is None:
+                self._file = open(self._path(self._segment), "ab")
+            elif self._file.tell() >= self.segment_bytes:
+                self._file.close()
+                self._segment += 1
+                self._file = open(self._path(self._segment), "ab")
+                _fsync_dir(self.spool_dir)
+            self._file.write(head.encode("utf-8"))
+            for chunk in json_string_chunks(raw_body):
+                self._file.write(chunk.encode("utf-8"))
+            self._file.write(b"}\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def checkpoint(self):
+        """(segment, byte offset) of the first record not yet in bronze."""
+        path = os.path.join(self.spool_dir, CHECKPOINT_FILE)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+            return saved["segment"], saved["offset"]
+        segments = self.segments()
+        return (segments[0] if segments else 1), 0
+
+    def save_checkpoint(self, position):
+        segment, offset = position
+        path = os.path.join(self.spool_dir, CHECKPOINT_FILE)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"segment": segment, "offset": offset}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{path}.tmp", path)
+        for old in self.segments():
+            if old < segment:
+                os.remove(self._path(old))
+
+    def read(self, max_records, position=None):
+        """
+        Return ([record, ...], position after them), reading at most max_records
+        complete lines from `position` (default: the checkpoint) onwards.
+        """
+        segment, offset = position or self.checkpoint()
+        records = []
+        while len(records) < max_records:
+            path = self._path(segment)
+            if not os.path.exists(path):
+                break
+            with open(path, "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # being written right now
+                    records.append(json.loads(line))
+                    offset += len(line)
+                    if len(records) >= max_records:
+                        break
+            if len(records) >= max_records or segment >= max(self.segments(), default=segment):
+                break
+            segment, offset = segment + 1, 0  # segment done, the writer has moved on
+        return records, (segment, offset)
+
+    def pending_bytes(self):
+        segment, offset = self.checkpoint()
+        pending = 0
+        for s in self.segments():
+            if s < segment:
+                continue
+            try:
+                pending += os.path.getsize(self._path(s)) - (offset if s == segment else 0)
+            except FileNotFoundError:
+                pass  # drained and removed by save_checkpoint meanwhile
+        return pending
+
+    def reject(self, record, error):
+        """Set aside a record Postgres refuses (e.g. invalid JSON) so it can't block the spool."""
+        with open(os.path.join(self.spool_dir, REJECTED_FILE), "a", encoding="utf-8") as f:
+            f.write(json.dumps({"error": str(error), "record": record}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _insert_records(conn, records):
+    # payload_bytes: None for records spooled before it was recorded
+    rows = [dict(record, ord=i, payload_bytes=record.get("payload_bytes")) for i, record in enumerate(records)]
+    with conn.cursor() as cur:
+        inserted = execute_values(
+            cur, DRAIN_INSERT_SQL, rows,
+            template=DRAIN_INSERT_TEMPLATE, page_size=len(rows), fetch=True,
+        )
+    return len(inserted)
+
+
+def drain_spool(spool, conn, batch_size=None, max_batches=None):
+    """
+    Move spooled payloads to bronze, batch_size records per transaction,
+    until the spool is empty (or max_batches were drained). The checkpoint is
+    advanced only after each commit; a redelivered batch is absorbed by the
+    duplicate check and ON CONFLICT. Returns (records drained, rows inserted).
+    Connection errors propagate, leaving the rest of the spool for later.
+    """
+    batch_size = batch_size or SPOOL_DRAIN_BATCH
+    drained = inserted = batches = 0
+    while max_batches is None or batches < max_batches:
+        records, position = spool.read(batch_size)
+        if not records:
+            if position != spool.checkpoint():
+                spool.save_checkpoint(position)  # skip past an empty, finished segment
+            break
+        try:
+            inserted += _insert_records(conn, records)
+            conn.commit()
+        except psycopg2.DataError:
+            # One bad payload fails the whole statement: retry one by one and set the bad ones aside
+            conn.rollback()
+            for record in records:
+                try:
+                    inserted += _insert_records(conn, [record])
+                    conn.commit()
+                except psycopg2.DataError as error:
+                    conn.rollback()
+                    spool.reject(record, error)
+        spool.save_checkpoint(position)
+        drained += len(records)
+        batches += 1
+    return drained, inserted
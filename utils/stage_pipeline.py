@@ -0,0 +1,176 @@
+# utils/stage_pipeline.py
+import os
+import time
+import queue
+import threading
+
+# Read stage pipeline settings from environment variables
+# e.g. PIPELINE_QUEUE_SIZE, PIPELINE_CSV_WORKERS
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "16"))
+PIPELINE_CSV_WORKERS = int(os.getenv("PIPELINE_CSV_WORKERS", "2"))
+
+_DONE = object()
+
+
+class Stage:
+    """
+    One step of a StagePipeline: `fn(item)` runs on `workers` threads and
+    returns the item for the next stage, or None to drop it (e.g. a feed that
+    did not change). An exception fails that item only.
+    """
+
+    def __init__(self, name, fn, workers=1):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+
+
+class StageStats:
+    """Throughput and input-queue depth of one stage, filled in while it runs."""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy_seconds = 0.0     # summed over workers, time spent inside fn
+        self.blocked_seconds = 0.0  # time spent waiting for room in the next queue
+        self.max_queue_depth = 0
+        self._depth_sum = 0
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def as_dict(self):
+        elapsed = (self.finished - self.started) if self.started and self.finished else 0.0
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "errors": self.errors,
+            "seconds": elapsed,
+            "items_per_second": self.items_in / elapsed if elapsed else 0.0,
+            # share of the stage's worker time spent doing work; near 1.0 = bottleneck
+            "utilization": self.busy_seconds / (elapsed * self.workers) if elapsed else 0.0,
+            "blocked_seconds": self.blocked_seconds,
+            "mean_queue_depth": self._depth_sum / self.items_in if self.items_in else 0.0,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+
+class StagePipeline:
+    """
+    Stages connected by bounded queues, so e.g. network fetches, CPU-bound
+    transforms and database writes overlap and the wall time approaches that
+    of the slowest stage. A full queue blocks the stage feeding it, so a slow
+    stage holds back the ones before it instead of letting work pile up.
+
+    Usage:
+        pipeline = StagePipeline([
+            Stage("fetch", fetch_one, workers=10),
+            Stage("transform", to_csv, workers=2),
+            Stage("load", to_bronze),
+        ])
+        failures = pipeline.run(jobs)   # [(stage name, item, exception), ...]
+        pipeline.stats()                # one dict per stage, see StageStats
+    """
+
+    def __init__(self, stages, queue_size=None):
+        self.stages = stages
+        self.queue_size = queue_size or PIPELINE_QUEUE_SIZE
+        self._stats = [StageStats(stage.name, stage.workers) for stage in stages]
+        self._failures = []
+        self._lock = threading.Lock()
+
+    def stats(self):
+        return [s.as_dict() for s in self._stats]
+
+    def _put(self, q, item, stats):
+        blocked_from = time.monotonic()
+        q.put(item)
+        with stats._lock:
+            stats.blocked_seconds += time.monotonic() - blocked_from
+
+    def _worker(self, index, inbox, outbox, remaining):
+        stage, stats = self.stages[index], self._stats[index]
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                break
+            with stats._lock:
+                stats.items_in += 1
+                depth = inbox.qsize()
+                stats._depth_sum += depth
+                stats.max_queue_depth = max(stats.max_queue_depth, depth)
+                if stats.started is None:
+                    stats.started = time.monotonic()
+
+            started = time.monotonic()
+            try:
+                result = stage.fn(item)
+            except Exception as e:
+                result = None
+                with stats._lock:
+                    stats.errors += 1
+                with self._lock:
+                    self._failures.append((stage.name, item, e))
+            with stats._lock:
+                stats.busy_seconds += time.monotonic() - started
+
+            if result is not None:
+                with stats._lock:
+                    stats.items_out += 1
+                if outbox is not None:
+                    self._put(outbox, result, stats)
+
+        # The last worker of a stage to finish closes the next stage's queue
+        with self._lock:
+            remaining[index] -= 1
+            last = remaining[index] == 0
+        if last:
+            stats.finished = time.monotonic()
+            if outbox is not None:
+                for _ in range(self.stages[index + 1].workers):
+                    outbox.put(_DONE)
+
+    def run(self, items):
+        """Push every item through all stages; returns the failed items."""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        remaining = [stage.workers for stage in self.stages]
+        threads = []
+        for index, stage in enumerate(self.stages):
+            outbox = queues[index + 1] if index + 1 < len(self.stages) else None
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(index, queues[index], outbox, remaining),
+                    name=f"{stage.name}-{n}",
+                    daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+
+        for item in items:
+            queues[0].put(item)
+        for _ in range(self.stages[0].workers):
+            queues[0].put(_DONE)
+        for thread in threads:
+            thread.join()
+        return list(self._failures)
+
+
+def format_stage_stats(stats):
+    """Stage stats as a small fixed-width table."""
+    lines = [
+        f"{'stage':<10} {'workers':>7} {'in':>5} {'out':>5} {'errors':>6} {'items/s':>8} "
+        f"{'util':>5} {'blocked s':>9} {'queue avg':>9} {'queue max':>9}"
+    ]
+    for s in stats:
+        lines.append(
+            f"{s['stage']:<10} {s['workers']:>7} {s['items_in']:>5} {s['items_out']:>5} {s['errors']:>6} "
+            f"{s['items_per_second']:>8.1f} {s['utilization']:>5.0%} {s['blocked_seconds']:>9.2f} "
+            f"{s['mean_queue_depth']:>9.1f} {s['max_queue_depth']:>9}"
+        )
+    return "\n".join(lines)